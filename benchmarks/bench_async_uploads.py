@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for the asyncio upload engine (`tiktok_uploader.aio`).
+
+Starts a local stand-in for www.tiktok.com and the upload host in a separate
+process (every endpoint of the upload flow, part CRCs checked, --rtt-ms added
+to each response), then runs --uploads complete uploads of a --size-mb video,
+one account each, on a single event loop. Reports wall time, goodput, the
+number of threads and the peak RSS of the uploading process.
+
+Signing goes through the node signer in vm mode (SIGNER_MODE=vm), so Node.js
+is needed but not Playwright.
+
+Usage: python benchmarks/bench_async_uploads.py [--uploads 50] [--size-mb 20]
+       [--concurrency 50] [--rtt-ms 50]
+"""
+
+import argparse
+import asyncio
+import os
+import pickle
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+UPLOAD_HOST = "upload.local"
+
+
+def serve(port, rtt):
+    from aiohttp import web
+
+    async def delay():
+        await asyncio.sleep(rtt)
+
+    async def api(request):
+        await delay()
+        path = request.path
+        if path.startswith("/@"):
+            return web.Response(text='<html>"webapp.user-detail":{"userInfo":{"user":{"id":"42","x":1}}}</html>')
+        if request.method == "HEAD":
+            response = web.Response()
+            response.set_cookie("msToken", "bench", domain=".tiktok.com")
+            return response
+        if "project/create" in path:
+            return web.json_response({"project": {"project_id": "P"}})
+        if "upload/auth" in path:
+            return web.json_response({"video_token_v5": {"access_key_id": "AK", "secret_acess_key": "SK", "session_token": "ST"}})
+        if "project/post" in path:
+            return web.json_response({"status_code": 0})
+        action = request.query.get("Action")
+        if action == "ApplyUploadInner":
+            node = {"Vid": "V", "UploadHost": UPLOAD_HOST, "SessionKey": "K", "StoreInfos": [{"StoreUri": "store/bench", "Auth": "A"}]}
+            return web.json_response({"Result": {"InnerUploadAddress": {"UploadNodes": [node]}}})
+        if action == "CommitUploadInner":
+            return web.json_response({"Result": {}})
+        return web.json_response({"error": "unknown"}, status=404)
+
+    async def store(request):
+        if request.query.get("phase") == "finish":
+            await delay()
+            return web.json_response({"code": 2000, "data": {}})
+        crc = 0
+        async for block in request.content.iter_chunked(262144):
+            crc = zlib.crc32(block, crc)
+        await delay()
+        crc = "%08x" % (crc & 0xFFFFFFFF)
+        if crc != request.headers.get("Content-Crc32"):
+            return web.json_response({"code": 4000, "message": "crc mismatch"}, status=400)
+        return web.json_response({"code": 2000, "data": {"crc32": crc}})
+
+    app = web.Application(client_max_size=1 << 30)
+    app.router.add_route("*", "/store/bench", store)
+    app.router.add_route("*", "/{tail:.*}", api)
+    web.run_app(app, host="127.0.0.1", port=port, print=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async upload engine benchmark")
+    parser.add_argument("--uploads", type=int, default=50)
+    parser.add_argument("--size-mb", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rtt-ms", type=float, default=50)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.rtt_ms / 1000)
+        return
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = subprocess.Popen([sys.executable, __file__, "--serve", str(port), "--rtt-ms", str(args.rtt_ms)])
+    work = tempfile.TemporaryDirectory()
+    try:
+        os.chdir(work.name)
+        for directory in ("CookiesDir", "VideosDirPath", "StateDir"):
+            os.mkdir(directory)
+        with open(os.path.join("VideosDirPath", "bench.mp4"), "wb") as f:
+            f.write(os.urandom(args.size_mb * 1048576))
+        for i in range(args.uploads):
+            with open(os.path.join("CookiesDir", f"tiktok_session-bench{i}.cookie"), "wb") as f:
+                pickle.dump([{"name": "sessionid", "value": "S"}, {"name": "tt-target-idc", "value": "useast5"}], f)
+
+        from tiktok_uploader.Config import Config
+        from tiktok_uploader import aio
+        Config.get()._insert_option("SIGNER_MODE", "vm")
+        Config.get()._insert_option("UPLOAD_ADAPTIVE", "0")
+        local = f"http://127.0.0.1:{port}"
+
+        class LocalClient(aio.AsyncClient):
+            """Sends every request of the flow to the stand-in."""
+
+            async def request(self, method, url, **kwargs):
+                url = url.replace("https://www.tiktok.com", local).replace(f"https://{UPLOAD_HOST}", local)
+                return await super().request(method, url, **kwargs)
+
+        for _ in range(100):
+            try:
+                socket.create_connection(("127.0.0.1", port)).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+
+        async def run():
+            peak_threads = 0
+            uploads = [dict(session_user=f"bench{i}", video="bench.mp4", title=f"bench #{i} @someone",
+                            client=LocalClient()) for i in range(args.uploads)]
+
+            async def watch():
+                nonlocal peak_threads
+                while True:
+                    peak_threads = max(peak_threads, threading.active_count())
+                    await asyncio.sleep(0.05)
+
+            watcher = asyncio.ensure_future(watch())
+            start = time.perf_counter()
+            results = await aio.upload_many_async(uploads, args.concurrency)
+            elapsed = time.perf_counter() - start
+            watcher.cancel()
+            for kwargs in uploads:
+                await kwargs["client"].close()
+            return results, elapsed, peak_threads
+
+        results, elapsed, peak_threads = asyncio.run(run())
+        ok = sum(1 for result in results if result is True)
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"uploads={args.uploads} ok={ok} concurrency={args.concurrency} time={elapsed:.2f} s "
+              f"goodput={args.uploads * args.size_mb / elapsed:.1f} MB/s threads<={peak_threads} peak_rss={peak_rss:.0f} MB")
+        for result in results:
+            if result is not True:
+                print(f"failed upload: {result!r}")
+                break
+    finally:
+        server.terminate()
+        os.chdir("/")
+        work.cleanup()
+
+
+if __name__ == "__main__":
+    main()
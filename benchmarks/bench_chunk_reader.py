@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for the streaming chunk reader used by `upload_to_tiktok`.
+
+Creates a sparse synthetic video of --size-gb gigabytes, walks it part by part
+(CRC32 included) and reports peak RSS. --compare-read also runs the previous
+read-everything-then-slice approach, which needs about twice the file size in
+memory: only use it with sizes that fit in RAM.
+
+Usage: python benchmarks/bench_chunk_reader.py [--size-gb 4] [--compare-read]
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1048576
+
+
+def run_streaming(path):
+    from tiktok_uploader.transfer import iter_parts
+    parts = 0
+    for _, chunk, _ in iter_parts(path):
+        parts += 1
+    return parts
+
+
+def run_read_all(path):
+    from tiktok_uploader.bot_utils import crc32
+    from tiktok_uploader.transfer import CHUNK_SIZE
+    with open(path, "rb") as f:
+        video_content = f.read()
+    chunks = [video_content[i: i + CHUNK_SIZE] for i in range(0, len(video_content), CHUNK_SIZE)]
+    for chunk in chunks:
+        crc32(chunk)
+    return len(chunks)
+
+
+def measure(mode, path):
+    """Run one mode in a fresh interpreter so peak RSS is not shared."""
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", mode, path],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return output.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk reader memory benchmark")
+    parser.add_argument("--size-gb", type=float, default=4)
+    parser.add_argument("--compare-read", action="store_true")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, path = args.child
+        # Baseline after imports: only the reader itself is measured.
+        import tiktok_uploader.transfer
+        baseline = peak_rss_mb()
+        start = time.perf_counter()
+        parts = run_streaming(path) if mode == "streaming" else run_read_all(path)
+        elapsed = time.perf_counter() - start
+        print(f"{mode:<10} parts={parts:<6} time={elapsed:7.2f} s  "
+              f"peak_rss={peak_rss_mb():8.1f} MB  (+{peak_rss_mb() - baseline:.1f} MB over interpreter)")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.mp4")
+        with open(path, "wb") as f:
+            f.truncate(int(args.size_gb * 1024 ** 3))
+        print(f"Synthetic file: {args.size_gb} GB")
+        print(measure("streaming", path))
+        if args.compare_read:
+            print(measure("read_all", path))
+
+
+if __name__ == "__main__":
+    main()
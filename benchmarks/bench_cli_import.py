@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+CLI startup benchmark.
+
+Runs every cli.py subcommand so that it stops before any network call
+(login of an account already saved, no video, no manifest) with
+`python -X importtime` in a scratch directory, and reports per subcommand
+the wall time of the run, the time spent importing modules and the heavy
+dependencies (Chrome driver, moviepy, pytube) it imported.
+
+Usage: python benchmarks/bench_cli_import.py [--runs 3] [--top 5]
+"""
+
+import argparse
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("undetected_chromedriver", "selenium", "moviepy", "pytube")
+
+COMMANDS = [
+    ("login (session saved)", ["login", "-n", "saved"]),
+    ("upload (missing video)", ["upload", "-u", "saved", "-v", "missing.mp4", "-t", "title"]),
+    ("batch (missing manifest)", ["batch", "-m", "missing.csv"]),
+    ("enqueue (missing manifest)", ["enqueue", "-m", "missing.csv"]),
+    ("worker --once", ["worker", "--once"]),
+    ("check-sessions", ["check-sessions", "-u", "nobody"]),
+    ("show -u", ["show", "-u"]),
+    ("show -v", ["show", "-v"]),
+]
+
+
+def parse_importtime(stderr):
+    """(module -> (self us, cumulative us)) from the -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def run(args, cwd):
+    start = time.perf_counter()
+    p = subprocess.run([sys.executable, "-X", "importtime", os.path.join(ROOT, "cli.py")] + args,
+                       cwd=cwd, capture_output=True, text=True)
+    return time.perf_counter() - start, parse_importtime(p.stderr)
+
+
+def timed_interpreter():
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI startup benchmark")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per subcommand, the fastest is reported")
+    parser.add_argument("--top", type=int, default=5, help="Slowest top-level imports shown per subcommand")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in ("config.txt", ".env"):
+            if os.path.exists(os.path.join(ROOT, name)):
+                shutil.copy(os.path.join(ROOT, name), tmp)
+        os.makedirs(os.path.join(tmp, "VideosDirPath"))
+        os.makedirs(os.path.join(tmp, "CookiesDir"))
+        with open(os.path.join(tmp, "CookiesDir", "tiktok_session-saved.cookie"), "wb") as f:
+            pickle.dump([{"name": "sessionid", "value": "S"}], f)
+
+        interpreter = min(timed_interpreter() for _ in range(args.runs))
+        print(f"{'interpreter alone':<28} {interpreter * 1000:7.0f} ms")
+        for label, command in COMMANDS:
+            wall, modules = min((run(command, tmp) for _ in range(args.runs)), key=lambda r: r[0])
+            imports = sum(self_us for self_us, _ in modules.values()) / 1000
+            heavy = [m for m in HEAVY_MODULES if m in modules]
+            print(f"{label:<28} {wall * 1000:7.0f} ms, imports {imports:7.0f} ms, heavy: {', '.join(heavy) or 'none'}")
+            top = sorted(((cumulative, name) for name, (_, cumulative) in modules.items() if "." not in name),
+                         reverse=True)[:args.top]
+            for cumulative, name in top:
+                print(f"    {name:<32} {cumulative / 1000:7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
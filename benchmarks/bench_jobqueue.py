@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the SQLite job queue.
+
+Fills a fresh queue with --history finished jobs, then times enqueueing
+--jobs jobs (one by one and in batches of --batch), and claiming and
+finishing them (one by one and --batch at a time), as a worker does.
+
+Usage: python benchmarks/bench_jobqueue.py [--history 1000000] [--jobs 5000] [--batch 64]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def fill_history(jobs, count):
+    fields = json.dumps({"session_user": "old", "video": "old.mp4", "title": "old"})
+    now = time.time()
+    with jobs._transaction():
+        jobs.db.executemany("INSERT INTO jobs (account, fields, status, attempts, enqueued_at, finished_at, seconds) "
+                            "VALUES (?, ?, 'done', 1, ?, ?, 1.0)",
+                            ((f"old{i % 1000}", fields, now, now) for i in range(count)))
+
+
+def main():
+    from tiktok_uploader.jobqueue import JobQueue
+
+    parser = argparse.ArgumentParser(description="Job queue benchmark")
+    parser.add_argument("--history", type=int, default=1000000)
+    parser.add_argument("--jobs", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=64)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, JobQueue(os.path.join(tmp, "jobs.sqlite3")) as jobs:
+        start = time.perf_counter()
+        fill_history(jobs, args.history)
+        print(f"history    {args.history} finished jobs in {time.perf_counter() - start:.1f} s")
+
+        def fields(i):
+            return {"session_user": f"acct{i % 300}", "video": f"video{i}.mp4", "title": f"video {i}"}
+
+        for batch in (1, args.batch):
+            start = time.perf_counter()
+            for first in range(0, args.jobs, batch):
+                jobs.enqueue([(None, fields(i), i % 3) for i in range(first, min(first + batch, args.jobs))])
+            elapsed = time.perf_counter() - start
+            print(f"enqueue    batch={batch:<4} {args.jobs / elapsed:9.0f} jobs/s")
+
+        for batch in (1, args.batch):
+            start = time.perf_counter()
+            claimed = 0
+            while claimed < args.jobs:
+                batch_jobs = jobs.claim("bench", batch, lease=600)
+                jobs.finish("bench", [(job, {"status": "ok", "seconds": 1.0}) for job in batch_jobs])
+                claimed += len(batch_jobs)
+            elapsed = time.perf_counter() - start
+            print(f"claim+done batch={batch:<4} {claimed / elapsed:9.0f} jobs/s")
+        print(f"final      {jobs.counts()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Validate and benchmark the parallel part uploader against a local stand-in for
+the TikTok upload host.
+
+The stand-in accepts ``phase=transfer`` and ``phase=finish`` POSTs like the
+real host, simulates a round trip time, a per-connection and a total bandwidth cap, fails a share of
+requests at random and checks every part against its Content-Crc32 header.
+After each run the received parts are reassembled and compared with the
+source file.
+
+--adaptive N uploads the file N times with the part size and parallelism
+picked by TransferTuner, which learns from every run, to show how fast it
+converges on a given link profile, e.g. a slow residential proxy
+(--rtt-ms 300 --mbps 4 --total-mbps 10) or a datacenter link
+(--rtt-ms 10 --mbps 200 --total-mbps 1000).
+
+Usage: python benchmarks/bench_parallel_upload.py [--size-mb 100] [--rtt-ms 80]
+       [--mbps 40] [--total-mbps 0] [--failure-rate 0.05] [--parallelism 1 2 4 8]
+       [--adaptive 10]
+"""
+
+import argparse
+import hashlib
+import http.server
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StandInUploadHost:
+    """Threaded local HTTP server answering part uploads like the upload host."""
+
+    def __init__(self, rtt=0.0, mbps=0.0, failure_rate=0.0, total_mbps=0.0, handshake=0.0):
+        self.rtt = rtt
+        self.handshake = handshake
+        self.bytes_per_second = mbps * 1_000_000 / 8 if mbps else 0
+        self.total_bytes_per_second = total_mbps * 1_000_000 / 8 if total_mbps else 0
+        self.failure_rate = failure_rate
+        self.parts = {}
+        self.requests = 0
+        self.connections = 0
+        self.active = 0
+        self.lock = threading.Lock()
+        host = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # One write per response: no delayed-ACK stalls on kept-alive connections.
+            wbufsize = 65536
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                with host.lock:
+                    host.connections += 1
+                # Stands for the TCP and TLS handshakes of a new connection.
+                time.sleep(host.handshake)
+                super().setup()
+
+            def do_POST(self):
+                query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, payload = host.handle(query, body, self.headers.get("Content-Crc32"))
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def address(self):
+        return f"127.0.0.1:{self.server.server_port}"
+
+    def handle(self, query, body, crc_header):
+        with self.lock:
+            self.requests += 1
+            self.active += 1
+            # Connections share the total bandwidth as they start.
+            rates = [self.bytes_per_second, self.total_bytes_per_second / self.active]
+        rate = min((r for r in rates if r), default=0)
+        time.sleep(self.rtt + (len(body) / rate if rate else 0))
+        with self.lock:
+            self.active -= 1
+        if query.get("phase") == ["finish"]:
+            return 200, b'{"code":2000,"apiversion":"v1","message":"Success","data":{}}'
+        if random.random() < self.failure_rate:
+            return 500, b'{"code":5000,"message":"stand-in failure"}'
+        crc = "%08x" % (zlib.crc32(body) & 0xFFFFFFFF)
+        if crc != crc_header:
+            return 400, b'{"code":4000,"message":"crc mismatch"}'
+        with self.lock:
+            self.parts[(query["uploadID"][0], int(query["partNumber"][0]))] = body
+        return 200, ('{"code":2000,"apiversion":"v1","message":"Success","data":{"crc32":"%s"}}' % crc).encode()
+
+    def assembled(self, upload_id):
+        numbers = sorted(n for (uid, n) in self.parts if uid == upload_id)
+        return b"".join(self.parts[(upload_id, n)] for n in numbers)
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def adaptive_runs(host, path, size_mb, runs, state_path):
+    import requests
+    from tiktok_uploader.transfer import upload_parts
+    from tiktok_uploader.tuning import TransferTuner
+
+    tuner = TransferTuner(state_path)
+    for run in range(1, runs + 1):
+        chunk_size, parallelism = tuner.plan(host.address, None, os.path.getsize(path))
+        samples = []
+        start = time.perf_counter()
+        crcs = upload_parts(requests.Session(), f"http://{host.address}/store", str(uuid.uuid4()), "auth", path,
+                            chunk_size, parallelism, retries=5, backoff=0.05, samples=samples)
+        elapsed = time.perf_counter() - start
+        tuner.record(host.address, None, parallelism, samples, elapsed)
+        print(f"run={run:<3} part={chunk_size / 1048576:5.0f} MiB  parallelism={parallelism:<3} "
+              f"{size_mb / elapsed:8.2f} MB/s  time={elapsed:7.2f} s  {'ok' if crcs else 'FAILED'}")
+
+
+def main():
+    import requests
+    from tiktok_uploader.transfer import CHUNK_SIZE, upload_parts
+
+    parser = argparse.ArgumentParser(description="Parallel part upload benchmark")
+    parser.add_argument("--size-mb", type=int, default=100)
+    parser.add_argument("--rtt-ms", type=float, default=80)
+    parser.add_argument("--mbps", type=float, default=40, help="Bandwidth cap per connection")
+    parser.add_argument("--total-mbps", type=float, default=0, help="Bandwidth cap shared by all connections")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--parallelism", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--adaptive", type=int, metavar="RUNS", help="Let TransferTuner pick part size and parallelism")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            StandInUploadHost(args.rtt_ms / 1000, args.mbps, args.failure_rate, args.total_mbps) as host:
+        path = os.path.join(tmp, "video.mp4")
+        with open(path, "wb") as f:
+            f.write(os.urandom(args.size_mb * 1024 * 1024))
+        if args.adaptive:
+            adaptive_runs(host, path, args.size_mb, args.adaptive, os.path.join(tmp, "transfer_tuning.json"))
+            return
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+
+        for parallelism in args.parallelism:
+            session = requests.Session()
+            upload_id = str(uuid.uuid4())
+            start = time.perf_counter()
+            crcs = upload_parts(session, f"http://{host.address}/store", upload_id, "auth", path,
+                                CHUNK_SIZE, parallelism, retries=5, backoff=0.05)
+            elapsed = time.perf_counter() - start
+            intact = crcs is not None and hashlib.sha256(host.assembled(upload_id)).hexdigest() == digest
+            print(f"parallelism={parallelism:<3} {args.size_mb / elapsed:8.2f} MB/s  time={elapsed:7.2f} s  "
+                  f"parts={len(crcs) if crcs else 0:<4} file {'intact' if intact else 'CORRUPTED'}")
+
+
+if __name__ == "__main__":
+    main()
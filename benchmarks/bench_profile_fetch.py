@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Profile page fetch benchmark for @mention resolution.
+
+Serves profile pages from a local server limited to --mbps, then resolves
+each of them --rounds times the old way (whole page through `r.text` and two
+splits) and with `bot_utils.fetch_user_id`, which streams the page and drops
+the connection once the account id went by. Reports latency and the bytes
+the server sent per lookup.
+
+Pages are the saved profile HTML files given with --pages; without any, a
+synthetic 400 KB page with the user-detail data 60 KB in is used.
+
+Usage: python benchmarks/bench_profile_fetch.py [--pages saved/*.html] [--mbps 20] [--rounds 5]
+"""
+
+import argparse
+import http.server
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def synthetic_page():
+    from tiktok_uploader.bot_utils import UserIdScanner
+    head = b"<!DOCTYPE html><html><head>" + b"<link rel=\"preload\" href=\"/x.js\">" * 1800 + b"</head><body>"
+    data = b'<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__">{"__DEFAULT_SCOPE__":{"' + UserIdScanner.MARKER + \
+        b'6812345678901234567","uniqueId":"someone"}}}}</script>'
+    tail = b"<script>" + b"var a=1;" * 42000 + b"</script></body></html>"
+    return head + data + tail
+
+
+class PageServer(http.server.ThreadingHTTPServer):
+    """Serves `pages` (name -> bytes) at ``/@name``, at most `mbps` per response."""
+
+    daemon_threads = True
+
+    def __init__(self, pages, mbps):
+        self.pages = pages
+        self.mbps = mbps
+        self.sent = 0
+        self.lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), _PageHandler)
+
+
+class _PageHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        page = self.server.pages[self.path.split("@", 1)[1]]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(page)))
+        self.end_headers()
+        block = 16384
+        try:
+            for i in range(0, len(page), block):
+                self.wfile.write(page[i:i + block])
+                with self.server.lock:
+                    self.server.sent += len(page[i:i + block])
+                time.sleep(block * 8 / (self.server.mbps * 1e6))
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+
+def main():
+    import requests
+    from tiktok_uploader.bot_utils import fetch_user_id, profile_headers, profile_url
+
+    parser = argparse.ArgumentParser(description="Profile fetch benchmark")
+    parser.add_argument("--pages", nargs="*", default=[])
+    parser.add_argument("--mbps", type=float, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = {}
+    for path in args.pages:
+        with open(path, "rb") as f:
+            pages[os.path.splitext(os.path.basename(path))[0]] = f.read()
+    pages = pages or {"synthetic": synthetic_page()}
+
+    server = PageServer(pages, args.mbps)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    class LocalSession(requests.Session):
+        def request(self, method, url, *a, **kw):
+            return super().request(method, url.replace("https://www.tiktok.com", base), *a, **kw)
+
+    def full_page(name, session):
+        r = session.request("GET", profile_url(name), headers=profile_headers())
+        return r.text.split('webapp.user-detail":{"userInfo":{"user":{"id":"')[1].split('"')[0]
+
+    print(f"{len(pages)} page(s), {sum(map(len, pages.values())) / len(pages) / 1024:.0f} KB on average, {args.mbps:g} Mbps")
+    for name, fetch in (("full page", full_page), ("streamed", fetch_user_id)):
+        session = LocalSession()
+        times = []
+        server.sent = 0
+        for _ in range(args.rounds):
+            for page in pages:
+                start = time.perf_counter()
+                assert fetch(page, session)
+                times.append(time.perf_counter() - start)
+        # Let the server notice the dropped connections.
+        time.sleep(0.2)
+        print(f"{name:<10} {sum(times) / len(times) * 1000:7.1f} ms/lookup  "
+              f"{server.sent / len(times) / 1024:6.0f} KB sent/lookup")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Multi-account dispatch benchmark for the upload scheduler.
+
+Simulates a TikTok that lets every account post --limit times per hour
+(sliding window) and answers "You are posting too fast" beyond that. An
+hour lasts --hour seconds and an upload --upload-ms. --accounts accounts post
+--posts each, except --hot of them that post --hot-posts each, all queued
+account by account as a manifest usually is.
+
+"fifo" is a plain thread pool that sleeps out the cooldown in the worker and
+retries; "scheduler" goes through `UploadScheduler` with the per-account rate
+set to fit within the limit. Reports the time to post everything against the
+lower bound the per-account limit allows, and the throttles hit.
+
+Usage: python benchmarks/bench_scheduler.py [--accounts 300] [--workers 32] [--hour 2]
+"""
+
+import argparse
+import collections
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StandInTikTok:
+    """Posting endpoint with a per-account sliding window limit."""
+
+    def __init__(self, limit, hour, upload_seconds):
+        self.limit = limit
+        self.hour = hour
+        self.upload_seconds = upload_seconds
+        self.posts = collections.defaultdict(collections.deque)
+        self.throttles = 0
+        self.lock = threading.Lock()
+
+    def post(self, account):
+        from tiktok_uploader.scheduler import PostingTooFast
+        time.sleep(self.upload_seconds)
+        with self.lock:
+            now = time.monotonic()
+            window = self.posts[account]
+            while window and now - window[0] >= self.hour:
+                window.popleft()
+            if len(window) >= self.limit:
+                self.throttles += 1
+                raise PostingTooFast("You are posting too fast. Take a rest.")
+            window.append(now)
+        return True
+
+
+def fifo(host, jobs, workers, cooldown):
+    from tiktok_uploader.scheduler import PostingTooFast
+
+    def post(account):
+        while True:
+            try:
+                return host.post(account)
+            except PostingTooFast:
+                time.sleep(cooldown)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        wait([executor.submit(post, account) for account in jobs])
+
+
+def scheduled(host, jobs, workers, cooldown, limit, hour, burst):
+    from tiktok_uploader.scheduler import UploadScheduler
+    # `burst` posts up front and `limit - burst` refills per hour never
+    # exceed `limit` in any window of an hour.
+    posts_per_hour = (limit - burst) * 3600 / hour
+    with UploadScheduler(workers, posts_per_hour=posts_per_hour, burst=burst, global_posts_per_hour=0,
+                         cooldown=cooldown, throttle_retries=100) as scheduler:
+        wait([scheduler.submit(account, host.post, account) for account in jobs])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload scheduler benchmark")
+    parser.add_argument("--accounts", type=int, default=300)
+    parser.add_argument("--posts", type=int, default=3)
+    parser.add_argument("--hot", type=int, default=10)
+    parser.add_argument("--hot-posts", type=int, default=12)
+    parser.add_argument("--limit", type=int, default=4)
+    parser.add_argument("--burst", type=int, default=1)
+    parser.add_argument("--hour", type=float, default=2.0)
+    parser.add_argument("--upload-ms", type=float, default=20)
+    parser.add_argument("--workers", type=int, default=32)
+    args = parser.parse_args()
+
+    counts = {f"acct{i:04d}": args.hot_posts if i < args.hot else args.posts for i in range(args.accounts)}
+    jobs = [account for account, posts in counts.items() for _ in range(posts)]
+    upload_seconds = args.upload_ms / 1000
+    # An account needs one more hour for every `limit` posts after its first batch.
+    bound = max(max((n - 1) // args.limit * args.hour for n in counts.values()) + upload_seconds,
+                len(jobs) * upload_seconds / args.workers)
+    cooldown = args.hour / 4
+    print(f"{len(jobs)} posts over {args.accounts} accounts, lower bound {bound:.2f} s")
+
+    for name in ("fifo", "scheduler"):
+        host = StandInTikTok(args.limit, args.hour, upload_seconds)
+        start = time.perf_counter()
+        if name == "fifo":
+            fifo(host, jobs, args.workers, cooldown)
+        else:
+            scheduled(host, jobs, args.workers, cooldown, args.limit, args.hour, args.burst)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<10} time={elapsed:6.2f} s ({elapsed / bound:4.2f}x bound) "
+              f"posts/s={len(jobs) / elapsed:6.1f} throttles={host.throttles}")
+
+
+if __name__ == "__main__":
+    main()
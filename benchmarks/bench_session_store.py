@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Session store benchmark at many accounts.
+
+Writes --accounts cookie files (--cookies cookies each) as `cli.py login`
+used to, then compares listing the accounts and loading --lookups random
+ones from the files against the session store, which is filled by importing
+those files once.
+
+Usage: python benchmarks/bench_session_store.py [--accounts 10000] [--lookups 2000]
+"""
+
+import argparse
+import os
+import pickle
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def cookie_list(i, count):
+    return [{"name": f"cookie{j}", "value": f"{i:08x}" * 8, "domain": ".tiktok.com", "path": "/",
+             "secure": True, "httpOnly": j % 2 == 0, "sameSite": "None", "expiry": 1900000000}
+            for j in range(count)]
+
+
+def timed(label, fn, count=1):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    per = f"{elapsed / count * 1e6:8.1f} us each" if count > 1 else ""
+    print(f"{label:<32} {elapsed * 1000:9.1f} ms {per}")
+    return result
+
+
+def main():
+    from tiktok_uploader.cookies import load_cookies_from_file
+    from tiktok_uploader.session_store import SessionStore
+
+    parser = argparse.ArgumentParser(description="Session store benchmark")
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--cookies", type=int, default=30)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cookies_dir = os.path.join(tmp, "CookiesDir")
+        os.makedirs(cookies_dir)
+        names = [f"tiktok_session-acct{i:05d}" for i in range(args.accounts)]
+        for i, name in enumerate(names):
+            with open(os.path.join(cookies_dir, name + ".cookie"), "wb") as f:
+                pickle.dump(cookie_list(i, args.cookies), f)
+        lookups = random.Random(1).choices(names, k=args.lookups)
+        print(f"{args.accounts} accounts, {args.cookies} cookies each")
+
+        timed("files: list accounts", lambda: [n for n in os.listdir(cookies_dir) if n.startswith("tiktok_session-")])
+        timed("files: load", lambda: [load_cookies_from_file(n, cookies_dir) for n in lookups], args.lookups)
+
+        path = os.path.join(tmp, "sessions.sqlite3")
+        store = SessionStore(path, cookies_dir)
+        timed("store: import cookie files", store.import_cookie_files)
+        timed("store: list accounts", lambda: store.names("tiktok_session-"))
+        cold = SessionStore(path, cookies_dir)
+        timed("store: load (new process)", lambda: [cold.load(n) for n in lookups], args.lookups)
+        timed("store: load (cached)", lambda: [cold.load(n) for n in lookups], args.lookups)
+        timed("store: save", lambda: [store.save(n, cookie_list(0, args.cookies)) for n in lookups[:500]], 500)
+        timed("store: load after other's saves", lambda: [cold.load(n) for n in lookups], args.lookups)
+
+
+if __name__ == "__main__":
+    main()
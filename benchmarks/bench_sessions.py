@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Connection reuse benchmark for the shared HTTP sessions.
+
+Runs --uploads consecutive simulated uploads (--parts part POSTs and the
+phase=finish call each) against the local stand-in upload host, first the
+old way (a new requests.Session per upload and a bare requests.post for
+finish), then through `http_sessions.get_session`. Every connection opened
+is one TCP and TLS handshake, simulated as three round trips.
+
+Usage: python benchmarks/bench_sessions.py [--uploads 10] [--parts 4] [--rtt-ms 50]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def simulated_upload(session, base_url, parts, post=None):
+    for part_number in range(1, parts + 1):
+        session.post(f"{base_url}?partNumber={part_number}&uploadID=bench&phase=transfer",
+                     headers={"Content-Crc32": "00000000"}, data=b"")
+    (post or session.post)(f"{base_url}?uploadID=bench&phase=finish", headers={"Content-Crc32": "00000000"}, data=b"")
+
+
+def main():
+    import requests
+    from bench_parallel_upload import StandInUploadHost
+    from tiktok_uploader.http_sessions import get_session
+
+    parser = argparse.ArgumentParser(description="Shared session benchmark")
+    parser.add_argument("--uploads", type=int, default=10)
+    parser.add_argument("--parts", type=int, default=4)
+    parser.add_argument("--rtt-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    for name in ("per-upload", "shared"):
+        with StandInUploadHost(rtt=args.rtt_ms / 1000, handshake=3 * args.rtt_ms / 1000) as host:
+            base_url = f"http://{host.address}/store"
+            start = time.perf_counter()
+            for _ in range(args.uploads):
+                if name == "shared":
+                    simulated_upload(get_session("bench"), base_url, args.parts)
+                else:
+                    with requests.Session() as session:
+                        simulated_upload(session, base_url, args.parts, post=requests.post)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<10} uploads={args.uploads:<4} requests={host.requests:<5} "
+                  f"connections={host.connections:<5} time={elapsed:6.2f} s")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark signing latency: one-shot `browser.js` subprocess per call versus the
+long-lived `listen.js` signer daemon, and signer cluster throughput.
+
+Usage: python benchmarks/bench_signer.py [-n 5] [--workers auto --concurrency 16]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tiktok_uploader.bot_utils import SignerDaemon, subprocess_jsvmp, _SIGNATURE_DIR
+from tiktok_uploader.profiles import new_profile
+
+TEST_URL = "https://www.tiktok.com/api/v1/web/project/post/?app_name=tiktok_web&channel=tiktok_web&device_platform=web&aid=1988&msToken=bench"
+
+
+def timed(func, runs):
+    samples = []
+    failures = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        if func() is None:
+            failures += 1
+        samples.append(time.perf_counter() - start)
+    return samples, failures
+
+
+def report(name, samples, failures):
+    print(f"{name:<24} runs={len(samples):<3} failures={failures:<3} "
+          f"mean={statistics.mean(samples) * 1000:9.1f} ms  "
+          f"median={statistics.median(samples) * 1000:9.1f} ms  "
+          f"max={max(samples) * 1000:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Signer latency benchmark")
+    parser.add_argument("-n", "--runs", type=int, default=5)
+    parser.add_argument("--workers", default="0", help="Signer cluster workers, 0 for in-process signing")
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=0, help="Parallel clients for the throughput run")
+    parser.add_argument("--mode", default="browser", choices=["browser", "vm"])
+    parser.add_argument("--skip-subprocess", action="store_true")
+    args = parser.parse_args()
+
+    # What upload_video signs with: the user agent and profile of each
+    # simulated account, the same for all of its signatures.
+    profiles = [new_profile() for _ in range(max(1, args.concurrency))]
+    profile = profiles[0]
+
+    js_path = os.path.join(_SIGNATURE_DIR, "browser.js")
+    if not args.skip_subprocess:
+        samples, failures = timed(lambda: subprocess_jsvmp(js_path, profile["user_agent"], TEST_URL, args.mode, profile=profile), args.runs)
+        report("subprocess per call", samples, failures)
+
+    daemon = SignerDaemon(args=["--workers", args.workers, "--pages", str(args.pages)])
+    start = time.perf_counter()
+    daemon.start()
+    cold = daemon.sign(profile["user_agent"], TEST_URL, args.mode, profile)
+    print(f"{'daemon cold start':<24} {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"({'ok' if cold else 'failed'})")
+    samples, failures = timed(lambda: daemon.sign(profile["user_agent"], TEST_URL, args.mode, profile), args.runs)
+    report("daemon warm", samples, failures)
+
+    if args.concurrency:
+        # One profile per simulated account.
+        total = args.runs * args.concurrency
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = list(pool.map(lambda i: daemon.sign(profiles[i % args.concurrency]["user_agent"], TEST_URL, args.mode, profiles[i % args.concurrency]), range(total)))
+        elapsed = time.perf_counter() - start
+        failures = sum(result is None for result in results)
+        print(f"{'throughput':<24} {total / elapsed:.1f} signatures/s "
+              f"(concurrency={args.concurrency}, failures={failures})")
+        print(json.dumps(daemon.stats(), indent=2))
+    daemon.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,4 @@
 import argparse
-from tiktok_uploader import tiktok, Video
 from tiktok_uploader.basics import eprint
 from tiktok_uploader.Config import Config
 import sys, os
@@ -30,6 +29,42 @@ if __name__ == "__main__":
     upload_parser.add_argument("-ai", "--ailabel", type=int, default=0)
     upload_parser.add_argument("-p", "--proxy", default="")
 
+    # Batch subcommand.
+    batch_parser = subparsers.add_parser("batch", help="Upload every row of a manifest (.jsonl or .csv) with a pool of workers")
+    batch_parser.add_argument("-m", "--manifest", help="Rows with account, video or youtube, title, schedule, comment, duet, stitch, visibility, proxy...", required=True)
+    batch_parser.add_argument("-w", "--workers", type=int, default=4, help="Uploads running in parallel")
+    batch_parser.add_argument("-r", "--results", help="Per-row results file, <manifest>.results.jsonl by default")
+    batch_parser.add_argument("--check", action="store_true", help="Check the sessions of the manifest's accounts first, and skip the invalid ones")
+
+    # Enqueue subcommand.
+    enqueue_parser = subparsers.add_parser("enqueue", help="Add uploads to the job queue, for a worker to upload")
+    enqueue_parser.add_argument("-m", "--manifest", help="Queue every row of a manifest (.jsonl or .csv), rows already queued are skipped")
+    enqueue_parser.add_argument("-u", "--users", help="Enter cookie name from login")
+    enqueue_parser.add_argument("-v", "--video", help="Path to video file")
+    enqueue_parser.add_argument("-yt", "--youtube", help="Enter Youtube URL")
+    enqueue_parser.add_argument("-t", "--title", help="Title of the video")
+    enqueue_parser.add_argument("-sc", "--schedule", type=int, help="Schedule time in seconds")
+    enqueue_parser.add_argument("-ct", "--comment", type=int, choices=[0, 1])
+    enqueue_parser.add_argument("-d", "--duet", type=int, choices=[0, 1])
+    enqueue_parser.add_argument("-st", "--stitch", type=int, choices=[0, 1])
+    enqueue_parser.add_argument("-vi", "--visibility", type=int, help="Visibility type: 0 for public, 1 for private")
+    enqueue_parser.add_argument("-bo", "--brandorganic", type=int)
+    enqueue_parser.add_argument("-bc", "--brandcontent", type=int)
+    enqueue_parser.add_argument("-ai", "--ailabel", type=int)
+    enqueue_parser.add_argument("-p", "--proxy")
+    enqueue_parser.add_argument("--priority", type=int, default=0, help="Higher priority jobs are uploaded first")
+
+    # Worker subcommand.
+    worker_parser = subparsers.add_parser("worker", help="Upload the jobs of the job queue as they come in")
+    worker_parser.add_argument("-w", "--workers", type=int, default=4, help="Uploads running in parallel")
+    worker_parser.add_argument("--once", action="store_true", help="Exit once the queue has nothing left to upload")
+
+    # Check sessions subcommand.
+    check_parser = subparsers.add_parser("check-sessions", help="Check that the saved sessions are still logged in")
+    check_parser.add_argument("-u", "--users", nargs="*", help="Cookie names to check, all saved ones by default")
+    check_parser.add_argument("-w", "--workers", type=int, default=16, help="Checks running in parallel")
+    check_parser.add_argument("-p", "--proxy", default=None)
+
     # Show cookies
     show_parser = subparsers.add_parser("show", help="Show users and videos available for system.")
     show_parser.add_argument("-u", "--users", action='store_true', help="Shows all available cookie names")
@@ -44,6 +79,7 @@ if __name__ == "__main__":
         # Name of file to save the session id.
         login_name = args.name
         # Name of file to save the session id.
+        from tiktok_uploader import tiktok
         tiktok.login(login_name)
 
     elif args.subcommand == "upload":
@@ -60,6 +96,8 @@ if __name__ == "__main__":
             sys.exit(1)
 
         if args.youtube:
+            # moviepy and pytube are only imported for YouTube sources.
+            from tiktok_uploader.Video import Video
             video_obj = Video(args.youtube, args.title)
             video_obj.is_valid_file_format()
             video = video_obj.source_ref
@@ -73,16 +111,63 @@ if __name__ == "__main__":
                     print(f'[-] {name}')
                 sys.exit(1)
 
+        from tiktok_uploader import tiktok
         tiktok.upload_video(args.users, args.video,  args.title, args.schedule, args.comment, args.duet, args.stitch, args.visibility, args.brandorganic, args.brandcontent, args.ailabel, args.proxy)
 
+    elif args.subcommand == "batch":
+        from tiktok_uploader.batch import run_batch
+        try:
+            succeeded, failed, skipped = run_batch(args.manifest, args.workers, args.results, check=args.check)
+        except (OSError, ValueError) as e:
+            eprint(f"Could not read manifest: {str(e)}")
+            sys.exit(1)
+        print(f"Batch finished: {succeeded} uploaded, {failed} failed, {skipped} skipped (already uploaded)")
+        if failed:
+            sys.exit(1)
+
+    elif args.subcommand == "enqueue":
+        from tiktok_uploader.batch import BatchJob, load_manifest
+        from tiktok_uploader.jobqueue import JobQueue
+        try:
+            if args.manifest:
+                # Rows are keyed by their id: queueing a manifest again only adds new rows.
+                rows = [(job.row_id, job.fields, job.priority) for job in load_manifest(args.manifest)]
+            else:
+                row = {"account": args.users, "video": args.video, "youtube": args.youtube, "title": args.title,
+                       "schedule": args.schedule, "comment": args.comment, "duet": args.duet, "stitch": args.stitch,
+                       "visibility": args.visibility, "brandorganic": args.brandorganic, "brandcontent": args.brandcontent,
+                       "ailabel": args.ailabel, "proxy": args.proxy}
+                rows = [(None, BatchJob.from_row(0, row).fields, args.priority)]
+        except (OSError, ValueError) as e:
+            eprint(f"Could not queue uploads: {str(e)}")
+            sys.exit(1)
+        with JobQueue() as jobs:
+            added = jobs.enqueue(rows)
+            print(f"[+] {added} uploads queued ({len(rows) - added} already in the queue), {jobs.counts().get('queued', 0)} waiting")
+
+    elif args.subcommand == "worker":
+        from tiktok_uploader.jobqueue import run_worker
+        succeeded, failed = run_worker(args.workers, once=args.once)
+        print(f"Worker stopped: {succeeded} uploaded, {failed} failed")
+
+    elif args.subcommand == "check-sessions":
+        from tiktok_uploader.health import check_sessions
+        results = check_sessions(args.users or None, args.workers, args.proxy)
+        for account, result in sorted(results.items()):
+            latency = f"{result['latency'] * 1000:.0f} ms" if result["latency"] is not None else "-"
+            print(f"[{'+' if result['status'] == 'ok' else '-'}] {account:<30} {result['status']:<8} {latency:>8}  {result['error'] or ''}")
+        bad = sum(result["status"] != "ok" for result in results.values())
+        print(f"{len(results) - bad}/{len(results)} sessions valid")
+        if bad:
+            sys.exit(1)
+
     elif args.subcommand == "show":
         # if flag is c then show cookie names
         if args.users:
+            from tiktok_uploader.session_store import SessionStore
             print("User Names logged in: ")
-            cookie_dir = os.path.join(os.getcwd(), Config.get().cookies_dir)
-            for name in os.listdir(cookie_dir):
-                if name.startswith("tiktok_session-"):
-                    print(f'[-] {name.split("tiktok_session-")[1]}')
+            for name in SessionStore.get().names("tiktok_session-"):
+                print(f'[-] {name.split("tiktok_session-")[1]}')
 
         # if flag is v then show video names
         if args.videos:
@@ -94,6 +179,6 @@ if __name__ == "__main__":
             print("No flag provided. Use -c (show all cookies) or -v (show all videos).")
 
     else:
-        eprint("Invalid subcommand. Use 'login' or 'upload' or 'show'.")
+        eprint("Invalid subcommand. Use 'login', 'upload', 'batch', 'enqueue', 'worker', 'check-sessions' or 'show'.")
 
 
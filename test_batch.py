@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test script for the manifest driven batch uploads
+"""
+
+import json
+import os
+import tempfile
+
+
+def test_batch_is_restartable():
+    """A second run of the same manifest only retries the rows that failed"""
+    print("Testing batch restart...")
+    from tiktok_uploader.batch import load_results, run_batch
+
+    calls = []
+
+    def upload(**fields):
+        calls.append(fields["session_user"])
+        return fields["session_user"] != "flaky" or calls.count("flaky") > 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = os.path.join(tmp, "jobs.jsonl")
+        with open(manifest, "w") as f:
+            for account in ("a", "flaky", "b"):
+                f.write(json.dumps({"account": account, "video": __file__, "title": "t", "schedule": "0"}) + "\n")
+
+        assert run_batch(manifest, workers=2, upload=upload) == (2, 1, 0)
+        assert run_batch(manifest, workers=2, upload=upload) == (1, 0, 2)
+        assert sorted(calls) == ["a", "b", "flaky", "flaky"]
+        results = load_results(manifest + ".results.jsonl")
+        assert all(result["status"] == "ok" and "seconds" in result for result in results.values())
+    print("[+] Only the failed row was uploaded again")
+    return True
+
+
+def test_csv_manifest():
+    """CSV manifests take the same columns, CLI names included"""
+    print("\nTesting CSV manifest...")
+    from tiktok_uploader.batch import load_manifest
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = os.path.join(tmp, "jobs.csv")
+        with open(manifest, "w") as f:
+            f.write("users,youtube,title,visibility\nme,https://youtu.be/x,hello,1\n")
+        job, = load_manifest(manifest)
+        assert job.line == 2
+        assert job.fields["session_user"] == "me" and job.fields["visibility_type"] == 1
+        assert job.fields["youtube"] == "https://youtu.be/x" and job.fields["video"] is None
+    print("[+] CSV row parsed")
+    return True
+
+
+if __name__ == "__main__":
+    for test_func in (test_batch_is_restartable, test_csv_manifest):
+        status = "[PASS]" if test_func() else "[FAIL]"
+        print(f"{status} {test_func.__name__}")
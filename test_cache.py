@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Test script for the persistent cache and the @mention resolution built on it
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+
+def test_ttl_and_lru():
+    """Entries expire after the TTL, the least recently used go first past the size, and processes share them"""
+    print("Testing persistent cache...")
+    from tiktok_uploader.cache import PersistentCache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.sqlite3")
+        cache = PersistentCache("test", ttl=60, max_entries=2, path=path)
+        cache.set("a", {"id": 1})
+        cache.set("b", 2)
+        assert PersistentCache("test", 60, 2, path).get("a") == {"id": 1}
+        assert PersistentCache("other", 60, 2, path).get("a") is None
+        # "a" is the least recently used once "b" is read again.
+        cache.db.execute("UPDATE cache SET used_at = used_at - 3600 WHERE key = 'a'")
+        cache.set("c", 3)
+        assert cache.get_many(["a", "b", "c"]) == {"b": 2, "c": 3}
+
+        short = PersistentCache("short", ttl=0.05, max_entries=10, path=path)
+        short.set("x", 1)
+        time.sleep(0.1)
+        assert short.get("x") is None
+    print("[+] TTL and LRU eviction hold")
+    return True
+
+
+def test_mentions_cached_and_concurrent():
+    """Distinct mentions are fetched at once, and only the first time"""
+    print("\nTesting mention resolution...")
+    from tiktok_uploader import bot_utils, cache
+
+    class Page:
+        status_code = 200
+
+        def __init__(self, name):
+            self.content = b'x"webapp.user-detail":{"userInfo":{"user":{"id":"' + str(len(name)).encode() + b'","u"'
+
+        def iter_content(self, size):
+            return (self.content[i:i + size] for i in range(0, len(self.content), size))
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+    class Session:
+        def __init__(self):
+            self.calls = []
+            self.lock = threading.Lock()
+
+        def request(self, method, url, **kwargs):
+            with self.lock:
+                self.calls.append(url)
+            time.sleep(0.1)
+            return Page(url.rsplit("@", 1)[1])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache._caches["mentions"] = cache.PersistentCache("mentions", 60, 100, os.path.join(tmp, "cache.sqlite3"))
+        try:
+            session = Session()
+            title = "hi @a @bb @ccc @dddd @a #tag"
+            start = time.perf_counter()
+            markup, text_extra = bot_utils.convert_tags(title, session)
+            assert time.perf_counter() - start < 0.3
+            assert len(session.calls) == 4
+            assert [extra["user_id"] for extra in text_extra if extra["type"] == 0] == ["1", "2", "3", "4", "1"]
+            assert bot_utils.convert_tags(title, session) == (markup, text_extra)
+            assert len(session.calls) == 4
+        finally:
+            del cache._caches["mentions"]
+    print("[+] Mentions resolved concurrently, then from the cache")
+    return True
+
+
+def test_profile_scan():
+    """The id is found across chunk boundaries, and a page without one leaves the mention unlinked"""
+    print("\nTesting profile scan...")
+    from tiktok_uploader.bot_utils import UserIdScanner, markup_tags, user_id_from_profile
+
+    page = b"<html>" + b"x" * 1000 + UserIdScanner.MARKER + b'6812345","uniqueId":"a"}' + b"y" * 1000
+    for size in (1, 7, 47, 4096):
+        scanner = UserIdScanner()
+        chunks = (page[i:i + size] for i in range(0, len(page), size))
+        assert any(scanner.feed(chunk) for chunk in chunks) and scanner.user_id == "6812345"
+        # Only a marker's worth of the page is ever held.
+        assert len(scanner.buffer) < len(UserIdScanner.MARKER) + size + 16
+    assert user_id_from_profile("<html>not found</html>") is None
+    markup, text_extra = markup_tags("hi @gone #tag", {"gone": None})
+    assert markup == 'hi @gone <h id="3">#tag</h>' and [extra["type"] for extra in text_extra] == [1]
+    print("[+] Ids found in any chunking, missing ones handled")
+    return True
+
+
+def test_unreachable_profile_left_unlinked():
+    """A profile fetch that fails on the network leaves its mention unlinked instead of failing"""
+    print("\nTesting unreachable profile...")
+    import requests
+    from tiktok_uploader import bot_utils, cache
+
+    class Session:
+        def request(self, method, url, **kwargs):
+            raise requests.ConnectionError("connection reset")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache._caches["mentions"] = cache.PersistentCache("mentions", 60, 100, os.path.join(tmp, "cache.sqlite3"))
+        try:
+            markup, text_extra = bot_utils.convert_tags("hi @gone #tag", Session())
+            assert [extra["type"] for extra in text_extra] == [1]
+            assert cache.mention_cache().get("gone") is None
+        finally:
+            del cache._caches["mentions"]
+    print("[+] Mention left unlinked")
+    return True
+
+
+def test_suggestions_batched():
+    """A batch looks each hashtag up once, failed lookups fall back to the given name and are retried later"""
+    print("\nTesting tag suggestions...")
+    from concurrent.futures import ThreadPoolExecutor
+    from tiktok_uploader import bot_utils, cache
+
+    class Response:
+        def __init__(self, status_code, body):
+            self.status_code = status_code
+            self.body = body
+            self.content = b""
+
+        def json(self):
+            return self.body
+
+    class Session:
+        def __init__(self):
+            self.calls = []
+            self.lock = threading.Lock()
+
+        def get(self, url, params):
+            with self.lock:
+                self.calls.append(params["keyword"])
+            time.sleep(0.05)
+            if params["keyword"] == "down":
+                return Response(500, None)
+            if "user" in url:
+                return Response(200, {"user_list": [{"user_info": {"unique_id": params["keyword"] + "_", "uid": "42"}}]})
+            return Response(200, {"sug_list": [{"cha_name": params["keyword"].lower()}]})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.sqlite3")
+        for namespace in ("tag_suggestions", "user_suggestions"):
+            cache._caches[namespace] = cache.PersistentCache(namespace, 60, 100, path)
+        try:
+            session = Session()
+            jobs = [(["Cats", "Dogs", "down"], ["ann"]), (["Dogs", "Cats"], ["ann", "bob"])] * 10
+            bot_utils.prefetch_tags_extra(jobs, session)
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(executor.map(lambda job: bot_utils.getTagsExtra("t", job[0], job[1], session), jobs))
+            title, text_extra = results[0]
+            assert title == "t #cats #dogs #down @ann_"
+            assert [extra["user_id"] for extra in text_extra] == ["", "", "", "42"]
+            # Only the failed lookup is made again, by the jobs that need it.
+            assert sorted(call for call in session.calls if call != "down") == ["Cats", "Dogs", "ann", "bob"]
+            assert 1 < session.calls.count("down") <= 11
+        finally:
+            for namespace in ("tag_suggestions", "user_suggestions"):
+                del cache._caches[namespace]
+    print("[+] Suggestions deduplicated and cached, failures fall back")
+    return True
+
+
+if __name__ == "__main__":
+    for test_func in (test_ttl_and_lru, test_mentions_cached_and_concurrent, test_profile_scan,
+                      test_unreachable_profile_left_unlinked, test_suggestions_batched):
+        status = "[PASS]" if test_func() else "[FAIL]"
+        print(f"{status} {test_func.__name__}")
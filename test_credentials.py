@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test script for the upload credential cache
+"""
+
+import json
+import threading
+import time
+
+import requests
+
+
+class FakeAuthSession(requests.Session):
+    """Session answering the upload auth call with numbered credentials."""
+
+    def __init__(self, status_code=200, expires_in=3600, clock=time.time):
+        super().__init__()
+        self.clock = clock
+        self.cookies.set("sessionid", "login-1", domain=".tiktok.com")
+        self.status_code = status_code
+        self.expires_in = expires_in
+        self.calls = 0
+        self.called = threading.Event()
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+        r = requests.Response()
+        r.status_code = self.status_code
+        if self.status_code == 200:
+            body = {"video_token_v5": {"access_key_id": f"key-{self.calls}", "secret_acess_key": "secret",
+                                       "session_token": "token", "expired_time": self.clock() + self.expires_in}}
+        else:
+            body = {"status_msg": "Login expired"}
+        r._content = json.dumps(body).encode()
+        self.called.set()
+        return r
+
+
+def test_credentials_reused_and_refreshed():
+    """Uploads of one login share credentials, refreshed ahead of their expiry"""
+    print("Testing upload credential reuse...")
+    from tiktok_uploader.credentials import CredentialCache
+
+    now = [time.time()]
+    cache = CredentialCache(margin=600, clock=lambda: now[0])
+    session = FakeAuthSession(expires_in=3600, clock=lambda: now[0])
+    first = cache.credentials(session)
+    assert first["status"] == "ok" and session.calls == 1
+    assert cache.credentials(session)["credentials"] is first["credentials"]
+    assert session.calls == 1
+
+    # Within two margins of expiry: still served, the successor is fetched in the background.
+    now[0] += 2500
+    session.called.clear()
+    assert cache.credentials(session)["credentials"] is first["credentials"]
+    assert session.called.wait(5)
+    for _ in range(100):
+        if cache.lookup("login-1")[0] is not first["credentials"]:
+            break
+        time.sleep(0.01)
+    second = cache.credentials(session)["credentials"]
+    assert second is not first["credentials"] and session.calls == 2
+    assert cache.fetches == 2
+    print("[+] Credentials reused and refreshed in the background")
+    return True
+
+
+def test_refused_credentials_not_cached():
+    """A refused auth call is a result, not an exception, and is not cached"""
+    print("\nTesting refused upload credentials...")
+    from tiktok_uploader.credentials import CredentialCache
+
+    cache = CredentialCache(margin=600)
+    session = FakeAuthSession(status_code=401)
+    result = cache.credentials(session)
+    assert result == {"status": "invalid", "credentials": None, "error": "Login expired"}, result
+    cache.credentials(session)
+    assert session.calls == 2
+    print("[+] Refused credentials reported")
+    return True
+
+
+if __name__ == "__main__":
+    for test_func in (test_credentials_reused_and_refreshed, test_refused_credentials_not_cached):
+        status = "[PASS]" if test_func() else "[FAIL]"
+        print(f"{status} {test_func.__name__}")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared HTTP session pool
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.clients.add(self.client_address)
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+def test_sessions_shared_per_account_and_proxy():
+    """An account gets one session per proxy, set up once and reusing its connection"""
+    print("Testing the shared session pool...")
+    from tiktok_uploader.http_sessions import SessionPool
+
+    pool = SessionPool(pool_size=4)
+    setups = []
+    setup = lambda session, account: setups.append(account)
+    first = pool.session("alice", None, setup)
+    assert pool.session("alice", "", setup) is first
+    assert pool.session("bob", None, setup) is not first
+    proxied = pool.session("alice", "http://proxy:8080", setup)
+    assert proxied is not first and proxied.proxies["https"] == "http://proxy:8080"
+    assert setups == ["alice", "bob", "alice"]
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    server.clients = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/"
+        for _ in range(5):
+            assert pool.session("alice").get(url, timeout=5).text == "ok"
+        # Five requests, one connection.
+        assert len(server.clients) == 1
+        pool.discard("alice")
+        assert pool.session("alice", None, setup) is not first and setups[-1] == "alice"
+    finally:
+        pool.close()
+        server.shutdown()
+        server.server_close()
+    print("[+] Sessions and their connections are reused")
+    return True
+
+
+if __name__ == "__main__":
+    for test_func in (test_sessions_shared_per_account_and_proxy,):
+        status = "[PASS]" if test_func() else "[FAIL]"
+        print(f"{status} {test_func.__name__}")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test script for the import cost of the package and of the CLI
+"""
+
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Chrome driver, moviepy and pytube: only login and YouTube sources need them.
+HEAVY_MODULES = ("undetected_chromedriver", "selenium", "moviepy", "pytube")
+
+# Time each CLI subcommand may spend importing modules, run so that it
+# stops before any network call. Importing the heavy modules alone takes
+# close to a second; the subcommands that import requests or the upload code
+# get more than the listing ones.
+STARTUP_BUDGETS_MS = [
+    (["login", "-n", "saved"], 600),
+    (["upload", "-u", "saved", "-v", "missing.mp4", "-t", "title"], 400),
+    (["batch", "-m", "missing.csv"], 600),
+    (["enqueue", "-m", "missing.csv"], 600),
+    (["worker", "--once"], 600),
+    (["check-sessions", "-u", "nobody"], 600),
+    (["show", "-u"], 400),
+    (["show", "-v"], 400),
+]
+
+
+def imported_modules(code):
+    p = subprocess.run([sys.executable, "-c", f"import sys\n{code}\nprint('\\n'.join(sys.modules))"],
+                       cwd=ROOT, capture_output=True, text=True)
+    assert p.returncode == 0, p.stderr
+    return set(p.stdout.split())
+
+
+def test_upload_path_skips_heavy_imports():
+    """Importing the package and the upload code loads neither Chrome nor moviepy"""
+    print("Testing imports of the upload path...")
+    for code in ("import tiktok_uploader", "from tiktok_uploader import tiktok, Config",
+                 "from tiktok_uploader import upload_video, load_cookies_from_file"):
+        heavy = [m for m in HEAVY_MODULES if m in imported_modules(code)]
+        assert not heavy, f"{code!r} imported {heavy}"
+    # Names of the lazy modules still resolve from the package.
+    assert "moviepy" in imported_modules("from tiktok_uploader import Video\nassert isinstance(Video, type)")
+    print("[+] Upload path imports no heavy module")
+    return True
+
+
+def test_missing_name_imports_nothing():
+    """Looking up a name the package does not have imports none of its lazy modules"""
+    print("\nTesting a missing package attribute...")
+    modules = imported_modules("import tiktok_uploader\nassert not hasattr(tiktok_uploader, 'does_not_exist')")
+    loaded = [m for m in HEAVY_MODULES + ("tiktok_uploader.tiktok",) if m in modules]
+    assert not loaded, f"a missing attribute imported {loaded}"
+    print("[+] Missing attribute imported nothing")
+    return True
+
+
+@pytest.mark.parametrize("args, budget_ms", STARTUP_BUDGETS_MS, ids=[" ".join(args) for args, _ in STARTUP_BUDGETS_MS])
+def test_startup_budget(args, budget_ms):
+    """A CLI subcommand stays within its import time budget and imports no heavy module"""
+    print(f"\nTesting the import time of cli.py {' '.join(args)}...")
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(os.path.join(ROOT, "config.txt"), tmp)
+        for directory in ("CookiesDir", "VideosDirPath"):
+            os.mkdir(os.path.join(tmp, directory))
+        # login returns at once for an account whose session is saved.
+        with open(os.path.join(tmp, "CookiesDir", "tiktok_session-saved.cookie"), "wb") as f:
+            pickle.dump([{"name": "sessionid", "value": "S"}], f)
+        p = subprocess.run([sys.executable, "-X", "importtime", os.path.join(ROOT, "cli.py")] + args,
+                           cwd=tmp, capture_output=True, text=True, timeout=120)
+    assert "Traceback" not in p.stderr, p.stderr[-3000:]
+    modules, total_us = set(), 0
+    for line in p.stderr.splitlines():
+        if line.startswith("import time:") and "self [us]" not in line:
+            self_us, _, name = line[len("import time:"):].split("|")
+            modules.add(name.strip())
+            total_us += int(self_us)
+    heavy = [m for m in HEAVY_MODULES if m in modules]
+    assert not heavy, f"{args[0]} imported {heavy}"
+    assert total_us / 1000 < budget_ms, f"{args[0]} spent {total_us / 1000:.0f} ms importing"
+    print(f"[+] {' '.join(args)} spent {total_us / 1000:.0f} ms importing")
+    return True
+
+
+if __name__ == "__main__":
+    status = "[PASS]" if test_upload_path_skips_heavy_imports() else "[FAIL]"
+    print(f"{status} test_upload_path_skips_heavy_imports")
+    status = "[PASS]" if test_missing_name_imports_nothing() else "[FAIL]"
+    print(f"{status} test_missing_name_imports_nothing")
+    for args, budget_ms in STARTUP_BUDGETS_MS:
+        status = "[PASS]" if test_startup_budget(args, budget_ms) else "[FAIL]"
+        print(f"{status} test_startup_budget[{' '.join(args)}]")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test script for the persistent job queue
+"""
+
+import os
+import tempfile
+import time
+
+
+def _fields(account):
+    return {"session_user": account, "video": "video.mp4", "title": "t"}
+
+
+def test_leases_and_retries():
+    """Claimed jobs are leased, handed out again when the lease runs out, and retried until the last attempt"""
+    print("Testing job leases...")
+    from tiktok_uploader.jobqueue import JobQueue
+
+    with tempfile.TemporaryDirectory() as tmp, JobQueue(os.path.join(tmp, "jobs.sqlite3")) as jobs:
+        jobs.max_attempts, jobs.retry_delay = 2, 0
+        assert jobs.enqueue([("a", _fields("a"), 0), ("b", _fields("b"), 5)]) == 2
+        assert jobs.enqueue([("a", _fields("a"), 0)]) == 0
+
+        first, = jobs.claim("w1", 1, lease=0.05)
+        assert first.account == "b" and first.attempts == 1
+        second, = jobs.claim("w1", 5, lease=60)
+        assert second.account == "a"
+        time.sleep(0.1)
+        # w1 died with b: w2 takes it over and w1's late outcome is ignored.
+        taken, = jobs.claim("w2", 5)
+        assert taken.id == first.id and taken.attempts == 2
+        jobs.finish("w1", [(first, {"status": "ok"})])
+        assert jobs.counts() == {"running": 2}
+
+        jobs.finish("w2", [(taken, {"status": "failed", "error": "boom"})])
+        jobs.finish("w1", [(second, {"status": "failed", "error": "boom"})])
+        assert jobs.counts() == {"failed": 1, "queued": 1}
+        retried, = jobs.claim("w1", 5)
+        assert retried.account == "a" and retried.attempts == 2
+        jobs.finish("w1", [(retried, {"status": "ok", "seconds": 1.5})])
+        assert jobs.counts() == {"failed": 1, "done": 1}
+    print("[+] Leases expire, retries stop at the last attempt")
+    return True
+
+
+def test_worker_drains_queue():
+    """A worker run with once uploads every queued job and exits"""
+    print("\nTesting queue worker...")
+    from tiktok_uploader.jobqueue import JobQueue, run_worker
+    from tiktok_uploader.scheduler import UploadScheduler
+
+    uploaded = []
+
+    def upload(**fields):
+        uploaded.append(fields["session_user"])
+        return True
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "jobs.sqlite3")
+        with JobQueue(path) as jobs:
+            jobs.enqueue([(None, dict(_fields(f"user{i % 3}"), video=__file__, youtube=None), 0) for i in range(9)])
+        scheduler = UploadScheduler(workers=3, posts_per_hour=0, global_posts_per_hour=0)
+        assert run_worker(3, path, once=True, poll=0.05, upload=upload, scheduler=scheduler) == (9, 0)
+        scheduler.close()
+        with JobQueue(path) as jobs:
+            assert jobs.counts() == {"done": 9}
+    assert sorted(uploaded) == ["user0"] * 3 + ["user1"] * 3 + ["user2"] * 3
+    print("[+] Every queued job uploaded")
+    return True
+
+
+if __name__ == "__main__":
+    for test_func in (test_leases_and_retries, test_worker_drains_queue):
+        status = "[PASS]" if test_func() else "[FAIL]"
+        print(f"{status} {test_func.__name__}")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test script for the per account upload scheduler
+"""
+
+import time
+
+
+def test_accounts_take_turns():
+    """A long queue of one account does not hold back the others"""
+    print("Testing account fairness...")
+    from tiktok_uploader.scheduler import UploadScheduler
+
+    order = []
+    with UploadScheduler(workers=1, posts_per_hour=0, global_posts_per_hour=0) as scheduler:
+        # Keep the worker busy while the queue fills up.
+        scheduler.submit("busy", time.sleep, 0.1)
+        for i in range(5):
+            scheduler.submit("busy", order.append, f"busy-{i}")
+        scheduler.submit("quiet", order.append, "quiet")
+        scheduler.submit("busy", order.append, "urgent", priority=1)
+        scheduler.wait()
+    assert order[:3] == ["urgent", "quiet", "busy-0"], order
+    print("[+] Accounts alternate and priorities go first")
+    return True
+
+
+def test_throttled_account_is_benched():
+    """After a throttle the account waits out its cooldown while the others carry on"""
+    print("\nTesting throttle back off...")
+    from tiktok_uploader.scheduler import PostingTooFast, UploadScheduler
+
+    calls = []
+
+    def post(account):
+        calls.append((account, time.monotonic()))
+        if account == "a" and len(calls) == 1:
+            raise PostingTooFast("You are posting too fast. Take a rest.")
+        return account
+
+    with UploadScheduler(workers=1, posts_per_hour=36000, burst=1, global_posts_per_hour=0, cooldown=0.3) as scheduler:
+        first = scheduler.submit("a", post, "a")
+        others = [scheduler.submit("b", post, "b") for _ in range(3)]
+        assert first.result(timeout=5) == "a"
+        assert all(future.result(timeout=5) == "b" for future in others)
+    assert scheduler.throttled == 1
+    # b kept the worker busy during a's cooldown, at its own rate of one post every 0.1 s.
+    assert [account for account, _ in calls].index("b") == 1
+    assert calls[-1][0] == "a" and calls[-1][1] - calls[0][1] >= 0.3
+    b_times = [at for account, at in calls if account == "b"]
+    assert all(later - earlier >= 0.09 for earlier, later in zip(b_times, b_times[1:]))
+    print("[+] Throttled account retried after its cooldown")
+    return True
+
+
+def test_quarantined_account_is_skipped():
+    """Jobs of a quarantined account fail at once and never take a worker"""
+    print("\nTesting account quarantine...")
+    from tiktok_uploader.scheduler import AccountQuarantined, UploadScheduler
+
+    ran = []
+    with UploadScheduler(workers=1, posts_per_hour=0, global_posts_per_hour=0) as scheduler:
+        scheduler.submit("good", time.sleep, 0.1)
+        queued = scheduler.submit("bad", ran.append, "bad")
+        scheduler.quarantine("bad", "session expired")
+        later = scheduler.submit("bad", ran.append, "bad")
+        good = scheduler.submit("good", ran.append, "good")
+        good.result(timeout=5)
+        for future in (queued, later):
+            assert isinstance(future.exception(timeout=5), AccountQuarantined)
+        scheduler.release("bad")
+        scheduler.submit("bad", ran.append, "bad again").result(timeout=5)
+    assert ran == ["good", "bad again"]
+    print("[+] Quarantined jobs skipped")
+    return True
+
+
+if __name__ == "__main__":
+    for test_func in (test_accounts_take_turns, test_throttled_account_is_benched, test_quarantined_account_is_skipped):
+        status = "[PASS]" if test_func() else "[FAIL]"
+        print(f"{status} {test_func.__name__}")
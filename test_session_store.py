@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Test script for the session store that replaces per account cookie files
+"""
+
+import os
+import pickle
+import tempfile
+import time
+
+
+def _write_cookie_file(directory, name, value, mtime):
+    path = os.path.join(directory, name + ".cookie")
+    with open(path, "wb") as f:
+        pickle.dump([{"name": "sessionid", "value": value, "sameSite": "None"}], f)
+    os.utime(path, (mtime, mtime))
+
+
+def test_imports_cookie_files():
+    """Existing cookie files are imported, and re-imported when a newer file is copied over"""
+    print("Testing cookie file import...")
+    from tiktok_uploader.session_store import SessionStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cookies_dir = os.path.join(tmp, "CookiesDir")
+        os.makedirs(cookies_dir)
+        _write_cookie_file(cookies_dir, "tiktok_session-a", "old", 1000)
+        _write_cookie_file(cookies_dir, "tiktok_session-b", "b", 1000)
+        store = SessionStore(os.path.join(tmp, "sessions.sqlite3"), cookies_dir)
+        assert store.names("tiktok_session-") == ["tiktok_session-a", "tiktok_session-b"]
+        assert store.load("tiktok_session-a")[0]["value"] == "old"
+
+        _write_cookie_file(cookies_dir, "tiktok_session-a", "new", 2000)
+        assert store.load("tiktok_session-a")[0]["value"] == "new"
+        # Saved later than the file: the file is not read again.
+        store.save("tiktok_session-a", [{"name": "sessionid", "value": "saved"}])
+        assert store.load("tiktok_session-a")[0]["value"] == "saved"
+        assert store.load("tiktok_session-missing") is None
+    print("[+] Cookie files imported")
+    return True
+
+
+def test_writes_seen_by_other_processes():
+    """A save from another connection replaces what this one has cached"""
+    print("\nTesting cache invalidation...")
+    from tiktok_uploader.session_store import SessionStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sessions.sqlite3")
+        first, second = SessionStore(path, tmp), SessionStore(path, tmp)
+        first.save("acct", [{"name": "sessionid", "value": "1"}])
+        assert second.load("acct")[0]["value"] == "1"
+        first.save("acct", [{"name": "sessionid", "value": "2"}])
+        assert second.load("acct")[0]["value"] == "2"
+        # Callers get copies they can change freely.
+        second.load("acct")[0]["value"] = "changed"
+        assert second.load("acct")[0]["value"] == "2"
+        assert first.delete("acct") and second.load("acct") is None
+    print("[+] Other connections see saves and deletes")
+    return True
+
+
+def test_session_checks_quarantine():
+    """Accounts found invalid are quarantined until they log in again"""
+    print("\nTesting session checks...")
+    from tiktok_uploader import health
+    from tiktok_uploader.session_store import SessionStore
+
+    def check_session(account, proxy=None):
+        ok = account != "bad"
+        return {"status": "ok" if ok else "invalid", "checked_at": time.time(), "latency": 0.01,
+                "error": None if ok else "session expired"}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(os.path.join(tmp, "sessions.sqlite3"), tmp)
+        for account in ("good", "bad"):
+            store.save(f"tiktok_session-{account}", [{"name": "sessionid", "value": account}])
+        original, health.check_session = health.check_session, check_session
+        try:
+            results = health.check_sessions(store=store)
+        finally:
+            health.check_session = original
+        assert {account: result["status"] for account, result in results.items()} == {"good": "ok", "bad": "invalid"}
+        assert store.checks()["good"]["latency"] == 0.01
+        assert store.quarantined() == {"bad": "session expired"}
+        assert store.quarantined(max_age=0) == {}
+        # Cookies a response refreshed for the same login do not lift it.
+        store.save("tiktok_session-bad", [{"name": "sessionid", "value": "bad"}, {"name": "msToken", "value": "ms"}])
+        assert store.quarantined() == {"bad": "session expired"}
+        # Logging in again lifts the quarantine.
+        store.save("tiktok_session-bad", [{"name": "sessionid", "value": "new"}])
+        assert store.quarantined() == {}
+    print("[+] Invalid sessions quarantined until logged in again")
+    return True
+
+
+def test_dc_location_tracked():
+    """A tt-target-idc cookie set by a response is saved once for the account"""
+    print("\nTesting datacenter tracking...")
+    import requests
+    from tiktok_uploader import cookies as cookies_module
+    from tiktok_uploader.session_store import SessionStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(os.path.join(tmp, "sessions.sqlite3"), tmp)
+        store.save("tiktok_session-acct", [{"name": "sessionid", "value": "s"},
+                                           {"name": "tt-target-idc", "value": "useast2a"}])
+        original, SessionStore._instance = SessionStore._instance, store
+        saves = []
+        save, store.save = store.save, lambda *args, **kwargs: saves.append(args) or save(*args, **kwargs)
+        try:
+            session = requests.Session()
+            cookies_module.track_cookies(session, "acct")
+            cookies_module.track_cookies(session, "acct")
+            assert len(session.hooks["response"]) == 1
+            for dc_location in ("useast2a", "useast5", "useast5"):
+                r = requests.Response()
+                r.cookies.set("tt-target-idc", dc_location)
+                session.hooks["response"][0](r)
+        finally:
+            SessionStore._instance = original
+        assert len(saves) == 1
+        saved = {c["name"]: c["value"] for c in store.load("tiktok_session-acct")}
+        assert saved == {"sessionid": "s", "tt-target-idc": "useast5"}
+    print("[+] Datacenter move saved once")
+    return True
+
+
+def test_fingerprint_profiles_are_stable():
+    """An account keeps the profile it got first, across processes"""
+    print("\nTesting fingerprint profiles...")
+    from tiktok_uploader import profiles
+    from tiktok_uploader.profiles import ProfileStore
+
+    created = []
+    original = profiles.random_user_agent
+
+    def random_user_agent():
+        created.append(1)
+        return f"Mozilla/5.0 agent-{len(created)}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "profiles.sqlite3")
+        profiles.random_user_agent = random_user_agent
+        try:
+            first, second = ProfileStore(path), ProfileStore(path)
+            profile = first.profile("acct")
+            assert second.profile("acct") == profile
+            assert first.profile("acct") is profile
+            assert ProfileStore(path).profile("acct") == profile
+            assert first.profile("other")["user_agent"] != profile["user_agent"]
+        finally:
+            profiles.random_user_agent = original
+        assert len(created) == 2
+        assert profile["is_mobile"] is False and profile["viewport"]["width"] >= 1280
+        assert profiles.new_profile("Mozilla/5.0 (iPhone) Mobile/15E148")["has_touch"]
+    print("[+] Profiles created once and shared")
+    return True
+
+
+def test_mstoken_persisted():
+    """An msToken set by a response is saved with its expiry and reused while fresh"""
+    print("\nTesting msToken persistence...")
+    import requests
+    from tiktok_uploader import cookies as cookies_module
+    from tiktok_uploader.session_store import SessionStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SessionStore(os.path.join(tmp, "sessions.sqlite3"), tmp)
+        store.save("tiktok_session-token", [{"name": "sessionid", "value": "s"}])
+        original, SessionStore._instance = SessionStore._instance, store
+        try:
+            session = requests.Session()
+            cookies_module.track_cookies(session, "token")
+            r = requests.Response()
+            expiry = int(time.time()) + 86400
+            r.cookies.set("msToken", "ms-1", domain=".tiktok.com", expires=expiry)
+            r.cookies.set("session_only", "x", domain=".tiktok.com")
+            r.cookies.set("upload", "x", domain="upload.example.com", expires=expiry)
+            session.hooks["response"][0](r)
+            saved = cookies_module.saved_cookies(cookies_module.load_cookies_from_file("tiktok_session-token"))
+        finally:
+            SessionStore._instance = original
+        assert [(c["name"], c["value"], c["expiry"]) for c in saved] == [("msToken", "ms-1", expiry)]
+
+        jar = requests.cookies.RequestsCookieJar()
+        jar.set("msToken", "ms-1", domain=".tiktok.com", expires=expiry)
+        assert cookies_module.fresh_cookie(jar, "msToken", 3600) == "ms-1"
+        assert cookies_module.fresh_cookie(jar, "msToken", 2 * 86400) is None
+    print("[+] msToken saved and reused")
+    return True
+
+
+if __name__ == "__main__":
+    for test_func in (test_imports_cookie_files, test_writes_seen_by_other_processes, test_session_checks_quarantine,
+                      test_dc_location_tracked, test_fingerprint_profiles_are_stable,
+                      test_mstoken_persisted):
+        status = "[PASS]" if test_func() else "[FAIL]"
+        print(f"{status} {test_func.__name__}")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test script for the long-lived signer daemon, in the browserless vm mode
+"""
+
+import json
+import shutil
+import signal
+import threading
+import time
+
+import pytest
+
+TEST_URL = "https://www.tiktok.com/api/v1/web/project/post/?app_name=tiktok_web&channel=tiktok_web&device_platform=web&aid=1988&msToken=test"
+
+
+def test_daemon_death_falls_back_to_subprocess():
+    """Waiters of a killed daemon fail at once and signing falls back to a one-shot subprocess"""
+    print("Testing the signer daemon in vm mode...")
+    if shutil.which("node") is None:
+        pytest.skip("Node.js not installed")
+    from tiktok_uploader import bot_utils, profiles
+
+    profile = profiles.new_profile()
+    daemon = bot_utils.SignerDaemon(args=["--bootstrap", "offline"])
+    daemon.start()
+    try:
+        output = daemon.sign(profile["user_agent"], TEST_URL, "vm", profile)
+        assert output is not None and json.loads(output)["status"] == "ok", output
+
+        # Stopped, the daemon holds the next request until it is killed.
+        daemon._proc.send_signal(signal.SIGSTOP)
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(daemon.sign(profile["user_agent"], TEST_URL, "vm", profile)))
+        start = time.perf_counter()
+        waiter.start()
+        time.sleep(0.2)
+        daemon._proc.kill()
+        waiter.join(10)
+        daemon._proc.wait(5)
+        released = time.perf_counter() - start
+        assert results == [None] and released < 5, (results, released)
+        assert not daemon.alive
+        assert daemon.sign(profile["user_agent"], TEST_URL, "vm", profile) is None
+
+        calls = []
+        get_signer_daemon, subprocess_jsvmp = bot_utils.get_signer_daemon, bot_utils.subprocess_jsvmp
+        bot_utils.get_signer_daemon = lambda: daemon
+        bot_utils.subprocess_jsvmp = lambda *args: calls.append(args) or "fallback"
+        try:
+            assert bot_utils.generate_signatures(profile["user_agent"], TEST_URL, "vm", profile) == "fallback"
+        finally:
+            bot_utils.get_signer_daemon, bot_utils.subprocess_jsvmp = get_signer_daemon, subprocess_jsvmp
+        assert len(calls) == 1 and calls[0][0].endswith("browser.js") and calls[0][3] == "vm", calls
+    finally:
+        daemon.close()
+    print(f"[+] Waiter released after {released:.2f}s, signing fell back")
+    return True
+
+
+if __name__ == "__main__":
+    for test_func in (test_daemon_death_falls_back_to_subprocess,):
+        status = "[PASS]" if test_func() else "[FAIL]"
+        print(f"{status} {test_func.__name__}")
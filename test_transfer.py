@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script for the parallel part uploader against a local stand-in upload host
+"""
+
+import os
+import sys
+import tempfile
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+
+CHUNK = 64 * 1024
+
+
+def _upload(host, data, parallelism, retries=3, done=None, on_part=None):
+    import requests
+    from tiktok_uploader.transfer import upload_parts
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "video.mp4")
+        with open(path, "wb") as f:
+            f.write(data)
+        upload_id = str(uuid.uuid4())
+        crcs = upload_parts(requests.Session(), f"http://{host.address}/store", upload_id, "auth",
+                            path, CHUNK, parallelism, retries=retries, backoff=0.01, done=done, on_part=on_part)
+        return upload_id, crcs
+
+
+def test_parallel_upload_reassembles():
+    """Parts uploaded out of order with retries reassemble to the original file"""
+    print("Testing parallel part upload...")
+    from bench_parallel_upload import StandInUploadHost
+
+    data = os.urandom(CHUNK * 7 + 123)
+    with StandInUploadHost(rtt=0.005, failure_rate=0.2) as host:
+        upload_id, crcs = _upload(host, data, parallelism=4, retries=8)
+        assert crcs is not None and len(crcs) == 8
+        assert host.assembled(upload_id) == data
+    print(f"[+] 8 parts reassembled after {host.requests} requests")
+    return True
+
+
+def test_failed_part_aborts():
+    """A part that keeps failing makes the whole upload return None"""
+    print("\nTesting upload abort on persistent failure...")
+    from bench_parallel_upload import StandInUploadHost
+
+    with StandInUploadHost(failure_rate=1.0) as host:
+        _, crcs = _upload(host, os.urandom(CHUNK * 3), parallelism=2, retries=1)
+        assert crcs is None
+    print("[+] Upload gave up as expected")
+    return True
+
+
+def test_part_error_aborts():
+    """An unexpected error while handling a part fails the upload instead of dropping the part"""
+    print("\nTesting upload abort on an error after a part...")
+    from bench_parallel_upload import StandInUploadHost
+
+    def on_part(part_number, crc):
+        if part_number == 2:
+            raise OSError("journal not writable")
+
+    with StandInUploadHost() as host:
+        _, crcs = _upload(host, os.urandom(CHUNK * 3), parallelism=2, on_part=on_part)
+        assert crcs is None
+    print("[+] Upload gave up as expected")
+    return True
+
+
+def test_resume_skips_done_parts():
+    """Parts recorded as done by an interrupted run are not sent again"""
+    print("\nTesting resumed upload...")
+    from bench_parallel_upload import StandInUploadHost
+    from tiktok_uploader.bot_utils import crc32
+
+    data = os.urandom(CHUNK * 4)
+    done = {1: crc32(data[:CHUNK]), 3: crc32(data[2 * CHUNK:3 * CHUNK])}
+    with StandInUploadHost() as host:
+        upload_id, crcs = _upload(host, data, parallelism=2, done=done)
+        assert host.requests == 2
+        assert sorted(n for _, n in host.parts) == [2, 4]
+        assert crcs == [crc32(data[i:i + CHUNK]) for i in range(0, len(data), CHUNK)]
+    print("[+] Only the missing parts were uploaded")
+    return True
+
+
+if __name__ == "__main__":
+    for test_func in (test_parallel_upload_reassembles, test_failed_part_aborts, test_part_error_aborts,
+                      test_resume_skips_done_parts):
+        status = "[PASS]" if test_func() else "[FAIL]"
+        print(f"{status} {test_func.__name__}")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test script for the transfer tuner
+"""
+
+import os
+import tempfile
+
+MIB = 1048576
+
+
+def _tuner(tmp):
+    from tiktok_uploader.tuning import TransferTuner
+    return TransferTuner(os.path.join(tmp, "transfer_tuning.json"))
+
+
+def test_fast_link_stays_within_buffer_budget():
+    """Part size and parallelism learned on a fast link never exceed UPLOAD_BUFFER_MB"""
+    print("Testing the transfer tuner on a fast link...")
+    from tiktok_uploader.Config import Config
+    from tiktok_uploader.tuning import MAX_CHUNK_SIZE, MIN_CHUNK_SIZE
+
+    budget = Config.get().upload_buffer_mb * MIB
+    with tempfile.TemporaryDirectory() as tmp:
+        tuner = _tuner(tmp)
+        chunk_size, parallelism = tuner.plan("up.example", None, 2000 * MIB)
+        assert chunk_size == MIN_CHUNK_SIZE and parallelism == Config.get().upload_parallelism
+        # 1 GB/s per connection, and every doubling of parallelism doubles the goodput.
+        for _ in range(8):
+            samples = [(chunk_size, chunk_size / 1e9, True)] * (parallelism * 4)
+            tuner.record("up.example", None, parallelism, samples, chunk_size * len(samples) / (parallelism * 1e9))
+            chunk_size, parallelism = tuner.plan("up.example", None, 2000 * MIB)
+            assert chunk_size * parallelism <= budget, (chunk_size, parallelism)
+        entry = tuner._load()[tuner.key("up.example")]
+        assert entry["chunk_size"] == MAX_CHUNK_SIZE and entry["parallelism"] == 16
+        assert chunk_size < MAX_CHUNK_SIZE
+    print(f"[+] Planned {chunk_size // MIB} MiB parts, {parallelism} in flight")
+    return True
+
+
+def test_plan_bounds():
+    """Small files get smaller parts and fewer connections, huge ones fit in MAX_PARTS"""
+    print("\nTesting transfer plan bounds...")
+    from tiktok_uploader.tuning import MAX_PARTS, MIN_CHUNK_SIZE
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tuner = _tuner(tmp)
+        assert tuner.plan("up.example", None, 1000) == (MIN_CHUNK_SIZE, 1)
+        chunk_size, _ = tuner.plan("up.example", "http://user:pw@proxy:8080", 100000 * MIB)
+        assert -(-100000 * MIB // chunk_size) <= MAX_PARTS
+    assert tuner.key("up.example", "http://user:pw@proxy:8080") == "up.example via proxy:8080"
+    print("[+] Plans stay within the host limits")
+    return True
+
+
+def test_next_parallelism():
+    """Parallelism doubles while goodput improves, holds without gain and halves on a flaky link"""
+    print("\nTesting parallelism updates...")
+    from tiktok_uploader.tuning import _next_parallelism
+
+    entry = {"runs": 1}
+    assert _next_parallelism(entry, 4, 100.0, 0.0) == 8
+    assert _next_parallelism(entry, 8, 101.0, 0.0) == 4
+    assert _next_parallelism(entry, 4, 100.0, 0.0) == 4
+    entry["runs"] = 10
+    assert _next_parallelism(entry, 4, 100.0, 0.0) == 5
+    assert _next_parallelism(entry, 4, 100.0, 0.5) == 2
+    assert "best_goodput" not in entry
+    print("[+] Parallelism follows the goodput")
+    return True
+
+
+if __name__ == "__main__":
+    for test_func in (test_fast_link_stays_within_buffer_budget, test_plan_bounds, test_next_parallelism):
+        status = "[PASS]" if test_func() else "[FAIL]"
+        print(f"{status} {test_func.__name__}")
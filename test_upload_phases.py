@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test script for the phases of `tiktok.upload_video` against faked TikTok responses
+"""
+
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Latency of project/create and of upload/auth: run one after the other,
+# they would take twice as long.
+PHASE_DELAY = 0.3
+
+
+def _fake_send(adapter, request, **kwargs):
+    """Answers every request of the upload flow like TikTok and its upload host."""
+    import time
+    import requests
+
+    url = request.url
+    if "project/create" in url or "upload/auth" in url:
+        time.sleep(PHASE_DELAY)
+    if "project/create" in url:
+        body = {"project": {"project_id": "P"}}
+    elif "upload/auth" in url:
+        body = {"video_token_v5": {"access_key_id": "AK", "secret_acess_key": "SK", "session_token": "ST",
+                                   "expired_time": time.time() + 3600}}
+    elif "ApplyUploadInner" in url:
+        node = {"Vid": "V", "UploadHost": "upload.example", "SessionKey": "K",
+                "StoreInfos": [{"StoreUri": "store/test", "Auth": "A"}]}
+        body = {"Result": {"InnerUploadAddress": {"UploadNodes": [node]}}}
+    elif "phase=transfer" in url:
+        body = {"success": 0, "data": {"crc32": request.headers["Content-Crc32"]}}
+    elif "CommitUploadInner" in url:
+        body = {"Result": {}}
+    else:
+        # The warm-up HEAD, the finish call and the post.
+        body = {"status_code": 0, "success": 0}
+    r = requests.Response()
+    r.status_code = 200
+    r._content = json.dumps(body).encode()
+    r.url = url
+    r.request = request
+    return r
+
+
+def _upload_in_this_process():
+    """Upload from the current directory with faked responses and print the phase timings."""
+    import requests
+    from tiktok_uploader import profiles, tiktok
+
+    requests.adapters.HTTPAdapter.send = _fake_send
+    profiles.random_user_agent = lambda: profiles.DEFAULT_USER_AGENT
+    tiktok.generate_signatures = lambda user_agent, url, mode=None, profile=None: json.dumps(
+        {"status": "ok", "data": {"x-bogus": "XB", "signature": "SIG"}})
+    recorded = []
+
+    class RecordedTimings(tiktok.PhaseTimings):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            recorded.append(self)
+
+    tiktok.PhaseTimings = RecordedTimings
+    published = tiktok.upload_video("acct", "video.mp4", "hello")
+    print(json.dumps({"published": published, "phases": recorded[0].phases}))
+
+
+def test_project_created_during_auth():
+    """The project is created while the upload credentials are fetched, and every phase is timed"""
+    print("Testing upload phase overlap...")
+    with tempfile.TemporaryDirectory() as tmp:
+        for directory in ("CookiesDir", "VideosDirPath"):
+            os.mkdir(os.path.join(tmp, directory))
+        with open(os.path.join(tmp, "CookiesDir", "tiktok_session-acct.cookie"), "wb") as f:
+            pickle.dump([{"name": "sessionid", "value": "S"}, {"name": "tt-target-idc", "value": "useast5"}], f)
+        with open(os.path.join(tmp, "VideosDirPath", "video.mp4"), "wb") as f:
+            f.write(os.urandom(65536))
+        # A process of its own: the session store, caches and pools are those of `tmp`.
+        p = subprocess.run([sys.executable, "-c", "import test_upload_phases; test_upload_phases._upload_in_this_process()"],
+                           cwd=tmp, env=dict(os.environ, PYTHONPATH=ROOT), capture_output=True, text=True, timeout=120)
+    assert p.returncode == 0, p.stdout[-3000:] + p.stderr[-3000:]
+    result = json.loads(p.stdout.splitlines()[-1])
+    assert result["published"] is True, p.stdout
+    phases = result["phases"]
+    for name in ("project", "auth", "apply", "transfer", "finish", "commit", "publish"):
+        assert name in phases, phases
+    (project_start, project_end), (auth_start, auth_end) = phases["project"], phases["auth"]
+    assert project_start < auth_end and auth_start < project_end, phases
+    print(f"[+] project {project_start:.2f}-{project_end:.2f}s overlapped auth {auth_start:.2f}-{auth_end:.2f}s")
+    return True
+
+
+if __name__ == "__main__":
+    for test_func in (test_project_created_during_auth,):
+        status = "[PASS]" if test_func() else "[FAIL]"
+        print(f"{status} {test_func.__name__}")
@@ -45,7 +45,6 @@ class Browser:
         # if WITH_PROXIES:
         #     options.add_argument('--proxy-server={}'.format(PROXIES[0]))
         self._driver = uc.Chrome(options=options)
-        self.with_random_user_agent()
 
     def with_random_user_agent(self, fallback=None):
         """Set random user agent.
@@ -61,6 +60,11 @@ class Browser:
             else:
                 raise e
 
+    def with_user_agent(self, user_agent):
+        """Browse with `user_agent`, e.g. the one of the account's fingerprint profile."""
+        self.user_agent = user_agent
+        self._driver.execute_cdp_cmd("Network.setUserAgentOverride", {"userAgent": user_agent})
+
     @property
     def driver(self):
         return self._driver
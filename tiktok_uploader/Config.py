@@ -14,7 +14,38 @@ class Config:
         "TMP_YOUTUBE_VIDEO_DIR": "",
         "LANG": "en", 
         "TIKTOK_BASE_URL": "https://www.tiktok.com/upload?lang=", 
-        "IMAGEMAGICK_BINARY": ""
+        "IMAGEMAGICK_BINARY": "",
+        "SIGNER_DAEMON": "1",
+        "SIGNER_SOCKET": "",
+        "SIGNER_WORKERS": "0",
+        "SIGNER_PAGES": 2,
+        "SIGNER_RECYCLE_AFTER": 500,
+        "SIGNER_MAX_RSS_MB": 1024,
+        "SIGNER_PROFILES": 16,
+        "SIGNER_MODE": "browser",
+        "SIGNER_BOOTSTRAP": "network",
+        "UPLOAD_PARALLELISM": 4,
+        "UPLOAD_RETRIES": 3,
+        "UPLOAD_ADAPTIVE": "1",
+        "UPLOAD_BUFFER_MB": 128,
+        "UPLOAD_JOURNAL_TTL": 3600,
+        "STATE_DIR": "./StateDir",
+        "HTTP_POOL_SIZE": 32,
+        "ACCOUNT_POSTS_PER_HOUR": 6,
+        "ACCOUNT_POST_BURST": 2,
+        "GLOBAL_POSTS_PER_HOUR": 0,
+        "THROTTLE_COOLDOWN": 1800,
+        "JOB_LEASE": 900,
+        "JOB_MAX_ATTEMPTS": 3,
+        "JOB_RETRY_DELAY": 300,
+        "MENTION_CACHE_TTL": 604800,
+        "MENTION_CACHE_SIZE": 100000,
+        "SUGGESTION_CACHE_TTL": 86400,
+        "SUGGESTION_CACHE_SIZE": 100000,
+        "SESSION_CHECK_TTL": 3600,
+        "UPLOAD_CREDENTIALS_TTL": 3000,
+        "UPLOAD_CREDENTIALS_MARGIN": 600,
+        "MSTOKEN_MIN_TTL": 3600
     }
 
     _EXCLUDE = ["#"]
@@ -64,8 +95,13 @@ class Config:
     def _parse_basic_option(line: str):
         return line.split("=")[1].strip().replace('"', '')
 
+    @staticmethod
+    def _parse_bool(value) -> bool:
+        return str(value).strip().lower() in ("1", "true", "yes", "on")
+
     def get_option_by_name(self, opt_name: str):
-        return self._options.get(opt_name)
+        # Options missing from an older config file keep their default value.
+        return self._options.get(opt_name, Config._DEFAULT_OPTIONS.get(opt_name))
     
     def _insert_option(self, opt_name: str, value):
         self._options[opt_name] = value
@@ -129,3 +165,158 @@ class Config:
     def imagemagick_binary_path(self):
         """ImageMagick Binary path """
         return self.get_option_by_name("IMAGEMAGICK_BINARY")
+
+    @property
+    def signer_daemon(self) -> bool:
+        """Keep a long-lived signer process between uploads instead of spawning one per video"""
+        return Config._parse_bool(self.get_option_by_name("SIGNER_DAEMON"))
+
+    @property
+    def signer_socket(self):
+        """Unix socket of a shared signer started with `node listen.js --socket <path>`"""
+        return self.get_option_by_name("SIGNER_SOCKET") or None
+
+    @property
+    def signer_workers(self):
+        """Signer worker processes: 0 signs in the daemon itself, "auto" uses one per CPU core"""
+        return str(self.get_option_by_name("SIGNER_WORKERS")).strip()
+
+    @property
+    def signer_pages(self) -> int:
+        """Pre-initialized signer pages kept by each signer worker"""
+        return int(self.get_option_by_name("SIGNER_PAGES"))
+
+    @property
+    def signer_recycle_after(self) -> int:
+        """Signatures after which a signer page is closed and replaced"""
+        return int(self.get_option_by_name("SIGNER_RECYCLE_AFTER"))
+
+    @property
+    def signer_max_rss_mb(self) -> int:
+        """Memory of a signer worker (browser included) that triggers a browser restart"""
+        return int(self.get_option_by_name("SIGNER_MAX_RSS_MB"))
+
+    @property
+    def signer_profiles(self) -> int:
+        """Device profiles kept warm, a browser context each, when signing in-process (SIGNER_WORKERS=0)"""
+        return int(self.get_option_by_name("SIGNER_PROFILES"))
+
+    @property
+    def signer_mode(self):
+        """"browser" signs inside Chromium, "vm" computes X-Bogus without a browser (no _signature)"""
+        return self.get_option_by_name("SIGNER_MODE")
+
+    @property
+    def signer_bootstrap(self):
+        """"network" loads tiktok.com before signing, "offline" (opt-in) starts signer pages from a bundled fixture"""
+        return self.get_option_by_name("SIGNER_BOOTSTRAP")
+
+    @property
+    def upload_parallelism(self) -> int:
+        """Video parts uploaded concurrently"""
+        return int(self.get_option_by_name("UPLOAD_PARALLELISM"))
+
+    @property
+    def upload_retries(self) -> int:
+        """Retries of a single failed video part before the upload is abandoned"""
+        return int(self.get_option_by_name("UPLOAD_RETRIES"))
+
+    @property
+    def upload_adaptive(self) -> bool:
+        """Learn part size and parallelism per upload host and proxy (UPLOAD_PARALLELISM is the starting point)"""
+        return Config._parse_bool(self.get_option_by_name("UPLOAD_ADAPTIVE"))
+
+    @property
+    def upload_buffer_mb(self) -> int:
+        """Memory the part buffers of one upload may hold, whatever part size and parallelism are learned"""
+        return int(self.get_option_by_name("UPLOAD_BUFFER_MB"))
+
+    @property
+    def upload_journal_ttl(self) -> int:
+        """Seconds during which an interrupted upload can be resumed (upload credentials lifetime)"""
+        return int(self.get_option_by_name("UPLOAD_JOURNAL_TTL"))
+
+    @property
+    def state_dir(self):
+        """Directory where upload journals and other runtime state are kept"""
+        return self.get_option_by_name("STATE_DIR")
+
+    @property
+    def http_pool_size(self) -> int:
+        """Keep-alive connections kept per host by each shared HTTP session"""
+        return int(self.get_option_by_name("HTTP_POOL_SIZE"))
+
+    @property
+    def account_posts_per_hour(self) -> float:
+        """Posts an account may make per hour when uploads are scheduled"""
+        return float(self.get_option_by_name("ACCOUNT_POSTS_PER_HOUR"))
+
+    @property
+    def account_post_burst(self) -> int:
+        """Posts an idle account may make back to back before its hourly rate applies"""
+        return int(self.get_option_by_name("ACCOUNT_POST_BURST"))
+
+    @property
+    def global_posts_per_hour(self) -> float:
+        """Posts per hour across all accounts when uploads are scheduled, 0 for no limit"""
+        return float(self.get_option_by_name("GLOBAL_POSTS_PER_HOUR"))
+
+    @property
+    def throttle_cooldown(self) -> int:
+        """Seconds an account is left alone after TikTok says it posts too fast"""
+        return int(self.get_option_by_name("THROTTLE_COOLDOWN"))
+
+    @property
+    def job_lease(self) -> int:
+        """Seconds a queue worker holds a job before another worker may take it over, renewed while it runs"""
+        return int(self.get_option_by_name("JOB_LEASE"))
+
+    @property
+    def job_max_attempts(self) -> int:
+        """Times a queued upload is tried before it is marked failed"""
+        return int(self.get_option_by_name("JOB_MAX_ATTEMPTS"))
+
+    @property
+    def job_retry_delay(self) -> int:
+        """Seconds before a failed queued upload is tried again, multiplied by the attempts made"""
+        return int(self.get_option_by_name("JOB_RETRY_DELAY"))
+
+    @property
+    def mention_cache_ttl(self) -> int:
+        """Seconds a resolved @mention user id is reused before its profile is fetched again"""
+        return int(self.get_option_by_name("MENTION_CACHE_TTL"))
+
+    @property
+    def mention_cache_size(self) -> int:
+        """Resolved @mentions kept, the least recently used are dropped beyond"""
+        return int(self.get_option_by_name("MENTION_CACHE_SIZE"))
+
+    @property
+    def suggestion_cache_ttl(self) -> int:
+        """Seconds a verified hashtag or account suggestion is reused before it is looked up again"""
+        return int(self.get_option_by_name("SUGGESTION_CACHE_TTL"))
+
+    @property
+    def suggestion_cache_size(self) -> int:
+        """Hashtag and account suggestions kept (each), the least recently used are dropped beyond"""
+        return int(self.get_option_by_name("SUGGESTION_CACHE_SIZE"))
+
+    @property
+    def session_check_ttl(self) -> int:
+        """Seconds an account whose session check failed is left out of scheduled uploads"""
+        return int(self.get_option_by_name("SESSION_CHECK_TTL"))
+
+    @property
+    def upload_credentials_ttl(self) -> int:
+        """Seconds upload credentials are assumed to last when TikTok does not say"""
+        return int(self.get_option_by_name("UPLOAD_CREDENTIALS_TTL"))
+
+    @property
+    def upload_credentials_margin(self) -> int:
+        """Seconds before their expiry upload credentials stop being reused; they are refreshed in the background during the margin before that"""
+        return int(self.get_option_by_name("UPLOAD_CREDENTIALS_MARGIN"))
+
+    @property
+    def mstoken_min_ttl(self) -> int:
+        """Seconds a saved msToken must still be valid for an upload to skip the tiktok.com warm-up request"""
+        return int(self.get_option_by_name("MSTOKEN_MIN_TTL"))
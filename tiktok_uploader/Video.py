@@ -1,5 +1,11 @@
 from .Config import Config
 
+import os
+# moviepy fails on import when IMAGEMAGICK_BINARY is set but empty, as the
+# shipped .env does once tiktok has loaded it, instead of looking for it.
+if not os.environ.get("IMAGEMAGICK_BINARY"):
+    os.environ.pop("IMAGEMAGICK_BINARY", None)
+
 from moviepy.editor import *
 from moviepy.editor import VideoFileClip, AudioFileClip
 from pytube import YouTube
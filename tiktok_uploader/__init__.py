@@ -1,6 +1,36 @@
-from .Browser import *
 from .cookies import *
 from .Config import *
-from .Video import *
-from .tiktok import *
 from .basics import *
+
+import importlib
+
+
+# Browser (undetected_chromedriver, selenium), Video (moviepy, pytube) and
+# tiktok are imported on first use of one of their names, so that importing
+# the package or running a CLI subcommand that does not need them stays fast.
+_LAZY_NAMES = {
+    "upload_video": ".tiktok",
+    "login": ".tiktok",
+    "upload_to_tiktok": ".tiktok",
+    "Video": ".Video",
+    "Browser": ".Browser",
+}
+
+__all__ = [
+    "load_cookies_from_file", "save_cookies_to_file", "delete_cookies_file", "delete_all_cookies_files",
+    "update_cookies", "update_dc_location", "note_cookies", "note_dc_location", "persisted_cookie",
+    "track_cookies", "saved_cookies", "fresh_cookie", "Config", "eprint", *_LAZY_NAMES,
+]
+
+
+def __getattr__(name):
+    if name not in _LAZY_NAMES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # Importing a submodule binds its name in the package: the class of the
+    # same name (Video, Browser) replaces it, as the star imports used to.
+    globals()[name] = getattr(importlib.import_module(_LAZY_NAMES[name], __name__), name)
+    return globals()[name]
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
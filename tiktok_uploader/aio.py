@@ -0,0 +1,557 @@
+"""asyncio version of the upload flow, to keep many uploads in flight on one
+event loop instead of one thread or process per upload.
+
+`upload_video_async` takes the same parameters as `tiktok.upload_video` and
+goes through the same steps (project create, upload auth, ApplyUploadInner,
+part transfer, finish, commit and publish) on aiohttp. It shares the upload
+journal, the transfer tuning and the payload helpers of the blocking version.
+Signing still runs in the node signer, off the event loop.
+"""
+import asyncio, json, os, random, time, uuid, weakref, zlib
+from email.utils import formatdate, parsedate_to_datetime
+from http.cookies import SimpleCookie
+
+import aiohttp
+import requests
+from yarl import URL
+
+from .Config import Config
+from .basics import eprint
+from .cache import mention_cache
+from .bot_utils import PROFILE_CHUNK_SIZE, UserIdScanner, assert_success, generate_random_string, generate_signatures, \
+    markup_tags, mention_names, posting_too_fast, profile_headers, profile_url
+from .cookies import load_cookies_from_file, note_cookies, persisted_cookie, saved_cookies
+from .credentials import AUTH_URL, CredentialCache, credentials_from_response
+from .journal import UploadJournal
+from .profiles import get_profile, random_user_agent
+from .scheduler import PostingTooFast
+from .timings import PhaseTimings
+from .tiktok import _parse_signatures, _post_data, _project_post_params, _project_post_sig_url
+from .transfer import CHUNK_SIZE, part_uploaded
+from .tuning import TransferTuner
+
+
+# Bytes read from disk and written to the socket at a time: a part is
+# streamed, never held in memory, whatever the part size.
+STREAM_BLOCK_SIZE = 262144
+
+
+class _Response:
+    """Fully read aiohttp response, with the attributes of `requests.Response`
+    the shared helpers (`assert_success`, `part_uploaded`, ...) rely on."""
+
+    def __init__(self, status_code, content, url):
+        self.status_code = status_code
+        self.content = content
+        self.url = url
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", "replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def __repr__(self):
+        return f"<Response [{self.status_code}]>"
+
+
+def _morsel_expiry(morsel):
+    """Expiry timestamp of a Set-Cookie morsel, None for a session cookie."""
+    try:
+        if morsel["max-age"]:
+            return time.time() + int(morsel["max-age"])
+        if morsel["expires"]:
+            return parsedate_to_datetime(morsel["expires"]).timestamp()
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class AsyncClient:
+    """aiohttp session of one account and proxy, shared by its uploads on an event loop.
+    With `account`, the cookies responses set for it (its datacenter, msToken, ...) are saved.
+    With a fingerprint `profile`, its user agent is used and the signer emulates its device."""
+
+    def __init__(self, proxy=None, user_agent=None, pool_size=None, account=None, profile=None):
+        self.proxy = proxy
+        self.account = account
+        self.profile = profile
+        # Expiry of the cookies set with one, which the aiohttp jar does not expose.
+        self.expiries = {}
+        self.user_agent = user_agent or (profile["user_agent"] if profile else random_user_agent())
+        pool_size = pool_size or Config.get().http_pool_size
+        self.http = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=0, limit_per_host=pool_size, keepalive_timeout=60),
+            headers={
+                'User-Agent': self.user_agent,
+                'Accept': 'application/json, text/plain, */*',
+            },
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=300),
+        )
+
+    async def request(self, method, url, read=None, **kwargs):
+        """Send a request and return it as a `_Response`. With `read`, an async
+        function of the aiohttp response, the body is left to it instead of
+        being read whole: the content of the result is what it returns."""
+        if kwargs.get("params"):
+            # Like requests, leave out parameters that are None.
+            kwargs["params"] = {name: value for name, value in kwargs["params"].items() if value is not None}
+        async with self.http.request(method, url, proxy=self.proxy, **kwargs) as r:
+            if r.cookies:
+                self._track_cookies(r)
+            return _Response(r.status, await (read(r) if read else r.read()), str(r.url))
+
+    def _track_cookies(self, r):
+        cookies = []
+        for name, morsel in r.cookies.items():
+            expiry = _morsel_expiry(morsel)
+            if expiry is not None:
+                self.expiries[name] = expiry
+            cookies.append(persisted_cookie(name, morsel.value, morsel["domain"] or r.url.host, morsel["path"],
+                                            expiry, morsel["secure"]))
+        cookies = [cookie for cookie in cookies if cookie]
+        if self.account and cookies:
+            note_cookies(self.account, cookies)
+
+    def set_cookie(self, name, value, domain=".tiktok.com", expires=None):
+        cookie = SimpleCookie()
+        cookie[name] = value
+        cookie[name]["domain"] = domain
+        cookie[name]["path"] = "/"
+        if expires is not None:
+            cookie[name]["expires"] = formatdate(expires, usegmt=True)
+            self.expiries[name] = expires
+        self.http.cookie_jar.update_cookies(cookie, URL("https://www.tiktok.com/"))
+
+    def fresh_cookie(self, name, min_ttl=0):
+        """Asynchronous counterpart of `cookies.fresh_cookie` for this client's jar."""
+        value = self.cookie(name)
+        if value is not None and self.expiries.get(name, 0) > time.time() + min_ttl:
+            return value
+        return None
+
+    def cookie(self, name):
+        morsel = self.http.cookie_jar.filter_cookies(URL("https://www.tiktok.com/")).get(name)
+        return morsel.value if morsel else None
+
+    def aws_headers(self, aws_auth, method, url, data=None):
+        """Headers AWSSigV4 adds to a `requests` request, for the same request on aiohttp."""
+        prepared = requests.Request(method, url, data=data, headers={'User-Agent': self.user_agent}).prepare()
+        headers = aws_auth(prepared).headers
+        return {name: value for name, value in headers.items() if name.lower() != "content-length"}
+
+    async def close(self):
+        await self.http.close()
+
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_client(account, proxy=None):
+    """`AsyncClient` of `account` over `proxy` on the running event loop."""
+    clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    key = (account, proxy or None)
+    if key not in clients:
+        clients[key] = AsyncClient(proxy, account=account, profile=get_profile(account))
+    return clients[key]
+
+
+async def close_clients():
+    """Close the clients of the running event loop."""
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.close()
+
+
+async def upload_video_async(session_user, video, title, schedule_time=0, allow_comment=1, allow_duet=0, allow_stitch=0, visibility_type=0, brand_organic_type=0, branded_content_type=0, ai_label=0, proxy=None, client=None, raise_on_throttle=False):
+    """Asynchronous `tiktok.upload_video`. Returns True once published, False otherwise."""
+    cookies = load_cookies_from_file(f"tiktok_session-{session_user}")
+    session_id = next((c["value"] for c in cookies if c["name"] == 'sessionid'), None)
+    dc_id = next((c["value"] for c in cookies if c["name"] == 'tt-target-idc'), None)
+
+    # Other uploads share the event loop: report and return instead of exiting.
+    if not session_id:
+        eprint(f"No cookie with Tiktok session id found for {session_user}: use login to save session id")
+        return False
+    if not dc_id:
+        print("[WARNING]: Please login, tiktok datacenter id must be allocated, or may fail")
+        dc_id = "useast2a"
+
+    # Parameter validation,
+    if schedule_time and (schedule_time > 864000 or schedule_time < 900):
+        print("[-] Cannot schedule video in more than 10 days or less than 20 minutes")
+        return False
+    if len(title) > 2200:
+        print("[-] The title has to be less than 2200 characters")
+        return False
+    if schedule_time != 0 and visibility_type == 1:
+        print("[-] Private videos cannot be uploaded with schedule")
+        return False
+
+    client = client or get_client(session_user, proxy)
+    client.set_cookie("sessionid", session_id)
+    client.set_cookie("tt-target-idc", dc_id)
+    for cookie in saved_cookies(cookies):
+        if client.fresh_cookie(cookie["name"]) is None:
+            client.set_cookie(cookie["name"], cookie["value"], cookie["domain"], cookie["expiry"])
+
+    video_path = os.path.join(os.getcwd(), Config.get().videos_dir, video)
+    journal = UploadJournal.open(session_user, video_path)
+    if journal.get("project_id"):
+        print(f"[+] Resuming interrupted upload of {video} ({len(journal.parts)} parts already sent)")
+    creation_id = journal.get("creation_id") or generate_random_string(21, True)
+
+    # As in `tiktok.upload_video`, only the publish waits for the project.
+    timings = PhaseTimings()
+    project = asyncio.ensure_future(_create_project_async(client, creation_id, journal, timings))
+    signing = asyncio.ensure_future(sign_project_post_async(client))
+    tagging = asyncio.ensure_future(convert_tags_async(title, client))
+    try:
+        if journal.stage == "committed":
+            video_id = journal.get("video_id")
+        else:
+            video_id = await _transfer_and_commit(client, video_path, journal, timings)
+            if not video_id:
+                return False
+        if await project is None:
+            return False
+
+        markup_text, text_extra = await tagging
+        data = _post_data(creation_id, video_id, title, text_extra, schedule_time)
+        signed = await signing
+        if signed is None:
+            return False
+        mstoken, tt_output = signed
+
+        url = "https://www.tiktok.com/tiktok/web/project/post/v1/"
+        headers = {
+            "content-type": "application/json",
+            "user-agent": client.user_agent
+        }
+        with timings.phase("publish"):
+            r = await client.request("POST", url, params=_project_post_params(mstoken, tt_output), data=json.dumps(data), headers=headers)
+        if not assert_success(url, r):
+            print("[-] Published failed, try later again")
+            return False
+        if posting_too_fast(r):
+            print(f"[-] {session_user} is posting too fast, try later again")
+            if raise_on_throttle:
+                raise PostingTooFast(r.json()["status_msg"])
+            return False
+        if r.json()["status_code"] != 0:
+            print("[-] Publish failed to Tiktok")
+            print(f"{r.content}")
+            return False
+        print(f"Published {video} successfully {'| Scheduled for ' + str(schedule_time) if schedule_time else ''}")
+        journal.discard()
+        return True
+    finally:
+        project.cancel()
+        signing.cancel()
+        tagging.cancel()
+        print(f"[+] Upload timings of {video}: {timings.summary()}")
+
+
+async def _create_project_async(client, creation_id, journal, timings):
+    """Asynchronous `tiktok._create_project`."""
+    if journal.get("project_id"):
+        return journal.get("project_id")
+    with timings.phase("project"):
+        project_url = f"https://www.tiktok.com/api/v1/web/project/create/?creation_id={creation_id}&type=1&aid=1988"
+        r = await client.request("POST", project_url)
+    if not assert_success(project_url, r):
+        return None
+    project_id = r.json()["project"]["project_id"]
+    journal.update(creation_id=creation_id, project_id=project_id)
+    return project_id
+
+
+async def sign_project_post_async(client):
+    """Asynchronous `tiktok.sign_project_post`: the signer itself runs in a thread."""
+    mstoken = client.fresh_cookie("msToken", Config.get().mstoken_min_ttl)
+    if mstoken is None:
+        url = "https://www.tiktok.com"
+        r = await client.request("HEAD", url, headers={"user-agent": client.user_agent})
+        if not assert_success(url, r):
+            return None
+        mstoken = client.cookie("msToken")
+    signatures = await asyncio.to_thread(generate_signatures, client.user_agent, _project_post_sig_url(mstoken),
+                                         profile=client.profile)
+    tt_output = _parse_signatures(signatures)
+    if tt_output is None:
+        return None
+    return mstoken, tt_output
+
+
+async def convert_tags_async(text, client):
+    """Asynchronous `bot_utils.convert_tags`, fetching the uncached mentioned profiles concurrently."""
+    names = list(dict.fromkeys(mention_names(text)))
+    cache = mention_cache()
+    user_ids = cache.get_many(names)
+    missing = [name for name in names if name not in user_ids]
+    if missing:
+        fetched = dict(zip(missing, await asyncio.gather(*(fetch_user_id_async(name, client) for name in missing))))
+        cache.set_many({name: user_id for name, user_id in fetched.items() if user_id})
+        user_ids.update(fetched)
+    return markup_tags(text, user_ids)
+
+
+async def fetch_user_id_async(name, client):
+    """Asynchronous `bot_utils.fetch_user_id`: reads the profile page up to the account id only."""
+    scanner = UserIdScanner()
+
+    async def read(r):
+        if r.status == 200:
+            async for chunk in r.content.iter_chunked(PROFILE_CHUNK_SIZE):
+                if scanner.feed(chunk):
+                    break
+            # Drop the connection instead of downloading the rest of the page.
+            r.close()
+        return b""
+
+    try:
+        r = await client.request("GET", profile_url(name), read=read, headers=profile_headers())
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        # The mention is left unlinked, the upload goes on.
+        print(f"[-] Could not fetch the profile of @{name}: {str(e)}")
+        return None
+    if r.status_code != 200:
+        print(f"[-] Could not fetch the profile of @{name}: {r.status_code}")
+        return None
+    if scanner.user_id is None:
+        print(f"[-] No user id in the profile of @{name}, it is left unlinked")
+    return scanner.user_id
+
+
+# Background credential refreshes, referenced until they finish.
+_refreshes = set()
+
+
+async def upload_credentials_async(client):
+    """Asynchronous `credentials.upload_credentials`: the refresh of credentials
+    close to expiry runs as a task of the event loop."""
+    cache = CredentialCache.get()
+    key = client.cookie("sessionid")
+    if not key:
+        return {"status": "invalid", "credentials": None, "error": "no session id"}
+    credentials, refresh = cache.lookup(key)
+    if credentials is not None:
+        if refresh and cache.claim_refresh(key):
+            task = asyncio.ensure_future(_fetch_credentials_async(client, key))
+            _refreshes.add(task)
+            task.add_done_callback(_refreshes.discard)
+        return {"status": "ok", "credentials": credentials, "error": None}
+    return await _fetch_credentials_async(client, key)
+
+
+async def _fetch_credentials_async(client, key):
+    try:
+        result = credentials_from_response(await client.request("GET", AUTH_URL))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        result = {"status": "error", "credentials": None, "error": f"{type(e).__name__}: {str(e)}"}
+    return CredentialCache.get().record(key, result)
+
+
+async def _transfer_and_commit(client, video_path, journal, timings):
+    with timings.phase("auth"):
+        auth = await upload_credentials_async(client)
+    if auth["status"] != "ok":
+        print(f"[-] Could not get upload credentials: {auth['error']}")
+        return None
+    credentials = auth["credentials"]
+    aws_auth = credentials.signer
+
+    file_size = os.path.getsize(video_path)
+    resumed = journal.stage in ("transfer", "finished")
+    if not resumed:
+        url = f"https://www.tiktok.com/top/v1?Action=ApplyUploadInner&Version=2020-11-19&SpaceName=tiktok&FileType=video&IsInner=1&FileSize={file_size}&s=g158iqx8434"
+        with timings.phase("apply"):
+            r = await client.request("GET", url, headers=client.aws_headers(aws_auth, "GET", url))
+        if not assert_success(url, r):
+            if r.status_code in (401, 403):
+                CredentialCache.get().invalidate(client.cookie("sessionid"), credentials)
+            return None
+        upload_node = r.json()["Result"]["InnerUploadAddress"]["UploadNodes"][0]
+        store_info = upload_node["StoreInfos"][0]
+        journal.update(stage="transfer", video_id=upload_node["Vid"], session_key=upload_node["SessionKey"],
+                       upload_id=str(uuid.uuid4()), upload_host=upload_node["UploadHost"],
+                       store_uri=store_info["StoreUri"], video_auth=store_info["Auth"], chunk_size=None)
+    video_id, session_key, upload_id, upload_host, store_uri, video_auth, chunk_size = (
+        journal.get(name) for name in UploadJournal.TRANSFER_FIELDS)
+
+    tuner = TransferTuner() if Config.get().upload_adaptive else None
+    if tuner:
+        planned_chunk_size, parallelism = tuner.plan(upload_host, client.proxy, file_size)
+    else:
+        planned_chunk_size, parallelism = CHUNK_SIZE, Config.get().upload_parallelism
+    if chunk_size is None:
+        chunk_size = planned_chunk_size
+        journal.update(chunk_size=chunk_size)
+
+    base_url = f"https://{upload_host}/{store_uri}"
+    if journal.stage == "finished":
+        crcs = [crc for _, crc in sorted(journal.parts.items())]
+    else:
+        samples = []
+        start = time.perf_counter()
+        with timings.phase("transfer"):
+            crcs = await upload_parts_async(client, base_url, upload_id, video_auth, video_path, chunk_size, parallelism,
+                                            Config.get().upload_retries, done=journal.parts, on_part=journal.part_done,
+                                            samples=samples)
+        if tuner and samples:
+            tuner.record(upload_host, client.proxy, parallelism, samples, time.perf_counter() - start)
+        if crcs is None:
+            if resumed:
+                print("[-] Could not resume the interrupted upload, uploading the video again")
+                journal.reset_transfer()
+                return await _transfer_and_commit(client, video_path, journal, timings)
+            return None
+
+        url = f"{base_url}?uploadID={upload_id}&phase=finish&uploadmode=part"
+        headers = {
+            "Authorization": video_auth,
+            "Content-Type": "text/plain;charset=UTF-8",
+        }
+        data = ",".join([f"{i + 1}:{crcs[i]}" for i in range(len(crcs))])
+        with timings.phase("finish"):
+            r = await client.request("POST", url, headers=headers, data=data)
+        if not assert_success(url, r):
+            return None
+        journal.update(stage="finished")
+
+    url = "https://www.tiktok.com/top/v1?Action=CommitUploadInner&Version=2020-11-19&SpaceName=tiktok"
+    data = '{"SessionKey":"' + session_key + '","Functions":[{"name":"GetMeta"}]}'
+    with timings.phase("commit"):
+        r = await client.request("POST", url, data=data, headers=client.aws_headers(aws_auth, "POST", url, data))
+    if not assert_success(url, r):
+        if r.status_code in (401, 403):
+            CredentialCache.get().invalidate(client.cookie("sessionid"))
+        return None
+    journal.update(stage="committed")
+    return video_id
+
+
+def _crc_of_range(path, offset, size):
+    crc = 0
+    with open(path, "rb") as f:
+        f.seek(offset)
+        remaining = size
+        while remaining:
+            block = f.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            crc = zlib.crc32(block, crc)
+            remaining -= len(block)
+    return "%08x" % (crc & 0xFFFFFFFF)
+
+
+async def _stream_range(path, offset, size):
+    # Disk reads run in a thread: a slow disk does not stall the other uploads of the loop.
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(f.seek, offset)
+        remaining = size
+        while remaining:
+            block = await asyncio.to_thread(f.read, min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+    finally:
+        f.close()
+
+
+async def upload_part_async(client, base_url, upload_id, video_auth, part_number, path, offset, size, crc, retries=3, backoff=1.0, samples=None):
+    """Asynchronous `transfer.upload_part`, streaming the part from disk."""
+    url = f"{base_url}?partNumber={part_number}&uploadID={upload_id}&phase=transfer"
+    headers = {
+        "Authorization": video_auth,
+        "Content-Type": "application/octet-stream",
+        "Content-Disposition": 'attachment; filename="undefined"',
+        "Content-Crc32": crc,
+        # A known length keeps aiohttp from switching to chunked encoding.
+        "Content-Length": str(size),
+    }
+    for attempt in range(retries + 1):
+        start = time.perf_counter()
+        accepted = False
+        try:
+            r = await client.request("POST", url, headers=headers, data=_stream_range(path, offset, size))
+            accepted = part_uploaded(r, crc)
+            if not accepted:
+                print(f"[-] Part {part_number} rejected with {r.status_code}: {r.content[:200]}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"[-] Part {part_number} failed: {str(e)}")
+        if samples is not None:
+            samples.append((size, time.perf_counter() - start, accepted))
+        if accepted:
+            return True
+        if attempt < retries:
+            await asyncio.sleep(backoff * 2 ** attempt + random.uniform(0, backoff))
+            print(f"[-] Retrying part {part_number} ({attempt + 1}/{retries})")
+    return False
+
+
+async def upload_parts_async(client, base_url, upload_id, video_auth, path, chunk_size=CHUNK_SIZE, parallelism=4, retries=3, backoff=1.0,
+                             done=None, on_part=None, samples=None):
+    """Asynchronous `transfer.upload_parts`: same arguments and result, but
+    parts are streamed from disk, so memory does not grow with the part size."""
+    file_size = os.path.getsize(path)
+    crcs = dict(done or {})
+    semaphore = asyncio.Semaphore(parallelism)
+    failed = False
+
+    async def send(part_number):
+        nonlocal failed
+        async with semaphore:
+            if failed:
+                return
+            offset = (part_number - 1) * chunk_size
+            size = min(chunk_size, file_size - offset)
+            try:
+                crc = await asyncio.to_thread(_crc_of_range, path, offset, size)
+                if await upload_part_async(client, base_url, upload_id, video_auth, part_number, path, offset, size, crc,
+                                           retries, backoff, samples):
+                    crcs[part_number] = crc
+                    if on_part:
+                        on_part(part_number, crc)
+                else:
+                    failed = True
+            except Exception as e:
+                print(f"[-] Part {part_number} failed: {type(e).__name__}: {str(e)}")
+                raise
+
+    parts = max(1, -(-file_size // chunk_size))
+    tasks = [asyncio.create_task(send(part_number)) for part_number in range(1, parts + 1) if part_number not in crcs]
+    if tasks:
+        finished, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        # A part that raised fails the upload: stop the parts still in flight.
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if any(task.exception() is not None for task in finished):
+            failed = True
+    if failed:
+        print("[-] Giving up on upload after repeated part failures")
+        return None
+    if len(crcs) != parts:
+        print(f"[-] {len(crcs)} of {parts} parts uploaded, giving up on upload")
+        return None
+    return [crcs[part_number] for part_number in sorted(crcs)]
+
+
+async def upload_many_async(uploads, concurrency=50):
+    """Run `upload_video_async` for every dict of keyword arguments in
+    `uploads`, at most `concurrency` at a time. Returns one result per upload:
+    True, False, or the exception it raised."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(kwargs):
+        async with semaphore:
+            return await upload_video_async(**kwargs)
+
+    try:
+        return await asyncio.gather(*(run(kwargs) for kwargs in uploads), return_exceptions=True)
+    finally:
+        await close_clients()
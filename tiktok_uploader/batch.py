@@ -0,0 +1,189 @@
+import csv, hashlib, json, os, threading, time
+from concurrent.futures import as_completed
+from functools import partial
+
+from .Config import Config
+from .scheduler import AccountQuarantined, PostingTooFast, UploadScheduler
+from .session_store import SessionStore
+
+
+# Manifest columns, with the `upload_video` argument they feed and their default.
+_COLUMNS = {
+    "account": ("session_user", None),
+    "video": ("video", None),
+    "youtube": ("youtube", None),
+    "title": ("title", ""),
+    "schedule": ("schedule_time", 0),
+    "comment": ("allow_comment", 1),
+    "duet": ("allow_duet", 0),
+    "stitch": ("allow_stitch", 0),
+    "visibility": ("visibility_type", 0),
+    "brandorganic": ("brand_organic_type", 0),
+    "brandcontent": ("branded_content_type", 0),
+    "ailabel": ("ai_label", 0),
+    "proxy": ("proxy", None),
+}
+# Names the CLI uses for the same columns.
+_ALIASES = {"users": "account", "user": "account", "yt": "youtube"}
+
+# Only one YouTube download at a time: Video always downloads to the same file.
+_youtube_lock = threading.Lock()
+
+
+class BatchJob:
+    """One manifest row: the arguments of an `upload_video` call."""
+
+    def __init__(self, row_id, line, fields, priority=0):
+        self.row_id = row_id
+        self.line = line
+        self.fields = fields
+        self.priority = priority
+
+    @staticmethod
+    def from_row(line, row):
+        row = {_ALIASES.get(k.strip().lower(), k.strip().lower()): v for k, v in row.items() if k}
+        unknown = set(row) - set(_COLUMNS) - {"id", "priority"}
+        if unknown:
+            raise ValueError(f"unknown column(s) {', '.join(sorted(unknown))}")
+        fields = {}
+        for column, (argument, default) in _COLUMNS.items():
+            value = row.get(column)
+            if value is None or value == "":
+                value = default
+            elif isinstance(default, int):
+                value = int(value)
+            fields[argument] = value
+        if not fields["session_user"]:
+            raise ValueError("no account")
+        if bool(fields["video"]) == bool(fields["youtube"]):
+            raise ValueError("exactly one of video and youtube is needed")
+        # Without an explicit id, a row is known by its content, so that
+        # edits elsewhere in the manifest do not change it.
+        row_id = str(row.get("id") or hashlib.sha1(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()[:16])
+        return BatchJob(row_id, line, fields, int(row.get("priority") or 0))
+
+
+def load_manifest(path):
+    """Jobs of a ``.jsonl`` manifest (one object per line) or a ``.csv`` one (header row)."""
+    jobs = []
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            reader = csv.DictReader(f)
+            rows = ((reader.line_num, row) for row in reader)
+        else:
+            rows = ((line, json.loads(text)) for line, text in enumerate(f, 1) if text.strip())
+        for line, row in rows:
+            try:
+                jobs.append(BatchJob.from_row(line, row))
+            except (ValueError, TypeError) as e:
+                raise ValueError(f"{path}:{line}: {str(e)}")
+    return jobs
+
+
+def load_results(path):
+    """Latest result of every row id in the results file."""
+    results = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for text in f:
+                try:
+                    result = json.loads(text)
+                except ValueError:
+                    # Last line of an interrupted run.
+                    continue
+                results[result["id"]] = result
+    return results
+
+
+def _youtube_video(job):
+    from .Video import Video
+    with _youtube_lock:
+        video = Video(job.fields["youtube"], job.fields["title"])
+        video.is_valid_file_format()
+        # Keep the download out of the way of the next one.
+        path = os.path.join(os.getcwd(), Config.get().videos_dir, f"youtube-{job.row_id}.mp4")
+        os.replace(video.source_ref, path)
+    return path
+
+
+def run_job(job, upload=None):
+    """Upload one row. Returns its result record. `PostingTooFast` is let
+    through for the scheduler to retry the row later."""
+    from . import tiktok
+    upload = upload or partial(tiktok.upload_video, raise_on_throttle=True)
+    fields = dict(job.fields)
+    result = {"id": job.row_id, "line": job.line, "account": fields["session_user"], "started_at": time.time()}
+    start = time.perf_counter()
+    try:
+        youtube = fields.pop("youtube")
+        if youtube:
+            fields["video"] = _youtube_video(job)
+            result["download_seconds"] = round(time.perf_counter() - start, 3)
+        elif not os.path.exists(os.path.join(os.getcwd(), Config.get().videos_dir, fields["video"])):
+            raise FileNotFoundError(f"video {fields['video']} does not exist")
+        ok = upload(**fields)
+        result["status"] = "ok" if ok else "failed"
+    except PostingTooFast:
+        raise
+    except SystemExit as e:
+        # upload_video exits when the account has no saved session.
+        result.update(status="failed", error=f"exited: {e.code}")
+    except Exception as e:
+        result.update(status="failed", error=f"{type(e).__name__}: {str(e)}")
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def run_batch(manifest, workers=4, results_path=None, upload=None, scheduler=None, check=False):
+    """Upload every row of `manifest` with `workers` uploads in parallel.
+
+    Rows go through an `UploadScheduler`, so each account keeps to its posting
+    rate and a throttled account is retried later while the workers carry on
+    with the others. Rows with a higher ``priority`` column go first. Rows of
+    accounts whose session was found invalid (see `health.check_sessions`,
+    run first on the batch's accounts with `check`) are skipped.
+
+    Results are appended to `results_path` (``<manifest>.results.jsonl`` by
+    default) as each row finishes. Rows that already succeeded in an earlier
+    run are skipped, so an interrupted batch is resumed by running it again.
+    Returns ``(succeeded, failed, skipped)`` counts."""
+    jobs = load_manifest(manifest)
+    results_path = results_path or manifest + ".results.jsonl"
+    done = {row_id for row_id, result in load_results(results_path).items() if result.get("status") == "ok"}
+    pending = [job for job in jobs if job.row_id not in done]
+    skipped = len(jobs) - len(pending)
+    print(f"[+] {len(jobs)} rows in manifest, {skipped} already uploaded, {len(pending)} to go")
+
+    succeeded = failed = 0
+    own_scheduler = scheduler is None
+    scheduler = scheduler or UploadScheduler(workers)
+    accounts = {job.fields["session_user"] for job in pending}
+    if check and accounts:
+        from .health import check_sessions
+        print(f"[+] Checking the sessions of {len(accounts)} accounts")
+        check_sessions(accounts)
+    if accounts:
+        for account, reason in SessionStore.get().quarantined().items():
+            if account in accounts:
+                print(f"[-] Skipping the rows of {account}: {reason}")
+                scheduler.quarantine(account, reason)
+    with open(results_path, "a", encoding="utf-8") as out:
+        futures = {scheduler.submit(job.fields["session_user"], run_job, job, upload, priority=job.priority): job for job in pending}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except (PostingTooFast, AccountQuarantined) as e:
+                job = futures[future]
+                error = "posting too fast" if isinstance(e, PostingTooFast) else f"session check failed: {str(e)}"
+                result = {"id": job.row_id, "line": job.line, "account": job.fields["session_user"], "status": "failed", "error": error}
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            if result["status"] == "ok":
+                succeeded += 1
+            else:
+                failed += 1
+                print(f"[-] Row {result['line']} ({result['account']}) failed: {result.get('error', 'upload failed')}")
+            print(f"[+] {succeeded + failed}/{len(pending)} done ({failed} failed)")
+    if own_scheduler:
+        scheduler.close()
+    return succeeded, failed, skipped
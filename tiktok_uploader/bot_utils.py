@@ -1,14 +1,21 @@
-import requests, secrets, string, uuid, zlib, json, re, time, subprocess
-from requests_auth_aws_sigv4 import AWSSigV4
+import requests, secrets, string, uuid, zlib, json, re, subprocess
+import atexit, itertools, os, queue, socket, threading
+from concurrent.futures import ThreadPoolExecutor
+from .Config import Config
+from .cache import get_cache, mention_cache
 
 
 user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+_SIGNATURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tiktok-signature")
 
 
-def subprocess_jsvmp(js, user_agent, url):
+def subprocess_jsvmp(js, user_agent, url, mode=None, bootstrap=None, profile=None):
+    args = [mode or "browser", bootstrap] if bootstrap else [mode] if mode else []
+    if profile:
+        args = [mode or "browser", bootstrap or "network", json.dumps(profile)]
     try:
         proc = subprocess.Popen(
-            ['node', js, url, user_agent], 
+            ['node', js, url, user_agent, *args], 
             stdout=subprocess.PIPE, 
             stderr=subprocess.PIPE
         )
@@ -39,6 +46,181 @@ def subprocess_jsvmp(js, user_agent, url):
         return None
 
 
+class SignerDaemon:
+    """Long-lived ``listen.js`` signer reused across uploads.
+
+    Speaks JSON lines with the node service, either over the stdin/stdout of a
+    child process it spawns itself, or over the unix socket of an already
+    running service (``node listen.js --socket <path>``)."""
+
+    def __init__(self, js_path=None, socket_path=None, timeout=60, args=()):
+        self.js_path = js_path or os.path.join(_SIGNATURE_DIR, "listen.js")
+        self.socket_path = socket_path
+        self.args = list(args)
+        self.timeout = timeout
+        self._proc = None
+        self._sock = None
+        self._reader = None
+        self._writer = None
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self):
+        if self._sock is not None:
+            return self._reader is not None
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self):
+        if self.socket_path:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.connect(self.socket_path)
+            self._reader = self._sock.makefile("rb")
+            self._writer = self._sock.makefile("wb")
+        else:
+            self._proc = subprocess.Popen(
+                ['node', self.js_path, *self.args],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=None,
+            )
+            self._reader = self._proc.stdout
+            self._writer = self._proc.stdin
+        threading.Thread(target=self._read_responses, daemon=True).start()
+
+    def _read_responses(self):
+        reader = self._reader
+        for line in reader:
+            try:
+                response = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            waiter = self._pending.pop(response.get("id"), None)
+            if waiter is not None:
+                waiter.put(line.decode('utf-8'))
+        # Service went away: wake up everybody still waiting.
+        self._reader = None
+        for waiter in list(self._pending.values()):
+            waiter.put(None)
+        self._pending.clear()
+
+    def request(self, payload):
+        """Send one request and wait for its response line, None on failure."""
+        request_id = next(self._ids)
+        waiter = queue.Queue(maxsize=1)
+        self._pending[request_id] = waiter
+        line = json.dumps({"id": request_id, **payload}) + "\n"
+        try:
+            with self._lock:
+                self._writer.write(line.encode('utf-8'))
+                self._writer.flush()
+            return waiter.get(timeout=self.timeout)
+        except queue.Empty:
+            print(f"[-] Signer daemon did not answer within {self.timeout} seconds")
+            return None
+        except (OSError, ValueError) as e:
+            print(f"[-] Could not reach signer daemon: {str(e)}")
+            return None
+        finally:
+            self._pending.pop(request_id, None)
+
+    def sign(self, user_agent, url, mode=None, profile=None):
+        """Same contract as `subprocess_jsvmp`: the JSON output as str, or None.
+        With a fingerprint `profile`, the page signing it emulates that device."""
+        payload = {"url": url, "user_agent": user_agent, "mode": mode or "browser"}
+        if profile:
+            payload["profile"] = profile
+        output = self.request(payload)
+        if output is None:
+            return None
+        response = json.loads(output)
+        if response.get("status") != "ok":
+            print(f"[-] Signer daemon failed: {response.get('error')}")
+            return None
+        return output
+
+    def stats(self):
+        """Per-worker latency, queue depth and recycling counters of the service."""
+        output = self.request({"op": "stats"})
+        return json.loads(output)["data"] if output else None
+
+    def close(self):
+        for stream in (self._writer, self._reader):
+            try:
+                if stream is not None:
+                    stream.close()
+            except OSError:
+                pass
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        if self._proc is not None:
+            try:
+                self._proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+            self._proc = None
+
+
+_signer_daemon = None
+_signer_daemon_lock = threading.Lock()
+
+
+def signer_daemon_args(config=None):
+    """`listen.js` command line for the signer cluster settings in `config`."""
+    config = config or Config.get()
+    return [
+        "--workers", config.signer_workers,
+        "--pages", str(config.signer_pages),
+        "--recycle-after", str(config.signer_recycle_after),
+        "--max-rss-mb", str(config.signer_max_rss_mb),
+        "--max-signers", str(config.signer_profiles),
+        "--bootstrap", config.signer_bootstrap,
+    ]
+
+
+def get_signer_daemon():
+    """Shared `SignerDaemon` of this process, (re)started on demand."""
+    global _signer_daemon
+    with _signer_daemon_lock:
+        if _signer_daemon is None or not _signer_daemon.alive:
+            if _signer_daemon is not None:
+                _signer_daemon.close()
+            _signer_daemon = SignerDaemon(socket_path=Config.get().signer_socket, args=signer_daemon_args())
+            _signer_daemon.start()
+        return _signer_daemon
+
+
+def close_signer_daemon():
+    global _signer_daemon
+    with _signer_daemon_lock:
+        if _signer_daemon is not None:
+            _signer_daemon.close()
+            _signer_daemon = None
+
+
+atexit.register(close_signer_daemon)
+
+
+def generate_signatures(user_agent, url, mode=None, profile=None):
+    """Sign `url` through the long-lived signer, falling back to a one-shot
+    `browser.js` subprocess when the daemon is disabled or unavailable.
+    `mode` is "browser" or "vm" (no `_signature`), SIGNER_MODE by default.
+    `profile` is the fingerprint profile of the account (see `profiles`)."""
+    mode = mode or Config.get().signer_mode
+    if Config.get().signer_daemon:
+        try:
+            signatures = get_signer_daemon().sign(user_agent, url, mode, profile)
+        except (OSError, FileNotFoundError) as e:
+            print(f"[-] Could not start signer daemon: {str(e)}")
+            signatures = None
+        if signatures is not None:
+            return signatures
+        print("[-] Falling back to one-shot signature generator")
+    return subprocess_jsvmp(os.path.join(_SIGNATURE_DIR, "browser.js"), user_agent, url, mode, Config.get().signer_bootstrap, profile)
+
+
 def generate_random_string(length, underline):
     characters = (
         string.ascii_letters + string.digits + "_"
@@ -71,7 +253,76 @@ def assert_success(url, r):
     return r.status_code == 200
 
 
-def convert_tags(text, session):
+def posting_too_fast(r):
+    """True when TikTok refused a post because the account posts too often."""
+    try:
+        return r.json().get("status_msg") == "You are posting too fast. Take a rest."
+    except (ValueError, AttributeError):
+        return False
+
+
+_TAG_PATTERN = re.compile(r'#(\w+)|@([\w.-]+)|([^#@]+)')
+
+
+def mention_names(text):
+    """Names of the accounts mentioned with ``@`` in `text`, in order."""
+    return [match.group(2) for match in _TAG_PATTERN.finditer(text) if match.group(2)]
+
+
+def profile_url(name):
+    return "https://www.tiktok.com/@" + name
+
+
+def profile_headers():
+    return {
+        'authority': 'www.tiktok.com',
+        'accept': '*/*',
+        'accept-language': 'q=0.9,en-US;q=0.8,en;q=0.7,zh-CN;q=0.6,zh;q=0.5,vi;q=0.4',
+        'user-agent': user_agent
+    }
+
+
+class UserIdScanner:
+    """Finds the account id in a profile page fed to it piece by piece, so
+    that the download can stop as soon as the id went by."""
+
+    MARKER = b'webapp.user-detail":{"userInfo":{"user":{"id":"'
+
+    def __init__(self):
+        self.buffer = b""
+        self.user_id = None
+
+    def feed(self, chunk):
+        """Scan the next `chunk` of the page. True once the id is found."""
+        self.buffer += chunk
+        start = self.buffer.find(self.MARKER)
+        if start < 0:
+            # Keep what could be the start of a marker cut by the chunk boundary.
+            self.buffer = self.buffer[-(len(self.MARKER) - 1):]
+            return False
+        end = self.buffer.find(b'"', start + len(self.MARKER))
+        if end < 0:
+            self.buffer = self.buffer[start:]
+            return False
+        self.user_id = self.buffer[start + len(self.MARKER):end].decode("utf-8", "replace")
+        return True
+
+
+def user_id_from_profile(html):
+    """Account id in the profile page `html`, None if it has none."""
+    scanner = UserIdScanner()
+    scanner.feed(html.encode("utf-8"))
+    return scanner.user_id
+
+
+# Bytes of a profile page read at a time while looking for the account id.
+PROFILE_CHUNK_SIZE = 16384
+
+
+def markup_tags(text, user_ids):
+    """Title markup and ``text_extra`` of `text`, with the mentioned account
+    ids taken from `user_ids` (name -> id). Mentions without an id are left
+    as plain text."""
     end = 0
     i = -1
     text_extra = []
@@ -93,17 +344,11 @@ def convert_tags(text, session):
             text_extra.append(text_extra_block(end, end + len(match.group(1)) + 1, 1, match.group(1), "", str(i)))
             end += len(match.group(1)) + 1
             return "<h id=\"" + str(i) + "\">#" + match.group(1) + "</h>"
+        elif match.group(2) and not user_ids.get(match.group(2)):
+            end += len(match.group(2)) + 1
+            return "@" + match.group(2)
         elif match.group(2):
-            url = "https://www.tiktok.com/@" + match.group(2)
-            headers = {
-                'authority': 'www.tiktok.com',
-                'accept': '*/*',
-                'accept-language': 'q=0.9,en-US;q=0.8,en;q=0.7,zh-CN;q=0.6,zh;q=0.5,vi;q=0.4',
-                'user-agent': user_agent
-            }
-
-            r = session.request("GET", url, headers=headers)
-            user_id = r.text.split('webapp.user-detail":{"userInfo":{"user":{"id":"')[1].split('"')[0]
+            user_id = user_ids[match.group(2)]
             text_extra.append(text_extra_block(end, end + len(match.group(2)) + 1, 0, "", user_id, str(i)))
             end += len(match.group(2)) + 1
             return "<m id=\"" + str(i) + "\">@" + match.group(2) + "</m>"
@@ -111,10 +356,55 @@ def convert_tags(text, session):
             end += len(match.group(3))
             return match.group(3)
 
-    result = re.sub(r'#(\w+)|@([\w.-]+)|([^#@]+)', convert, text)
+    result = _TAG_PATTERN.sub(convert, text)
     return result, text_extra
 
 
+def fetch_user_id(name, session):
+    """Id of the account `name`, None if it cannot be found. The profile page
+    is only read up to the id: the connection is dropped right after it."""
+    scanner = UserIdScanner()
+    try:
+        with session.request("GET", profile_url(name), headers=profile_headers(), stream=True) as r:
+            if r.status_code != 200:
+                print(f"[-] Could not fetch the profile of @{name}: {r.status_code}")
+                return None
+            for chunk in r.iter_content(PROFILE_CHUNK_SIZE):
+                if scanner.feed(chunk):
+                    break
+    except requests.RequestException as e:
+        # The mention is left unlinked, the upload goes on.
+        print(f"[-] Could not fetch the profile of @{name}: {str(e)}")
+        return None
+    if scanner.user_id is None:
+        print(f"[-] No user id in the profile of @{name}, it is left unlinked")
+    return scanner.user_id
+
+
+# Profile pages fetched at once for the mentions of one title.
+MENTION_WORKERS = 8
+
+
+def resolve_mentions(names, session):
+    """User ids of the accounts `names` (name -> id), from the mention cache,
+    the missing ones fetched concurrently and added to it."""
+    names = list(dict.fromkeys(names))
+    cache = mention_cache()
+    user_ids = cache.get_many(names)
+    missing = [name for name in names if name not in user_ids]
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(MENTION_WORKERS, len(missing))) as executor:
+            fetched = dict(zip(missing, executor.map(lambda name: fetch_user_id(name, session), missing)))
+        # Unresolved names are not cached: they are tried again next time.
+        cache.set_many({name: user_id for name, user_id in fetched.items() if user_id})
+        user_ids.update(fetched)
+    return user_ids
+
+
+def convert_tags(text, session):
+    return markup_tags(text, resolve_mentions(mention_names(text), session))
+
+
 def printResponse(r):
     print(f"{r }")
     print(f"{r.content }")
@@ -131,33 +421,119 @@ def assertSuccess(url, r):
     return r.status_code == 200
 
 
+# Suggestion lookups running at once, shared by every job of the process.
+SUGGESTION_WORKERS = 8
+_suggestion_pool = None
+_suggestions_in_flight = {}
+# Reentrant: a lookup that is already done runs its callback under the lock.
+_suggestions_lock = threading.RLock()
+
+
+def fetch_tag_suggestion(tag, session):
+    """Name TikTok suggests for hashtag `tag` (`tag` itself if it has none), None if the lookup failed."""
+    url = "https://www.tiktok.com/api/upload/challenge/sug/"
+    try:
+        r = session.get(url, params={"keyword": tag})
+    except requests.RequestException as e:
+        print(f"[-] Could not look up #{tag}: {str(e)}")
+        return None
+    if not assertSuccess(url, r):
+        return None
+    try:
+        return r.json()["sug_list"][0]["cha_name"]
+    except (ValueError, LookupError, TypeError):
+        return tag
+
+
+def fetch_user_suggestion(user, session):
+    """``[unique_id, uid]`` of the account TikTok suggests for `user` (``[user, ""]``
+    if none), None if the lookup failed."""
+    url = "https://us.tiktok.com/api/upload/search/user/"
+    try:
+        r = session.get(url, params={"keyword": user})
+    except requests.RequestException as e:
+        print(f"[-] Could not look up @{user}: {str(e)}")
+        return None
+    if not assertSuccess(url, r):
+        return None
+    try:
+        user_info = r.json()["user_list"][0]["user_info"]
+        return [user_info["unique_id"], user_info["uid"]]
+    except (ValueError, LookupError, TypeError):
+        return [user, ""]
+
+
+def _suggest(cache, fetch, keys, session):
+    """Values of `keys` from `cache`, the missing ones fetched with `fetch` on
+    the shared pool. A key already being fetched for another job is waited
+    for, not fetched twice. Failed lookups are None and are not cached."""
+    global _suggestion_pool
+    keys = list(dict.fromkeys(keys))
+    values = cache.get_many(keys)
+    futures = {}
+
+    def remember(key, future):
+        # Cached before it leaves the in-flight table, so that no lookup falls in between.
+        if future.exception() is None and future.result() is not None:
+            cache.set(key, future.result())
+        with _suggestions_lock:
+            _suggestions_in_flight.pop((cache.namespace, key), None)
+
+    with _suggestions_lock:
+        _suggestion_pool = _suggestion_pool or ThreadPoolExecutor(max_workers=SUGGESTION_WORKERS)
+        for key in keys:
+            if key in values:
+                continue
+            future = _suggestions_in_flight.get((cache.namespace, key))
+            if future is None:
+                future = _suggestions_in_flight[(cache.namespace, key)] = _suggestion_pool.submit(fetch, key, session)
+                future.add_done_callback(lambda future, key=key: remember(key, future))
+            futures[key] = future
+    for key, future in futures.items():
+        try:
+            values[key] = future.result()
+        except Exception as e:
+            print(f"[-] Lookup of {key} failed: {str(e)}")
+            values[key] = None
+    return values
+
+
+def suggest_tags(tags, session):
+    """Verified name of each hashtag of `tags` (tag -> name, None when the lookup failed)."""
+    return _suggest(get_cache("tag_suggestions", *_suggestion_cache_limits()), fetch_tag_suggestion, tags, session)
+
+
+def suggest_users(users, session):
+    """``[unique_id, uid]`` of each account of `users` (None when the lookup failed)."""
+    return _suggest(get_cache("user_suggestions", *_suggestion_cache_limits()), fetch_user_suggestion, users, session)
+
+
+def _suggestion_cache_limits():
+    config = Config.get()
+    return config.suggestion_cache_ttl, config.suggestion_cache_size
+
+
+def prefetch_tags_extra(jobs, session):
+    """Look up the hashtags and accounts of many `(tags, users)` jobs at once,
+    each distinct one a single time, so that their `getTagsExtra` calls are
+    served from the cache."""
+    suggest_tags({tag for tags, _ in jobs for tag in tags}, session)
+    suggest_users({user for _, users in jobs for user in users}, session)
+
+
 def getTagsExtra(title, tags, users, session):
+    """`title` followed by the verified `tags` and `users`, and its ``text_extra``.
+    A tag or user whose lookup failed is added as given."""
     text_extra = []
+    verified_tags = suggest_tags(tags, session)
     for tag in tags:
-        url = "https://www.tiktok.com/api/upload/challenge/sug/"
-        params = {"keyword": tag}
-        r = session.get(url, params=params)
-        if not assertSuccess(url, r):
-            return False
-        try:
-            verified_tag = r.json()["sug_list"][0]["cha_name"]
-        except:
-            verified_tag = tag
+        verified_tag = verified_tags[tag] or tag
         title += " #"+verified_tag
         text_extra.append({"start": len(title)-len(verified_tag)-1, "end": len(
             title), "user_id": "", "type": 1, "hashtag_name": verified_tag})
+    verified_users = suggest_users(users, session)
     for user in users:
-        url = "https://us.tiktok.com/api/upload/search/user/"
-        params = {"keyword": user}
-        r = session.get(url, params=params)
-        if not assertSuccess(url, r):
-            return False
-        try:
-            verified_user = r.json()["user_list"][0]["user_info"]["unique_id"]
-            verified_user_id = r.json()["user_list"][0]["user_info"]["uid"]
-        except:
-            verified_user = user
-            verified_user_id = ""
+        verified_user, verified_user_id = verified_users[user] or (user, "")
         title += " @"+verified_user
         text_extra.append({"start": len(title)-len(verified_user)-1, "end": len(
             title), "user_id": verified_user_id, "type": 0, "hashtag_name": verified_user})
@@ -0,0 +1,106 @@
+import json, os, sqlite3, threading, time
+
+from .Config import Config
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_used ON cache (namespace, used_at);
+"""
+
+# Reads refresh an entry's last use at most this often, so that hits stay reads.
+_TOUCH_INTERVAL = 60
+
+
+class PersistentCache:
+    """Key -> JSON value cache in an SQLite database under STATE_DIR, shared
+    by every process using the same state directory.
+
+    Entries expire `ttl` seconds after they are stored. Past `max_entries`
+    entries in the namespace, the least recently used are evicted."""
+
+    def __init__(self, namespace, ttl, max_entries, path=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path or os.path.join(os.getcwd(), Config.get().state_dir, "cache.sqlite3")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+
+    def get_many(self, keys):
+        """Cached values of `keys` (those that are cached and fresh)."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        now = time.time()
+        marks = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self.db.execute(f"SELECT key, value, used_at FROM cache WHERE namespace = ? AND key IN ({marks}) "
+                                   f"AND expires_at > ?", (self.namespace, *keys, now)).fetchall()
+            stale = [(now, self.namespace, key) for key, _, used_at in rows if now - used_at > _TOUCH_INTERVAL]
+            if stale:
+                self.db.executemany("UPDATE cache SET used_at = ? WHERE namespace = ? AND key = ?", stale)
+        return {key: json.loads(value) for key, value, _ in rows}
+
+    def get(self, key, default=None):
+        return self.get_many([key]).get(key, default)
+
+    def set_many(self, values):
+        """Store the ``key -> value`` pairs of `values`; once past `max_entries`,
+        evict the expired and least recently used entries."""
+        if not values:
+            return
+        now = time.time()
+        rows = [(self.namespace, key, json.dumps(value), now + self.ttl, now) for key, value in values.items()]
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self.db.executemany("INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, used_at) "
+                                    "VALUES (?, ?, ?, ?, ?)", rows)
+                # Counting walks the index only; the sort of the eviction runs once the namespace is full.
+                count, = self.db.execute("SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)).fetchone()
+                if count > self.max_entries:
+                    self.db.execute("DELETE FROM cache WHERE namespace = ? AND (expires_at <= ? OR key IN "
+                                    "(SELECT key FROM cache WHERE namespace = ? ORDER BY used_at DESC LIMIT -1 OFFSET ?))",
+                                    (self.namespace, now, self.namespace, self.max_entries))
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(namespace, ttl, max_entries):
+    """Process-wide `PersistentCache` of `namespace`."""
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = _caches[namespace] = PersistentCache(namespace, ttl, max_entries)
+        return cache
+
+
+def mention_cache():
+    """Cache of account name -> user id for ``@mentions``."""
+    config = Config.get()
+    return get_cache("mentions", config.mention_cache_ttl, config.mention_cache_size)
@@ -1,21 +1,24 @@
-from .Config import Config
-from .basics import eprint
+from .session_store import SessionStore
 
 import pickle
 import os
+import threading
+import time
 
 
 def load_cookies_from_file(filename: str, cookies_path=None):
+    """Cookies saved as `filename`: from the session store, or from the cookie
+    file in `cookies_path` when one is given."""
     if not cookies_path:
-        cookie_path = os.path.join(os.getcwd(), Config.get().cookies_dir, filename + ".cookie")
+        cookie_data = SessionStore.get().load(filename)
     else:
         cookie_path = os.path.join(cookies_path, filename + ".cookie")
-    if not os.path.exists(cookie_path):
+        cookie_data = pickle.load(open(cookie_path, "rb")) if os.path.exists(cookie_path) else None
+    if cookie_data is None:
         # eprint(f"Warning: Could not find cookie file at path: {cookie_path} (ignoring)")
         print("User not found on system.")
         return []
-    
-    cookie_data = pickle.load(open(cookie_path, "rb"))
+
     cookies = []
     for cookie in cookie_data:
         # still necessary?
@@ -27,21 +30,28 @@ def load_cookies_from_file(filename: str, cookies_path=None):
 
 
 def save_cookies_to_file(cookies, filename: str, cookies_path=None):
+    """Save `cookies` as `filename` in the session store, or to a cookie file
+    in `cookies_path` when one is given (written atomically)."""
     if not cookies_path:
-        cookie_path = os.path.join(os.getcwd(), Config.get().cookies_dir, filename + ".cookie")
-    else:
-        cookie_path = os.path.join(cookies_path, filename + ".cookie")
+        print("Saving cookies to session store: ", filename)
+        SessionStore.get().save(filename, cookies)
+        return
+    cookie_path = os.path.join(cookies_path, filename + ".cookie")
     print("Saving cookies to file: ", cookie_path)
-    with open(cookie_path, "wb") as f:
+    tmp_path = f"{cookie_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
         pickle.dump(cookies, f)
-        f.close()
+    os.replace(tmp_path, cookie_path)
 
 
 def delete_cookies_file(filename: str, cookies_path=None):
     if not cookies_path:
-        cookie_path = os.path.join(os.getcwd(), Config.get().cookies_dir, filename + ".cookie")
-    else:
-        cookie_path = os.path.join(cookies_path, filename + ".cookie")
+        if SessionStore.get().delete(filename):
+            print("Deleted cookies: ", filename)
+        else:
+            print("No cookies to delete: ", filename)
+        return
+    cookie_path = os.path.join(cookies_path, filename + ".cookie")
     if os.path.exists(cookie_path):
         os.remove(cookie_path)
         print("Deleted cookies file: ", cookie_path)
@@ -51,16 +61,117 @@ def delete_cookies_file(filename: str, cookies_path=None):
 
 def delete_all_cookies_files(cookies_path=None):
     if not cookies_path:
-        cookie_dir = os.path.join(os.getcwd(), Config.get().cookies_dir)
-    else:
-        cookie_dir = cookies_path
-    for filename in os.listdir(cookie_dir):
+        store = SessionStore.get()
+        for name in store.names():
+            store.delete(name)
+            print("Deleted cookies: ", name)
+        print("Deleted all cookies.")
+        return
+    for filename in os.listdir(cookies_path):
         if filename.endswith(".cookie"):
-            os.remove(os.path.join(cookie_dir, filename))
+            os.remove(os.path.join(cookies_path, filename))
             print("Deleted cookies file: ", filename)
     print("Deleted all cookies files.")
 
 
+def update_cookies(filename: str, updates):
+    """Merge the cookie dicts `updates` into the cookies saved as `filename`,
+    by cookie name. Returns the names whose value or expiry changed."""
+    store = SessionStore.get()
+    cookies = store.load(filename)
+    if cookies is None:
+        print(f"[-] Cannot update the cookies of {filename}: no saved session")
+        return []
+    by_name = {cookie["name"]: cookie for cookie in cookies}
+    changed = []
+    for update in updates:
+        current = by_name.get(update["name"])
+        if current and current["value"] == update["value"] and current.get("expiry") == update.get("expiry"):
+            continue
+        if current:
+            current.update(update)
+        else:
+            cookies.append(dict(update))
+            by_name[update["name"]] = cookies[-1]
+        changed.append(update["name"])
+    if changed:
+        store.save(filename, cookies)
+        if "tt-target-idc" in changed:
+            print(f"[+] Datacenter of {filename} is now {by_name['tt-target-idc']['value']}")
+    return changed
+
+
 def update_dc_location(filename:str, new_dc_location: str):
     """As datacenter location can change per load, we need to update based on response set cookies headers, in the case of dc change, we need to update settings"""
-    raise NotImplementedError("This function is not implemented yet.")
\ No newline at end of file
+    return bool(update_cookies(filename, [{"name": "tt-target-idc", "value": new_dc_location, "domain": ".tiktok.com", "path": "/"}]))
+
+
+# Cookie values last seen per account and name, so that only changes reach the store.
+_seen_cookies = {}
+_seen_cookies_lock = threading.Lock()
+
+
+def note_cookies(account, cookies):
+    """Record cookies (dicts) TikTok set for `account`. Those that differ from
+    what was seen before are saved with the account's cookies."""
+    with _seen_cookies_lock:
+        changed = [cookie for cookie in cookies
+                   if _seen_cookies.get((account, cookie["name"])) != (cookie["value"], cookie.get("expiry"))]
+        for cookie in changed:
+            _seen_cookies[(account, cookie["name"])] = (cookie["value"], cookie.get("expiry"))
+    if not changed:
+        return False
+    return bool(update_cookies(f"tiktok_session-{account}", changed))
+
+
+def note_dc_location(account, dc_location):
+    """Record that TikTok assigned `account` to `dc_location`, see `note_cookies`."""
+    return note_cookies(account, [{"name": "tt-target-idc", "value": dc_location, "domain": ".tiktok.com", "path": "/"}])
+
+
+def persisted_cookie(name, value, domain, path="/", expiry=None, secure=False):
+    """Cookie dict of a cookie set by a TikTok response, None if it is not
+    kept: only the datacenter and cookies of tiktok.com with an expiry are
+    (msToken, ...), cookies of the upload hosts and session cookies are not."""
+    domain = domain or ".tiktok.com"
+    if not domain.endswith("tiktok.com") or (expiry is None and name != "tt-target-idc"):
+        return None
+    cookie = {"name": name, "value": value, "domain": domain, "path": path or "/", "secure": bool(secure)}
+    if expiry is not None:
+        cookie["expiry"] = int(expiry)
+    return cookie
+
+
+def track_cookies(session, account):
+    """Save the cookies the responses of `session` set for `account` (its
+    datacenter, the rotating msToken, ...), see `persisted_cookie`. The
+    session itself picks them up for its next requests."""
+    if getattr(session, "cookies_tracked_account", None) == account:
+        return
+
+    def hook(r, *args, **kwargs):
+        cookies = [persisted_cookie(c.name, c.value, c.domain, c.path, c.expires, c.secure) for c in r.cookies]
+        cookies = [cookie for cookie in cookies if cookie]
+        if cookies:
+            note_cookies(account, cookies)
+
+    session.hooks["response"].append(hook)
+    session.cookies_tracked_account = account
+
+
+def saved_cookies(cookies, skip=("sessionid", "tt-target-idc")):
+    """Cookies of `cookies` (as loaded) kept from earlier responses and not
+    expired yet, the login cookies in `skip` left out."""
+    now = time.time()
+    return [cookie for cookie in cookies
+            if cookie["name"] not in skip and cookie.get("expiry") and cookie["expiry"] > now]
+
+
+def fresh_cookie(jar, name, min_ttl=0):
+    """Value of cookie `name` in the requests cookie `jar` when it stays valid
+    for at least `min_ttl` more seconds, otherwise None."""
+    deadline = time.time() + min_ttl
+    for cookie in jar:
+        if cookie.name == name and cookie.expires and cookie.expires > deadline:
+            return cookie.value
+    return None
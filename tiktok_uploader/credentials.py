@@ -0,0 +1,180 @@
+import threading, time
+
+import requests
+from requests_auth_aws_sigv4 import AWSSigV4
+
+from .Config import Config
+
+
+# Hands out the video_token_v5 that signs the ApplyUploadInner and
+# CommitUploadInner calls of an upload.
+AUTH_URL = "https://www.tiktok.com/api/v1/video/upload/auth/?aid=1988"
+
+
+class UploadCredentials:
+    """video_token_v5 of a login session and the AWSSigV4 signer built from it."""
+
+    def __init__(self, token, fetched_at=None, lifetime=None):
+        self.fetched_at = fetched_at or time.time()
+        self.expires_at = _expiry(token, self.fetched_at, lifetime or Config.get().upload_credentials_ttl)
+        self.signer = AWSSigV4(
+            "vod",
+            region="ap-singapore-1",
+            aws_access_key_id=token["access_key_id"],
+            aws_secret_access_key=token["secret_acess_key"],
+            aws_session_token=token["session_token"],
+        )
+
+
+def _expiry(token, fetched_at, lifetime):
+    try:
+        expires_at = float(token.get("expired_time") or 0)
+    except (TypeError, ValueError):
+        expires_at = 0
+    # Anything that is not a time in the future is not trusted.
+    return expires_at if expires_at > fetched_at else fetched_at + lifetime
+
+
+def credentials_from_response(r):
+    """Result of an upload auth response `r`: a dict with ``status`` ("ok",
+    "invalid" when TikTok rejects the session, "error" otherwise),
+    ``credentials`` (`UploadCredentials` when ok) and ``error``."""
+    try:
+        body = r.json()
+    except ValueError:
+        body = {}
+    if not isinstance(body, dict):
+        body = {}
+    token = body.get("video_token_v5")
+    if r.status_code == 200 and isinstance(token, dict):
+        try:
+            return {"status": "ok", "credentials": UploadCredentials(token), "error": None}
+        except KeyError as e:
+            return {"status": "error", "credentials": None, "error": f"video_token_v5 without {str(e)}"}
+    if r.status_code in (200, 401, 403):
+        return {"status": "invalid", "credentials": None,
+                "error": body.get("status_msg") or f"not logged in ({r.status_code})"}
+    return {"status": "error", "credentials": None, "error": f"HTTP {r.status_code}"}
+
+
+def fetch_upload_credentials(session):
+    """Ask TikTok for upload credentials with `session`, see `credentials_from_response`."""
+    try:
+        r = session.get(AUTH_URL, timeout=30)
+    except requests.RequestException as e:
+        return {"status": "error", "credentials": None, "error": f"{type(e).__name__}: {str(e)}"}
+    return credentials_from_response(r)
+
+
+def _session_key(session):
+    # Credentials belong to a login, not to an account name: a new login gets new ones.
+    return session.cookies.get("sessionid", domain=".tiktok.com")
+
+
+class CredentialCache:
+    """Upload credentials of every login session of the process.
+
+    Credentials are reused until `margin` seconds (UPLOAD_CREDENTIALS_MARGIN)
+    before they expire, so that an upload started with them can still commit.
+    In the `margin` seconds before that, a lookup still returns them but
+    fetches their successor in the background, so consecutive uploads of an
+    account never wait for the auth call."""
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, margin=None, clock=time.time):
+        self.margin = Config.get().upload_credentials_margin if margin is None else margin
+        self.clock = clock
+        self._credentials = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.fetches = 0
+
+    @staticmethod
+    def get():
+        with CredentialCache._instance_lock:
+            if not CredentialCache._instance:
+                CredentialCache._instance = CredentialCache()
+            return CredentialCache._instance
+
+    def lookup(self, key):
+        """Usable credentials cached under `key` (None if there are none) and
+        whether their refresh is due."""
+        now = self.clock()
+        with self._lock:
+            credentials = self._credentials.get(key)
+            if credentials is None or now >= credentials.expires_at - self.margin:
+                return None, False
+            return credentials, now >= credentials.expires_at - 2 * self.margin
+
+    def put(self, key, credentials):
+        with self._lock:
+            current = self._credentials.get(key)
+            if current is None or credentials.expires_at >= current.expires_at:
+                self._credentials[key] = credentials
+
+    def invalidate(self, key, credentials=None):
+        """Forget the credentials of `key`, only if they still are `credentials` when given."""
+        with self._lock:
+            if credentials is None or self._credentials.get(key) is credentials:
+                self._credentials.pop(key, None)
+
+    def claim_refresh(self, key):
+        """True if the caller should refresh `key`: no other refresh of it is running."""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def record(self, key, result):
+        """Store the result of fetching the credentials of `key`, ending its
+        refresh if one was claimed."""
+        with self._lock:
+            self._refreshing.discard(key)
+            self.fetches += 1
+        if result["status"] == "ok":
+            self.put(key, result["credentials"])
+        elif result["status"] == "invalid":
+            self.invalidate(key)
+        return result
+
+    def credentials(self, session):
+        """Upload credentials of the login of `session`: cached ones when they
+        are fresh enough, fetched otherwise. Returns a result dict, see
+        `credentials_from_response`."""
+        key = _session_key(session)
+        if not key:
+            return {"status": "invalid", "credentials": None, "error": "no session id"}
+        credentials, refresh = self.lookup(key)
+        if credentials is not None:
+            if refresh and self.claim_refresh(key):
+                threading.Thread(target=self._refresh, args=(key, session), daemon=True).start()
+            return {"status": "ok", "credentials": credentials, "error": None}
+        # A refresh running in the background is not waited for: the
+        # credentials it replaces are no longer usable anyway.
+        return self.record(key, fetch_upload_credentials(session))
+
+    def _refresh(self, key, session):
+        self.record(key, fetch_upload_credentials(session))
+
+
+def upload_credentials(session):
+    """Upload credentials of the login of `session`, see `CredentialCache.credentials`."""
+    return CredentialCache.get().credentials(session)
+
+
+def remember_credentials(session, result):
+    """Cache the credentials of an auth call made elsewhere with `session`,
+    e.g. by a session check, for the next upload of that login."""
+    key = _session_key(session)
+    if key and result["status"] == "ok":
+        CredentialCache.get().put(key, result["credentials"])
+
+
+def forget_credentials(session, credentials=None):
+    """Drop the cached credentials of `session` after TikTok refused them."""
+    key = _session_key(session)
+    if key:
+        CredentialCache.get().invalidate(key, credentials)
@@ -0,0 +1,74 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .cookies import load_cookies_from_file, track_cookies
+from .credentials import AUTH_URL, credentials_from_response, remember_credentials
+from .session_store import SessionStore
+
+
+# The cheapest authenticated call of the upload flow: it only hands out
+# upload credentials to a valid session.
+CHECK_URL = AUTH_URL
+
+
+def check_session(account, proxy=None):
+    """Check that the saved session of `account` is still logged in.
+
+    Returns a dict with ``status`` ("ok", "invalid" when TikTok rejects the
+    session or none is saved, "error" when the check itself could not be
+    made), ``checked_at``, ``latency`` in seconds and ``error``."""
+    from .http_sessions import get_session
+    from .tiktok import _setup_session
+
+    result = {"status": "invalid", "checked_at": time.time(), "latency": None, "error": None}
+    cookies = load_cookies_from_file(f"tiktok_session-{account}")
+    session_id = next((c["value"] for c in cookies if c["name"] == 'sessionid'), None)
+    if not session_id:
+        result["error"] = "no session id saved"
+        return result
+    dc_id = next((c["value"] for c in cookies if c["name"] == 'tt-target-idc'), None)
+
+    # The session the uploads of this account will use: the check also opens its connection.
+    session = get_session(account, proxy, setup=_setup_session)
+    session.cookies.set("sessionid", session_id, domain=".tiktok.com")
+    if dc_id:
+        session.cookies.set("tt-target-idc", dc_id, domain=".tiktok.com")
+    track_cookies(session, account)
+    start = time.perf_counter()
+    try:
+        r = session.get(CHECK_URL, timeout=30)
+    except requests.RequestException as e:
+        result.update(status="error", error=f"{type(e).__name__}: {str(e)}")
+        return result
+    result["latency"] = round(time.perf_counter() - start, 3)
+    auth = credentials_from_response(r)
+    result.update(status=auth["status"], error=auth["error"])
+    # The next upload of the account then skips its own auth call.
+    remember_credentials(session, auth)
+    return result
+
+
+def check_sessions(accounts=None, workers=16, proxy=None, store=None):
+    """Check the sessions of `accounts` (every saved account by default)
+    concurrently and record the results in the session store, where
+    `SessionStore.quarantined` finds the invalid ones. Returns the results
+    (account -> dict, see `check_session`)."""
+    store = store or SessionStore.get()
+    if accounts is None:
+        accounts = [name[len("tiktok_session-"):] for name in store.names("tiktok_session-")]
+    accounts = list(dict.fromkeys(accounts))
+    if not accounts:
+        return {}
+
+    def check(account):
+        try:
+            return check_session(account, proxy)
+        except Exception as e:
+            return {"status": "error", "checked_at": time.time(), "latency": None, "error": f"{type(e).__name__}: {str(e)}"}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(accounts)))) as executor:
+        results = dict(zip(accounts, executor.map(check, accounts)))
+    store.record_checks(results)
+    return results
@@ -0,0 +1,81 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .Config import Config
+
+
+class SessionPool:
+    """`requests.Session` objects shared by every upload of the process, one
+    per account and proxy.
+
+    Each session mounts an `HTTPAdapter` whose connection pools are large
+    enough for all the parts in flight, so the keep-alive connections to
+    www.tiktok.com and to the upload hosts are set up once and then reused
+    by every phase of every upload of that account."""
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, pool_size=None):
+        self.pool_size = pool_size or Config.get().http_pool_size
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get():
+        with SessionPool._instance_lock:
+            if not SessionPool._instance:
+                SessionPool._instance = SessionPool()
+            return SessionPool._instance
+
+    def _new_session(self, proxy):
+        session = requests.Session()
+        # Only connection failures are retried here: a request that reached
+        # the server is left to the caller, which knows if it can be replayed.
+        adapter = HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=self.pool_size,
+            max_retries=Retry(total=None, connect=2, read=0, status=0, redirect=5, backoff_factor=0.2),
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if proxy:
+            session.proxies = {
+                "http": proxy,
+                "https": proxy
+            }
+        return session
+
+    def session(self, account, proxy=None, setup=None):
+        """Session of `account` going through `proxy`. `setup(session, account)`
+        is called once, when the session is created."""
+        key = (account, proxy or None)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = self._new_session(proxy)
+                if setup:
+                    setup(session, account)
+                self._sessions[key] = session
+            return session
+
+    def discard(self, account, proxy=None):
+        """Close and forget a session, e.g. after its cookies were invalidated."""
+        with self._lock:
+            session = self._sessions.pop((account, proxy or None), None)
+        if session is not None:
+            session.close()
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = list(self._sessions.values()), {}
+        for session in sessions:
+            session.close()
+
+
+def get_session(account, proxy=None, setup=None):
+    """Shared session of `account` over `proxy`, see `SessionPool.session`."""
+    return SessionPool.get().session(account, proxy, setup)
@@ -0,0 +1,272 @@
+import json, os, queue, socket, sqlite3, time
+
+from .Config import Config
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    key TEXT,
+    account TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_after REAL NOT NULL DEFAULT 0,
+    lease_until REAL,
+    worker TEXT,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    seconds REAL,
+    error TEXT
+);
+-- Partial indexes only hold live rows, so they stay small however many
+-- finished jobs pile up in the table.
+CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (priority DESC, id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS jobs_leased ON jobs (lease_until) WHERE status = 'running';
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_key ON jobs (key) WHERE key IS NOT NULL;
+"""
+
+
+class QueuedJob:
+    """A claimed job: the `upload_video` arguments of one upload."""
+
+    def __init__(self, job_id, account, fields, priority, attempts):
+        self.id = job_id
+        self.account = account
+        self.fields = fields
+        self.priority = priority
+        self.attempts = attempts
+
+
+class JobQueue:
+    """Durable upload queue in an SQLite database (WAL mode) under STATE_DIR.
+
+    Jobs go from ``queued`` to ``running`` when a worker claims them with a
+    lease, then to ``done``, or back to ``queued`` after a failure until
+    JOB_MAX_ATTEMPTS is reached and they are ``failed``. A job whose lease runs
+    out (its worker died) is claimed again by the next worker.
+
+    A JobQueue is meant for one thread; each process opens its own."""
+
+    def __init__(self, path=None):
+        config = Config.get()
+        self.path = path or os.path.join(os.getcwd(), config.state_dir, "jobs.sqlite3")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Autocommit: transactions are opened explicitly, IMMEDIATE where rows are claimed.
+        self.db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # Losing the last commits on power loss is fine, leases hand the jobs out again.
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+        self.max_attempts = config.job_max_attempts
+        self.retry_delay = config.job_retry_delay
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _transaction(self, mode="DEFERRED"):
+        return _Transaction(self.db, mode)
+
+    def enqueue(self, jobs):
+        """Queue many jobs in one transaction. `jobs` are ``(key, fields, priority)``
+        tuples, `fields` the `upload_video` arguments and `key` an optional id
+        that makes enqueueing the same job twice a no-op. Returns the number
+        of jobs added."""
+        now = time.time()
+        rows = [(key, fields["session_user"], json.dumps(fields), priority, now) for key, fields, priority in jobs]
+        with self._transaction():
+            before = self.db.total_changes
+            self.db.executemany("INSERT OR IGNORE INTO jobs (key, account, fields, priority, enqueued_at) "
+                                "VALUES (?, ?, ?, ?, ?)", rows)
+            return self.db.total_changes - before
+
+    def claim(self, worker, limit=1, lease=None):
+        """Lease up to `limit` runnable jobs, highest priority first, to `worker`."""
+        now = time.time()
+        lease = Config.get().job_lease if lease is None else lease
+        with self._transaction("IMMEDIATE"):
+            # Jobs of dead workers past their last attempt are not handed out again.
+            self.db.execute("UPDATE jobs SET status = 'failed', finished_at = ?, error = 'lease expired' "
+                            "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                            (now, now, self.max_attempts))
+            ids = [row[0] for row in self.db.execute(
+                "SELECT id FROM jobs WHERE status = 'running' AND lease_until < ? LIMIT ?", (now, limit))]
+            ids += [row[0] for row in self.db.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' AND run_after <= ? ORDER BY priority DESC, id LIMIT ?",
+                (now, limit - len(ids)))]
+            if not ids:
+                return []
+            marks = ",".join("?" * len(ids))
+            rows = self.db.execute(
+                f"UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, started_at = ?, attempts = attempts + 1 "
+                f"WHERE id IN ({marks}) RETURNING id, account, fields, priority, attempts",
+                (worker, now + lease, now, *ids)).fetchall()
+        rows.sort(key=lambda row: (-row[3], row[0]))
+        return [QueuedJob(job_id, account, json.loads(fields), priority, attempts)
+                for job_id, account, fields, priority, attempts in rows]
+
+    def extend(self, worker, job_ids, lease=None):
+        """Renew the leases `worker` holds on `job_ids`."""
+        lease = Config.get().job_lease if lease is None else lease
+        with self._transaction():
+            self.db.executemany("UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                                [(time.time() + lease, job_id, worker) for job_id in job_ids])
+
+    def release(self, worker, job_ids, delay=0):
+        """Give back jobs `worker` claimed but did not start, to be run again
+        `delay` seconds from now. The attempt is not counted."""
+        run_after = time.time() + delay
+        with self._transaction():
+            self.db.executemany("UPDATE jobs SET status = 'queued', lease_until = NULL, attempts = attempts - 1, run_after = ? "
+                                "WHERE id = ? AND worker = ? AND status = 'running'",
+                                [(run_after, job_id, worker) for job_id in job_ids])
+
+    def finish(self, worker, results):
+        """Record many outcomes in one transaction. `results` are ``(job, result)``
+        pairs, `result` a `batch.run_job` record. Failed jobs are queued again
+        JOB_RETRY_DELAY seconds later (times the attempt) until JOB_MAX_ATTEMPTS."""
+        now = time.time()
+        done, retry, failed = [], [], []
+        for job, result in results:
+            seconds = result.get("seconds")
+            if result.get("status") == "ok":
+                done.append((now, seconds, job.id, worker))
+            elif job.attempts < self.max_attempts:
+                retry.append((now + self.retry_delay * job.attempts, seconds, result.get("error"), job.id, worker))
+            else:
+                failed.append((now, seconds, result.get("error"), job.id, worker))
+        # The worker check keeps a job that was handed to someone else after
+        # its lease ran out from being overwritten.
+        with self._transaction():
+            self.db.executemany("UPDATE jobs SET status = 'done', lease_until = NULL, finished_at = ?, seconds = ?, "
+                                "error = NULL WHERE id = ? AND worker = ? AND status = 'running'", done)
+            self.db.executemany("UPDATE jobs SET status = 'queued', lease_until = NULL, run_after = ?, seconds = ?, "
+                                "error = ? WHERE id = ? AND worker = ? AND status = 'running'", retry)
+            self.db.executemany("UPDATE jobs SET status = 'failed', lease_until = NULL, finished_at = ?, seconds = ?, "
+                                "error = ? WHERE id = ? AND worker = ? AND status = 'running'", failed)
+
+    def counts(self):
+        """Number of jobs per status."""
+        return dict(self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+
+
+class _Transaction:
+    def __init__(self, db, mode):
+        self.db = db
+        self.mode = mode
+
+    def __enter__(self):
+        self.db.execute(f"BEGIN {self.mode}")
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def run_worker(workers=4, path=None, once=False, poll=1.0, upload=None, scheduler=None):
+    """Claim jobs from the queue and upload them until interrupted.
+
+    Jobs run through an `UploadScheduler`, so accounts keep to their posting
+    rate, and up to twice `workers` jobs are leased ahead so that a worker never
+    waits on the database. Outcomes are written back in batches as they come in.
+    Jobs of accounts whose session check failed (`SessionStore.quarantined`,
+    looked up every minute) are put back for SESSION_CHECK_TTL seconds without
+    using an attempt. With `once`, returns when the queue has nothing left to
+    run. Returns ``(succeeded, failed)`` counts."""
+    from .batch import BatchJob, run_job
+    from .scheduler import AccountQuarantined, PostingTooFast, UploadScheduler
+    from .session_store import SessionStore
+
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    lease = Config.get().job_lease
+    jobs = JobQueue(path)
+    own_scheduler = scheduler is None
+    scheduler = scheduler or UploadScheduler(workers)
+    finished = queue.Queue()
+    running = {}
+    succeeded = failed = 0
+    renewed = time.monotonic()
+    quarantined = {}
+    quarantine_checked = None
+
+    def settle(job, future):
+        try:
+            result = future.result()
+        except PostingTooFast:
+            result = {"status": "failed", "error": "posting too fast"}
+        except AccountQuarantined as e:
+            result = {"status": "quarantined", "error": str(e)}
+        except BaseException as e:
+            result = {"status": "failed", "error": f"{type(e).__name__}: {str(e)}"}
+        finished.put((job, result))
+
+    def record(results):
+        nonlocal succeeded, failed
+        held = [job.id for job, result in results if result["status"] == "quarantined"]
+        results = [(job, result) for job, result in results if result["status"] != "quarantined"]
+        jobs.release(name, held, Config.get().session_check_ttl)
+        jobs.finish(name, results)
+        for job_id in held:
+            running.pop(job_id, None)
+        for job, result in results:
+            running.pop(job.id, None)
+            if result["status"] == "ok":
+                succeeded += 1
+            else:
+                failed += 1
+                print(f"[-] Job {job.id} ({job.account}) failed: {result.get('error', 'upload failed')}")
+
+    print(f"[+] Worker {name} started, {jobs.counts().get('queued', 0)} jobs queued")
+    try:
+        while True:
+            if quarantine_checked is None or time.monotonic() - quarantine_checked > 60:
+                latest = SessionStore.get().quarantined()
+                for account in set(quarantined) - set(latest):
+                    scheduler.release(account)
+                for account in set(latest) - set(quarantined):
+                    print(f"[-] Holding back the jobs of {account}: {latest[account]}")
+                    scheduler.quarantine(account, latest[account])
+                quarantined, quarantine_checked = latest, time.monotonic()
+
+            claimed = jobs.claim(name, 2 * max(1, workers) - len(running), lease) if len(running) < 2 * max(1, workers) else []
+            for job in claimed:
+                batch_job = BatchJob(f"job-{job.id}", job.id, job.fields, job.priority)
+                future = scheduler.submit(job.account, run_job, batch_job, upload, priority=job.priority)
+                running[job.id] = future
+                future.add_done_callback(lambda future, job=job: settle(job, future))
+            if once and not running and not claimed:
+                break
+
+            # Wait for the next outcome, then take whatever else is ready with it.
+            results = []
+            try:
+                results.append(finished.get(timeout=poll))
+                while True:
+                    results.append(finished.get_nowait())
+            except queue.Empty:
+                pass
+            if results:
+                record(results)
+
+            if running and time.monotonic() - renewed > lease / 3:
+                jobs.extend(name, list(running), lease)
+                renewed = time.monotonic()
+    except KeyboardInterrupt:
+        print("[-] Stopping: waiting for the uploads in progress")
+        unstarted = [job_id for job_id, future in running.items() if future.cancel()]
+        jobs.release(name, unstarted)
+        # Cancelled jobs are settled too: skip them.
+        results = [finished.get() for _ in range(len(running))]
+        record([(job, result) for job, result in results if job.id not in unstarted])
+    finally:
+        if own_scheduler:
+            scheduler.close(wait=False)
+        jobs.close()
+    return succeeded, failed
@@ -0,0 +1,99 @@
+import hashlib, json, os, threading, time
+
+from .Config import Config
+
+
+class UploadJournal:
+    """On-disk record of an upload in progress, so that a rerun can resume it.
+
+    One JSON file per account and video under ``STATE_DIR/uploads`` holds the
+    project, the upload session returned by ApplyUploadInner and the parts the
+    upload host already accepted. The journal is thrown away once the video is
+    published, when the video file changes, or after UPLOAD_JOURNAL_TTL seconds,
+    past which the upload credentials are no longer valid."""
+
+    TRANSFER_FIELDS = ("video_id", "session_key", "upload_id", "upload_host", "store_uri", "video_auth", "chunk_size")
+
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def open(session_user, video_path, ttl=None):
+        """Journal of `session_user` uploading `video_path`, fresh if there is nothing to resume."""
+        video_path = os.path.abspath(video_path)
+        stat = os.stat(video_path)
+        ttl = Config.get().upload_journal_ttl if ttl is None else ttl
+        key = hashlib.sha1(f"{session_user}\0{video_path}".encode("utf-8")).hexdigest()
+        path = os.path.join(os.getcwd(), Config.get().state_dir, "uploads", key + ".json")
+        fingerprint = {"user": session_user, "video": video_path, "size": stat.st_size, "mtime": stat.st_mtime}
+
+        journal = UploadJournal(path, None)
+        data = journal._read()
+        if data is not None:
+            if any(data.get(k) != v for k, v in fingerprint.items()):
+                print("[-] Video changed since the interrupted upload, starting over")
+            elif time.time() - data.get("created_at", 0) > ttl:
+                print("[-] Interrupted upload is too old to resume, starting over")
+            else:
+                journal.data = data
+                return journal
+            journal.discard()
+        journal.data = dict(fingerprint, created_at=time.time(), stage="project", parts={})
+        return journal
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"[-] Ignoring unreadable upload journal {self.path}: {str(e)}")
+            return None
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.data, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, name, default=None):
+        return self.data.get(name, default)
+
+    @property
+    def stage(self):
+        """"project", "transfer", "finished" or "committed": the last step completed"""
+        return self.data.get("stage")
+
+    @property
+    def parts(self) -> dict:
+        """CRC32 of every part the upload host accepted, by part number"""
+        return {int(number): crc for number, crc in self.data.get("parts", {}).items()}
+
+    def update(self, **fields):
+        with self._lock:
+            self.data.update(fields)
+            self._save()
+
+    def part_done(self, part_number, crc):
+        """Record an accepted part; called from the upload threads."""
+        with self._lock:
+            self.data["parts"][str(part_number)] = crc
+            self._save()
+
+    def reset_transfer(self):
+        """Forget the upload session, keeping the project, to transfer the video again."""
+        with self._lock:
+            for name in UploadJournal.TRANSFER_FIELDS:
+                self.data.pop(name, None)
+            self.data.update(stage="project", parts={})
+            self._save()
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,103 @@
+import json, os, random, sqlite3, threading
+
+from .Config import Config
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    account TEXT PRIMARY KEY,
+    profile TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Screen sizes and pixel ratios of common desktop devices, for user agents
+# that are not mobile ones.
+_DESKTOP_VIEWPORTS = [(1920, 1080), (1536, 864), (1440, 900), (1366, 768), (1680, 1050), (2560, 1440), (1280, 720)]
+_MOBILE_VIEWPORTS = [(390, 844), (393, 873), (412, 915), (414, 896), (375, 812), (360, 800)]
+
+
+def random_user_agent():
+    """A user agent from fake_useragent, DEFAULT_USER_AGENT if it fails."""
+    from fake_useragent import FakeUserAgentError, UserAgent
+    try:
+        return UserAgent().random
+    except FakeUserAgentError:
+        print("[-] Could not get random user agent, using default")
+        return DEFAULT_USER_AGENT
+
+
+def new_profile(user_agent=None, rng=random):
+    """Device fingerprint for a new account: user agent and the viewport,
+    pixel ratio and touch support the signer emulates with it."""
+    user_agent = user_agent or random_user_agent()
+    mobile = "Mobile" in user_agent
+    width, height = rng.choice(_MOBILE_VIEWPORTS if mobile else _DESKTOP_VIEWPORTS)
+    return {
+        "user_agent": user_agent,
+        "viewport": {"width": width, "height": height},
+        "device_scale_factor": rng.choice([2, 3]) if mobile else rng.choice([1, 1, 1.25, 1.5, 2]),
+        "is_mobile": mobile,
+        "has_touch": mobile,
+        "locale": "en-US",
+    }
+
+
+class ProfileStore:
+    """Fingerprint profile of every account, in an SQLite database under
+    STATE_DIR so that an account keeps its user agent and device across runs
+    and worker processes.
+
+    Every profile is read into memory on first use; an account without one
+    gets a new profile, unless another process saved one for it first."""
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(os.getcwd(), Config.get().state_dir, "profiles.sqlite3")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(_SCHEMA)
+        self._profiles = {account: json.loads(profile)
+                          for account, profile in self.db.execute("SELECT account, profile FROM profiles")}
+
+    @staticmethod
+    def get():
+        with ProfileStore._instance_lock:
+            if not ProfileStore._instance:
+                ProfileStore._instance = ProfileStore()
+            return ProfileStore._instance
+
+    def profile(self, account):
+        """Profile of `account`, created the first time it is asked for."""
+        profile = self._profiles.get(account)
+        if profile is not None:
+            return profile
+        with self._lock:
+            if account not in self._profiles:
+                row = self.db.execute("SELECT profile FROM profiles WHERE account = ?", (account,)).fetchone()
+                if row is None:
+                    self.db.execute("INSERT OR IGNORE INTO profiles (account, profile) VALUES (?, ?)",
+                                    (account, json.dumps(new_profile())))
+                    row = self.db.execute("SELECT profile FROM profiles WHERE account = ?", (account,)).fetchone()
+                self._profiles[account] = json.loads(row[0])
+            return self._profiles[account]
+
+    def set_profile(self, account, profile):
+        """Replace the profile of `account`, e.g. to pin its user agent."""
+        with self._lock:
+            self.db.execute("INSERT OR REPLACE INTO profiles (account, profile) VALUES (?, ?)", (account, json.dumps(profile)))
+            self._profiles[account] = profile
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+def get_profile(account):
+    """Fingerprint profile of `account`, see `ProfileStore.profile`."""
+    return ProfileStore.get().profile(account)
@@ -0,0 +1,216 @@
+import heapq, itertools, threading, time
+from concurrent.futures import Future
+
+from .Config import Config
+
+
+class PostingTooFast(Exception):
+    """TikTok answered "You are posting too fast. Take a rest." for this account."""
+
+
+class AccountQuarantined(Exception):
+    """The account is left out of scheduling, its saved session being invalid."""
+
+
+class TokenBucket:
+    """`rate` tokens per second up to `capacity`; starts full."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self):
+        """Seconds until a token is available, 0 if one is."""
+        if not self.rate:
+            return 0.0
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        if self.rate:
+            self._refill()
+            self.tokens -= 1
+
+    def empty(self):
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class _Account:
+    def __init__(self, name, bucket):
+        self.name = name
+        self.bucket = bucket
+        self.jobs = []
+        self.running = 0
+        self.blocked_until = 0.0
+        self.last_dispatch = 0.0
+
+
+class UploadScheduler:
+    """Runs upload jobs on `workers` threads, within each account's posting budget.
+
+    Every account has a token bucket (ACCOUNT_POSTS_PER_HOUR, bursts of
+    ACCOUNT_POST_BURST) and at most `per_account` jobs running. A free worker
+    takes the highest priority job among the accounts that can post right now,
+    the account served longest ago first, so throttled accounts never hold a
+    worker while others wait. An optional global bucket (GLOBAL_POSTS_PER_HOUR)
+    caps all accounts together.
+
+    A job raising `PostingTooFast` empties its account's bucket, benches the
+    account for THROTTLE_COOLDOWN seconds and goes back to the queue, up to
+    `throttle_retries` times. Jobs of a quarantined account (see `quarantine`)
+    fail with `AccountQuarantined` without taking a worker."""
+
+    def __init__(self, workers=4, posts_per_hour=None, burst=None, global_posts_per_hour=None, cooldown=None,
+                 per_account=1, throttle_retries=3, clock=time.monotonic):
+        config = Config.get()
+        posts_per_hour = config.account_posts_per_hour if posts_per_hour is None else posts_per_hour
+        global_posts_per_hour = config.global_posts_per_hour if global_posts_per_hour is None else global_posts_per_hour
+        self.rate = posts_per_hour / 3600
+        self.burst = config.account_post_burst if burst is None else burst
+        self.cooldown = config.throttle_cooldown if cooldown is None else cooldown
+        self.per_account = per_account
+        self.throttle_retries = throttle_retries
+        self.clock = clock
+        self.global_bucket = TokenBucket(global_posts_per_hour / 3600, self.burst, clock) if global_posts_per_hour else None
+        self.throttled = 0
+
+        self._accounts = {}
+        self._quarantined = {}
+        self._pending = 0
+        self._running = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._workers = [threading.Thread(target=self._work, daemon=True) for _ in range(max(1, workers))]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, account, fn, *args, priority=0, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` as a post of `account`. Higher
+        `priority` goes first within the account's budget. Returns a Future."""
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("scheduler is closed")
+            if account in self._quarantined:
+                future.set_exception(AccountQuarantined(self._quarantined[account]))
+                return future
+            state = self._accounts.get(account)
+            if state is None:
+                state = self._accounts[account] = _Account(account, TokenBucket(self.rate, self.burst, self.clock))
+            heapq.heappush(state.jobs, (-priority, next(self._seq), fn, args, kwargs, future, 0))
+            self._pending += 1
+            self._cond.notify()
+        return future
+
+    def quarantine(self, account, reason=None):
+        """Fail the queued and future jobs of `account` with `AccountQuarantined`."""
+        with self._cond:
+            self._quarantined[account] = reason or "session is not valid"
+            state = self._accounts.get(account)
+            jobs = state.jobs if state else []
+            for job in jobs:
+                if not job[5].done():
+                    job[5].set_exception(AccountQuarantined(self._quarantined[account]))
+            self._pending -= len(jobs)
+            if state:
+                state.jobs = []
+            self._cond.notify_all()
+
+    def release(self, account):
+        """Schedule `account` again after `quarantine`."""
+        with self._cond:
+            self._quarantined.pop(account, None)
+
+    def _next_job(self):
+        """Job to run now and its account, or the seconds to wait for one. Called with the lock held."""
+        now = self.clock()
+        best = None
+        wait = None
+        global_wait = self.global_bucket.available() if self.global_bucket else 0.0
+        for state in self._accounts.values():
+            if not state.jobs or state.running >= self.per_account:
+                continue
+            delay = max(state.blocked_until - now, state.bucket.available(), global_wait)
+            if delay > 0:
+                wait = delay if wait is None else min(wait, delay)
+                continue
+            key = (state.jobs[0][0], state.last_dispatch, state.jobs[0][1])
+            if best is None or key < best[0]:
+                best = (key, state)
+        if best is None:
+            return None, wait
+        state = best[1]
+        state.bucket.take()
+        if self.global_bucket:
+            self.global_bucket.take()
+        state.running += 1
+        state.last_dispatch = now
+        self._pending -= 1
+        self._running += 1
+        return (state, heapq.heappop(state.jobs)), None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed and not self._pending:
+                        return
+                    job, wait = self._next_job()
+                    if job:
+                        break
+                    self._cond.wait(wait)
+            state, (priority, seq, fn, args, kwargs, future, attempt) = job
+            requeue = False
+            # A requeued job's future is already running: it stays so until settled.
+            if attempt or future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except PostingTooFast as e:
+                    with self._cond:
+                        self.throttled += 1
+                        state.bucket.empty()
+                        state.blocked_until = self.clock() + self.cooldown
+                    print(f"[-] {state.name} is posting too fast, pausing it for {self.cooldown:.0f} s")
+                    if attempt < self.throttle_retries:
+                        requeue = True
+                    else:
+                        future.set_exception(e)
+                except BaseException as e:
+                    future.set_exception(e)
+            with self._cond:
+                state.running -= 1
+                self._running -= 1
+                if requeue:
+                    heapq.heappush(state.jobs, (priority, seq, fn, args, kwargs, future, attempt + 1))
+                    self._pending += 1
+                self._cond.notify_all()
+
+    def wait(self):
+        """Block until every queued job has finished."""
+        with self._cond:
+            while self._pending or self._running:
+                self._cond.wait()
+
+    def close(self, wait=True):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
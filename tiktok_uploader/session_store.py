@@ -0,0 +1,242 @@
+import contextlib, os, pickle, sqlite3, threading, time
+
+from .Config import Config
+
+
+_SCHEMA = """
+-- A rowid table: listing names then only reads the primary key index,
+-- not the cookies.
+CREATE TABLE IF NOT EXISTS sessions (
+    name TEXT PRIMARY KEY,
+    cookies BLOB NOT NULL,
+    -- Save time, or modification time of the cookie file they came from.
+    modified_at REAL NOT NULL,
+    -- modified_at of the save that brought the current sessionid.
+    login_at REAL,
+    -- Value of the store version when the row was last written.
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS sessions_version ON sessions (version);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', '0'), ('deletes', '0');
+-- Latest health check of each account (cookie name without its prefix).
+CREATE TABLE IF NOT EXISTS session_checks (
+    account TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    latency REAL,
+    error TEXT
+);
+"""
+
+
+class SessionStore:
+    """Saved account cookies, one row per cookie name in an SQLite database
+    under STATE_DIR, instead of one pickle file per account.
+
+    Lookups by name hit an in-process cache. When another connection (another
+    worker process) commits, only the rows it wrote since are dropped from the
+    cache, found through the store version they carry. Cookie files
+    found in CookiesDir are imported when they are newer than what is saved
+    under their name, so files copied there keep working."""
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path=None, cookies_dir=None):
+        config = Config.get()
+        self.path = path or os.path.join(os.getcwd(), config.state_dir, "sessions.sqlite3")
+        self.cookies_dir = cookies_dir or os.path.join(os.getcwd(), config.cookies_dir)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock = threading.RLock()
+        self.db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+        self._add_login_at()
+        self._cache = {}
+        self._data_version = None
+        self._version = None
+        self._deletes = None
+
+    @staticmethod
+    def get():
+        with SessionStore._instance_lock:
+            if not SessionStore._instance:
+                SessionStore._instance = SessionStore()
+            return SessionStore._instance
+
+    def _fresh_cache(self):
+        # data_version only moves when another connection commits.
+        data_version = self.db.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._data_version = data_version
+            meta = dict(self.db.execute("SELECT key, value FROM meta WHERE key IN ('version', 'deletes')"))
+            if meta["deletes"] != self._deletes or self._version is None:
+                self._cache.clear()
+            else:
+                for (name,) in self.db.execute("SELECT name FROM sessions WHERE version > ?", (self._version,)):
+                    self._cache.pop(name, None)
+            self._version, self._deletes = int(meta["version"]), meta["deletes"]
+        return self._cache
+
+    def _add_login_at(self):
+        # Stores created before login_at existed: their sessions date from their last save.
+        if "login_at" in {row[1] for row in self.db.execute("PRAGMA table_info(sessions)")}:
+            return
+        try:
+            with self._transaction():
+                self.db.execute("ALTER TABLE sessions ADD COLUMN login_at REAL")
+                self.db.execute("UPDATE sessions SET login_at = modified_at")
+        except sqlite3.OperationalError:
+            # Added by another process in the meantime.
+            pass
+
+    def _bump(self, key):
+        """Next value of the `key` counter of meta. Called in a write transaction."""
+        return int(self.db.execute("UPDATE meta SET value = value + 1 WHERE key = ? RETURNING value", (key,)).fetchone()[0])
+
+    def _cookie_file(self, name):
+        return os.path.join(self.cookies_dir, name + ".cookie")
+
+    def load(self, name):
+        """Cookies saved as `name`, None if there are none."""
+        with self._lock:
+            cache = self._fresh_cache()
+            entry = cache.get(name)
+            if entry is None:
+                row = self.db.execute("SELECT cookies, modified_at FROM sessions WHERE name = ?", (name,)).fetchone()
+                entry = cache[name] = (pickle.loads(row[0]), row[1]) if row else (None, None)
+            cookies, modified_at = entry
+            mtime = _mtime(self._cookie_file(name))
+            if mtime is not None and (cookies is None or mtime > modified_at):
+                cookies = self._import_file(name, mtime) or cookies
+        return [dict(cookie) for cookie in cookies] if cookies is not None else None
+
+    def save(self, name, cookies, modified_at=None):
+        """Replace the cookies saved as `name`."""
+        cookies = [dict(cookie) for cookie in cookies]
+        modified_at = modified_at or time.time()
+        with self._lock, self._transaction():
+            version = self._bump("version")
+            # Refreshed cookies of the same login (msToken, datacenter, ...) keep its login time.
+            row = self.db.execute("SELECT cookies, login_at FROM sessions WHERE name = ?", (name,)).fetchone()
+            login_at = modified_at
+            if row and row[1] is not None and _session_id(pickle.loads(row[0])) == _session_id(cookies):
+                login_at = row[1]
+            self.db.execute("INSERT OR REPLACE INTO sessions (name, cookies, modified_at, login_at, version) VALUES (?, ?, ?, ?, ?)",
+                            (name, pickle.dumps(cookies, protocol=pickle.HIGHEST_PROTOCOL), modified_at, login_at, version))
+            self._fresh_cache()[name] = (cookies, modified_at)
+
+    def delete(self, name):
+        """Forget `name`, its cookie file included. True if it existed."""
+        with self._lock:
+            with self._transaction():
+                self._bump("deletes")
+                deleted = self.db.execute("DELETE FROM sessions WHERE name = ?", (name,)).rowcount > 0
+            self._fresh_cache().pop(name, None)
+            if os.path.exists(self._cookie_file(name)):
+                os.remove(self._cookie_file(name))
+                deleted = True
+        return deleted
+
+    def names(self, prefix=""):
+        """Saved cookie names starting with `prefix`, sorted."""
+        self.import_cookie_files()
+        with self._lock:
+            return [row[0] for row in self.db.execute(
+                "SELECT name FROM sessions WHERE name >= ? AND name < ? ORDER BY name", (prefix, prefix + "\U0010ffff"))]
+
+    def import_cookie_files(self, force=False):
+        """Import the cookie files of CookiesDir that are newer than what is
+        saved under their name. The directory is only scanned when its
+        modification time changed, unless `force`. Returns the number imported."""
+        dir_mtime = _mtime(self.cookies_dir)
+        if dir_mtime is None:
+            return 0
+        with self._lock:
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'cookies_dir_mtime'").fetchone()
+            if not force and row and float(row[0]) == dir_mtime:
+                return 0
+            known = dict(self.db.execute("SELECT name, modified_at FROM sessions"))
+            imported = 0
+            with self._transaction():
+                for entry in os.scandir(self.cookies_dir):
+                    if not entry.name.endswith(".cookie"):
+                        continue
+                    name = entry.name[:-len(".cookie")]
+                    mtime = entry.stat().st_mtime
+                    if name not in known or mtime > known[name]:
+                        imported += self._import_file(name, mtime) is not None
+                self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('cookies_dir_mtime', ?)", (str(dir_mtime),))
+        if imported:
+            print(f"[+] Imported {imported} cookie file(s) from {self.cookies_dir}")
+        return imported
+
+    def _import_file(self, name, mtime):
+        try:
+            with open(self._cookie_file(name), "rb") as f:
+                cookies = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"[-] Could not import cookie file {self._cookie_file(name)}: {str(e)}")
+            return None
+        self.save(name, cookies, modified_at=mtime)
+        return cookies
+
+    def record_checks(self, results):
+        """Store session check `results` (account -> dict of status, checked_at, latency, error)."""
+        with self._lock, self._transaction():
+            self.db.executemany("INSERT OR REPLACE INTO session_checks (account, status, checked_at, latency, error) "
+                                "VALUES (?, ?, ?, ?, ?)",
+                                [(account, r["status"], r["checked_at"], r.get("latency"), r.get("error"))
+                                 for account, r in results.items()])
+
+    def checks(self):
+        """Latest session check of every checked account."""
+        with self._lock:
+            rows = self.db.execute("SELECT account, status, checked_at, latency, error FROM session_checks").fetchall()
+        return {account: {"status": status, "checked_at": checked_at, "latency": latency, "error": error}
+                for account, status, checked_at, latency, error in rows}
+
+    def quarantined(self, max_age=None):
+        """Accounts whose session was found invalid in the last `max_age`
+        seconds (SESSION_CHECK_TTL) and not logged in again since (a new
+        sessionid saved), with the reason."""
+        max_age = Config.get().session_check_ttl if max_age is None else max_age
+        with self._lock:
+            return dict(self.db.execute(
+                "SELECT c.account, c.error FROM session_checks c LEFT JOIN sessions s ON s.name = 'tiktok_session-' || c.account "
+                "WHERE c.status = 'invalid' AND c.checked_at > ? AND (s.login_at IS NULL OR s.login_at < c.checked_at)",
+                (time.time() - max_age,)))
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """Write transaction; nested ones join the outer one."""
+        if self.db.in_transaction:
+            yield
+            return
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+
+def _session_id(cookies):
+    return next((c.get("value") for c in cookies if c.get("name") == "sessionid"), None)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
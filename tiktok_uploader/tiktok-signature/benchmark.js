@@ -0,0 +1,83 @@
+// benchmark.js
+// Micro-benchmark of signer cold start and per-signature latency.
+// Usage: node benchmark.js [--runs 200] [--browser] [--startup 5]
+// --startup N times N browser signer starts with each bootstrap mode.
+const VmSigner = require("./vm");
+
+const URL_TO_SIGN =
+  "https://www.tiktok.com/api/v1/web/project/post/?app_name=tiktok_web&channel=tiktok_web&device_platform=web&aid=1988&msToken=bench";
+const USER_AGENT =
+  "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36";
+
+function ms(start) {
+  return Number(process.hrtime.bigint() - start) / 1e6;
+}
+
+function summary(samples) {
+  const sorted = [...samples].sort((a, b) => a - b);
+  const mean = sorted.reduce((a, b) => a + b, 0) / sorted.length;
+  const p95 = sorted[Math.min(sorted.length - 1, Math.floor(0.95 * sorted.length))];
+  return `mean=${mean.toFixed(3)} ms  p50=${sorted[sorted.length >> 1].toFixed(3)} ms  p95=${p95.toFixed(3)} ms`;
+}
+
+async function bench(name, createSigner, runs) {
+  let start = process.hrtime.bigint();
+  const signer = await createSigner();
+  console.log(`${name.padEnd(8)} cold start ${ms(start).toFixed(1)} ms`);
+  const samples = [];
+  for (let i = 0; i < runs; i++) {
+    start = process.hrtime.bigint();
+    await signer.sign(URL_TO_SIGN);
+    samples.push(ms(start));
+  }
+  console.log(`${name.padEnd(8)} sign x${runs}  ${summary(samples)}`);
+  await signer.close();
+}
+
+async function benchStartup(runs) {
+  const { chromium } = require("playwright-chromium");
+  const Signer = require("./index");
+  const browser = await chromium.launch(new Signer().options);
+  for (const bootstrap of ["network", "offline"]) {
+    const samples = [];
+    for (let i = 0; i < runs; i++) {
+      const signer = new Signer(null, USER_AGENT, browser, { bootstrap: bootstrap });
+      const start = process.hrtime.bigint();
+      try {
+        await signer.init();
+        samples.push(ms(start));
+      } catch (err) {
+        console.log(`${bootstrap.padEnd(8)} startup failed: ${err}`);
+      }
+      await signer.close();
+    }
+    if (samples.length) {
+      console.log(`${bootstrap.padEnd(8)} startup x${samples.length}  ${summary(samples)}`);
+    }
+  }
+  await browser.close();
+}
+
+(async function main() {
+  const argv = process.argv.slice(2);
+  const runsIndex = argv.indexOf("--runs");
+  const runs = runsIndex !== -1 ? parseInt(argv[runsIndex + 1], 10) : 200;
+
+  await bench("vm", () => new VmSigner(USER_AGENT).init(), runs);
+  if (argv.includes("--browser")) {
+    const Signer = require("./index");
+    await bench(
+      "browser",
+      async () => {
+        const signer = new Signer(null, USER_AGENT);
+        await signer.init();
+        return signer;
+      },
+      Math.min(runs, 20)
+    );
+  }
+  const startupIndex = argv.indexOf("--startup");
+  if (startupIndex !== -1) {
+    await benchStartup(parseInt(argv[startupIndex + 1], 10) || 5);
+  }
+})();
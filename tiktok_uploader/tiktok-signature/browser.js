@@ -1,12 +1,19 @@
 // Browser.js
-const Signer = require("./index");
-
+// Usage: node browser.js <url> <user agent> [browser|vm] [network|offline] [profile json]
 var url = process.argv[2];
 var userAgent = process.argv[3];
+var mode = process.argv[4] || "browser";
+var bootstrap = process.argv[5] || "network";
+var profile = process.argv[6] ? JSON.parse(process.argv[6]) : null;
 
 (async function main() {
   try {
-    const signer = new Signer(url, userAgent);
+    // The vm signer does not need playwright, only load it when asked for.
+    const Signer = mode === "vm" ? require("./vm") : require("./index");
+    const signer =
+      mode === "vm"
+        ? new Signer(userAgent)
+        : new Signer(url, userAgent, null, { bootstrap: bootstrap, profile: profile });
     await signer.init();
 
     const sign = await signer.sign(url);
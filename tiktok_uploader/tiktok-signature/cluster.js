@@ -0,0 +1,194 @@
+// cluster.js
+// Dispatcher for a cluster of signer worker processes (worker.js). Requests go
+// to the worker already warm for the device profile while it has a free page,
+// otherwise to the worker with the fewest requests in flight.
+const os = require("os");
+const path = require("path");
+const { fork } = require("child_process");
+const Utils = require("./utils");
+
+const LATENCY_SAMPLES = 256;
+// Workers dying faster than this are restarted with an increasing delay.
+const MIN_UPTIME_MS = 10000;
+
+function percentile(sorted, p) {
+  if (!sorted.length) {
+    return null;
+  }
+  return sorted[Math.min(sorted.length - 1, Math.floor((p / 100) * sorted.length))];
+}
+
+class SignerCluster {
+  constructor({ workers, pages = 2, recycleAfter = 500, maxRssMb = 1024, bootstrap } = {}) {
+    this.size = workers || os.cpus().length;
+    this.poolOptions = {
+      pages: pages,
+      recycleAfter: recycleAfter,
+      maxRssMb: maxRssMb,
+      bootstrap: bootstrap,
+    };
+    this.workers = [];
+    this.affinity = new Map();
+    this.nextId = 1;
+    this.closing = false;
+  }
+
+  start() {
+    for (let i = 0; i < this.size; i++) {
+      this.workers.push(this._spawn({ index: i, restarts: 0 }));
+    }
+    return this;
+  }
+
+  _spawn(previous) {
+    const child = fork(path.join(__dirname, "worker.js"), [], {
+      env: { ...process.env, SIGNER_POOL_OPTIONS: JSON.stringify(this.poolOptions) },
+      // stdout of the dispatcher is the protocol channel, keep it clean.
+      stdio: ["ignore", process.stderr, process.stderr, "ipc"],
+    });
+    const worker = {
+      index: previous.index,
+      restarts: previous.restarts,
+      crashes: previous.crashes || 0,
+      started: Date.now(),
+      child: child,
+      pending: new Map(),
+      signatures: 0,
+      errors: 0,
+      latencies: [],
+    };
+    child.on("message", (message) => this._onMessage(worker, message));
+    child.on("exit", (code) => this._onExit(worker, code));
+    return worker;
+  }
+
+  _onMessage(worker, message) {
+    const request = worker.pending.get(message.id);
+    if (!request) {
+      return;
+    }
+    worker.pending.delete(message.id);
+    if (request.op !== "stats") {
+      worker.latencies.push(Date.now() - request.started);
+      if (worker.latencies.length > LATENCY_SAMPLES) {
+        worker.latencies.shift();
+      }
+      message.status === "ok" ? worker.signatures++ : worker.errors++;
+    }
+    if (message.status === "ok") {
+      request.resolve(message.data);
+    } else {
+      request.reject(new Error(message.error));
+    }
+  }
+
+  _onExit(worker, code) {
+    for (const request of worker.pending.values()) {
+      request.reject(new Error(`Signer worker exited with code ${code}`));
+    }
+    worker.pending.clear();
+    if (this.closing) {
+      return;
+    }
+    const crashes = Date.now() - worker.started < MIN_UPTIME_MS ? worker.crashes + 1 : 0;
+    const delay = crashes ? Math.min(30000, 500 * 2 ** crashes) : 0;
+    console.error(`[-] Signer worker ${worker.index} exited (${code}), restarting in ${delay} ms`);
+    setTimeout(() => {
+      if (!this.closing) {
+        this.workers[worker.index] = this._spawn({
+          index: worker.index,
+          restarts: worker.restarts + 1,
+          crashes: crashes,
+        });
+      }
+    }, delay);
+  }
+
+  _pick(key) {
+    const warm = this.workers[this.affinity.get(key)];
+    if (warm && warm.pending.size < this.poolOptions.pages) {
+      return warm;
+    }
+    let best = this.workers[0];
+    for (const worker of this.workers) {
+      if (worker.pending.size < best.pending.size) {
+        best = worker;
+      }
+    }
+    this.affinity.set(key, best.index);
+    return best;
+  }
+
+  _send(worker, message) {
+    return new Promise((resolve, reject) => {
+      const id = this.nextId++;
+      worker.pending.set(id, {
+        op: message.op,
+        started: Date.now(),
+        resolve: resolve,
+        reject: reject,
+      });
+      if (!worker.child.connected) {
+        worker.pending.delete(id);
+        return reject(new Error(`Signer worker ${worker.index} is restarting`));
+      }
+      worker.child.send({ id: id, ...message });
+    });
+  }
+
+  sign(url, userAgent, profile) {
+    return this._send(this._pick(Utils.profileKey(userAgent, profile)), {
+      url: url,
+      user_agent: userAgent,
+      profile: profile,
+    });
+  }
+
+  async stats() {
+    const workers = await Promise.all(
+      this.workers.map(async (worker) => {
+        const sorted = [...worker.latencies].sort((a, b) => a - b);
+        const sum = sorted.reduce((a, b) => a + b, 0);
+        // Snapshot before the stats request itself is queued.
+        const inFlight = worker.pending.size;
+        const pool = await this._send(worker, { op: "stats" }).catch(() => null);
+        return {
+          index: worker.index,
+          pid: worker.child.pid,
+          restarts: worker.restarts,
+          inFlight: inFlight,
+          signatures: worker.signatures,
+          errors: worker.errors,
+          latencyMs: {
+            mean: sorted.length ? Math.round(sum / sorted.length) : null,
+            p50: percentile(sorted, 50),
+            p95: percentile(sorted, 95),
+          },
+          pool: pool,
+        };
+      })
+    );
+    return {
+      workers: workers,
+      queueDepth: workers.reduce((total, worker) => total + worker.inFlight, 0),
+    };
+  }
+
+  async close() {
+    this.closing = true;
+    await Promise.all(
+      this.workers.map(
+        (worker) =>
+          new Promise((resolve) => {
+            if (worker.child.exitCode !== null) {
+              return resolve();
+            }
+            worker.child.once("exit", resolve);
+            worker.child.disconnect();
+          })
+      )
+    );
+  }
+}
+
+module.exports = SignerCluster;
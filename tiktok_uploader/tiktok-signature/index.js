@@ -1,4 +1,4 @@
-const { createCipheriv } = require("crypto");
+const fs = require("fs");
 const { devices, chromium } = require("playwright-chromium");
 const Utils = require("./utils");
 const iPhone11 = devices["iPhone 11 Pro"];
@@ -21,16 +21,27 @@ class Signer {
   // Default TikTok loading page
   default_url = "https://www.tiktok.com/@rihanna?lang=en";
 
+  // "network" loads default_url from tiktok.com, "offline" serves the local
+  // bootstrap.html fixture under the same URL, so startup needs no network.
+  bootstrap = "network";
+  bootstrapTimeout = 10000;
+
   // Password for xttparams AES encryption
   password = "webapp1.0+202106";
 
-  constructor(default_url, userAgent, browser) {
+  constructor(default_url, userAgent, browser, options = {}) {
     if (default_url) {
       this.default_url = default_url;
     }
+    if (options.bootstrap) {
+      this.bootstrap = options.bootstrap;
+    }
+    // Stable device of an account ({user_agent, viewport, device_scale_factor,
+    // is_mobile, has_touch, locale}), a random one per launch without it.
+    this.profile = options.profile || null;
 
     // Use the provided userAgent or the default one
-    this.userAgent = userAgent || this.userAgent;
+    this.userAgent = userAgent || (this.profile && this.profile.user_agent) || this.userAgent;
 
     if (browser) {
       this.browser = browser;
@@ -52,16 +63,29 @@ class Signer {
       this.browser = await chromium.launch(this.options);
     }
 
-    let emulateTemplate = {
-      ...iPhone11,
-      locale: "en-US",
-      deviceScaleFactor: Utils.getRandomInt(1, 3),
-      isMobile: Math.random() > 0.5,
-      hasTouch: Math.random() > 0.5,
-      userAgent: this.userAgent,
-    };
-    emulateTemplate.viewport.width = Utils.getRandomInt(320, 1920);
-    emulateTemplate.viewport.height = Utils.getRandomInt(320, 1920);
+    let emulateTemplate = this.profile
+      ? {
+          ...iPhone11,
+          locale: this.profile.locale || "en-US",
+          deviceScaleFactor: this.profile.device_scale_factor,
+          isMobile: this.profile.is_mobile,
+          hasTouch: this.profile.has_touch,
+          userAgent: this.userAgent,
+          viewport: { ...this.profile.viewport },
+        }
+      : {
+          ...iPhone11,
+          locale: "en-US",
+          deviceScaleFactor: Utils.getRandomInt(1, 3),
+          isMobile: Math.random() > 0.5,
+          hasTouch: Math.random() > 0.5,
+          userAgent: this.userAgent,
+          // A copy: the device template is shared by every signer.
+          viewport: {
+            width: Utils.getRandomInt(320, 1920),
+            height: Utils.getRandomInt(320, 1920),
+          },
+        };
 
     this.context = await this.browser.newContext({
       bypassCSP: true,
@@ -70,23 +94,28 @@ class Signer {
 
     this.page = await this.context.newPage();
 
-    await this.page.route("**/*", (route) => {
-      return route.request().resourceType() === "script"
-        ? route.abort()
-        : route.continue();
-    });
+    if (this.bootstrap === "offline") {
+      await this._bootstrapOffline();
+    } else {
+      await this.page.route("**/*", (route) => {
+        return route.request().resourceType() === "script"
+          ? route.abort()
+          : route.continue();
+      });
 
-    await this.page.goto(this.default_url, {
-      waitUntil: "networkidle",
-    });
+      await this.page.goto(this.default_url, {
+        waitUntil: "networkidle",
+      });
+    }
 
+    // Inject one after another: webmssdk.js and xbogus.js expect the
+    // previous scripts to be in place.
     let LOAD_SCRIPTS = ["signer.js", "webmssdk.js", "xbogus.js"];
-    LOAD_SCRIPTS.forEach(async (script) => {
+    for (const script of LOAD_SCRIPTS) {
       await this.page.addScriptTag({
         path: `${__dirname}/javascript/${script}`,
       });
-      // console.log("[+] " + script + " loaded");
-    });
+    }
 
     await this.page.evaluate(() => {
       window.generateSignature = function generateSignature(url) {
@@ -96,16 +125,37 @@ class Signer {
         return window.byted_acrawler.sign({ url: url });
       };
 
-      window.generateBogus = function generateBogus(params) {
-        if (typeof window.generateBogus !== "function") {
-          throw "No X-Bogus function found";
-        }
-        return window.generateBogus(params);
-      };
+      // Exported by xbogus.js itself.
+      if (typeof window.generateBogus !== "function") {
+        throw "No X-Bogus function found";
+      }
       return this;
     });
   }
 
+  async _bootstrapOffline() {
+    const html = fs.readFileSync(`${__dirname}/bootstrap.html`, "utf8");
+    const origin = new URL(this.default_url).origin;
+    // Nothing leaves the browser: the page itself comes from the fixture,
+    // every subresource is refused.
+    await this.page.route("**/*", (route) => {
+      const request = route.request();
+      if (request.isNavigationRequest() && request.url().startsWith(origin)) {
+        return route.fulfill({
+          status: 200,
+          contentType: "text/html; charset=utf-8",
+          body: html,
+        });
+      }
+      return route.abort();
+    });
+
+    await this.page.goto(this.default_url, {
+      waitUntil: "domcontentloaded",
+      timeout: this.bootstrapTimeout,
+    });
+  }
+
   async navigator() {
     // Get the "viewport" of the page, as reported by the page.
     const info = await this.page.evaluate(() => {
@@ -141,15 +191,15 @@ class Signer {
   }
 
   xttparams(query_str) {
-    query_str += "&is_encryption=1";
-    // Encrypt query string using aes-128-cbc
-    const cipher = createCipheriv("aes-128-cbc", this.password, this.password);
-    return Buffer.concat([cipher.update(query_str), cipher.final()]).toString(
-      "base64"
-    );
+    return Utils.xttparams(query_str, this.password);
   }
 
   async close() {
+    if (this.context && this.isExternalBrowser) {
+      // The browser is shared, only release what this signer opened.
+      await this.context.close();
+    }
+    this.context = null;
     if (this.browser && !this.isExternalBrowser) {
       await this.browser.close();
       this.browser = null;
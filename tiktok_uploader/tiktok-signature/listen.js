@@ -0,0 +1,256 @@
+// listen.js
+// Long-lived signer service. Keeps Signer instances (one per device profile,
+// or per user agent for requests without one) warm, each a context of one
+// shared browser, up to --max-signers of them,
+// and answers sign requests as JSON lines, either over stdin/stdout (default)
+// or over a local unix socket (--socket /path/to/signer.sock).
+// With --workers N (or "auto" for one per core) signing is spread over a
+// cluster of worker processes, each holding --pages pre-initialized pages.
+// Requests with "mode": "vm" skip the browser entirely (see vm.js).
+// --bootstrap offline starts pages from the local fixture instead of tiktok.com.
+//
+// Request:  {"id": 1, "url": "https://...", "user_agent": "Mozilla/5.0 ..."}
+//           {"id": 1, "url": "https://...", "user_agent": "...", "mode": "vm"}
+//           {"id": 1, "url": "https://...", "user_agent": "...", "profile": {...}}
+//           {"id": 2, "op": "stats"}
+// Response: {"id": 1, "status": "ok", "data": {...signature, navigator}}
+//           {"id": 1, "status": "error", "error": "..."}
+const fs = require("fs");
+const net = require("net");
+const readline = require("readline");
+const Utils = require("./utils");
+const VmSigner = require("./vm");
+
+function parseArgs(argv) {
+  const args = {
+    socket: null,
+    workers: 0,
+    pages: 2,
+    recycleAfter: 500,
+    maxRssMb: 1024,
+    bootstrap: "network",
+    maxSigners: 16,
+  };
+  for (let i = 0; i < argv.length; i++) {
+    switch (argv[i]) {
+      case "--socket":
+        args.socket = argv[++i];
+        break;
+      case "--workers":
+        // 0 keeps signing in this process, "auto" uses one worker per core.
+        args.workers = argv[++i] === "auto" ? "auto" : parseInt(argv[i], 10);
+        break;
+      case "--pages":
+        args.pages = parseInt(argv[++i], 10);
+        break;
+      case "--recycle-after":
+        args.recycleAfter = parseInt(argv[++i], 10);
+        break;
+      case "--max-rss-mb":
+        args.maxRssMb = parseInt(argv[++i], 10);
+        break;
+      case "--bootstrap":
+        args.bootstrap = argv[++i];
+        break;
+      case "--max-signers":
+        args.maxSigners = parseInt(argv[++i], 10);
+        break;
+    }
+  }
+  return args;
+}
+
+class SignerService {
+  constructor(backend, bootstrap, maxSigners = 16) {
+    // Optional SignerCluster, signing happens in-process without one.
+    this.backend = backend;
+    this.bootstrap = bootstrap;
+    this.maxSigners = maxSigners;
+    // Promise<Browser> shared by every signer: a new profile only costs a
+    // context, not a Chromium start.
+    this.browser = null;
+    // profile key -> { signer: Promise<Signer>, queue: Promise, lastUsed }
+    this.signers = new Map();
+  }
+
+  _browser() {
+    if (!this.browser) {
+      const { chromium } = require("playwright-chromium");
+      const Signer = require("./index");
+      this.browser = chromium.launch(new Signer(null).options);
+      this.browser.catch(() => (this.browser = null));
+    }
+    return this.browser;
+  }
+
+  async _newSigner(userAgent, profile) {
+    const Signer = require("./index");
+    const signer = new Signer(null, userAgent, await this._browser(), {
+      bootstrap: this.bootstrap,
+      profile: profile,
+    });
+    try {
+      await signer.init();
+    } catch (err) {
+      await signer.close().catch(() => {});
+      throw err;
+    }
+    return signer;
+  }
+
+  async _get(userAgent, profile) {
+    const key = Utils.profileKey(userAgent, profile);
+    let entry = this.signers.get(key);
+    if (!entry) {
+      entry = {
+        signer: this._newSigner(userAgent, profile),
+        queue: Promise.resolve(),
+        lastUsed: Date.now(),
+      };
+      this.signers.set(key, entry);
+      // A failed start must not poison the cache for the next request.
+      entry.signer.catch(() => this.signers.delete(key));
+      await this._evict();
+    }
+    entry.lastUsed = Date.now();
+    return entry;
+  }
+
+  async _evict() {
+    while (this.signers.size > this.maxSigners) {
+      let oldestKey = null;
+      let oldest = Infinity;
+      for (const [key, entry] of this.signers) {
+        if (entry.lastUsed < oldest) {
+          oldest = entry.lastUsed;
+          oldestKey = key;
+        }
+      }
+      const entry = this.signers.get(oldestKey);
+      this.signers.delete(oldestKey);
+      entry.queue
+        .then(() => entry.signer)
+        .then((signer) => signer.close())
+        .catch(() => {});
+    }
+  }
+
+  async sign(url, userAgent, mode, profile) {
+    if (mode === "vm") {
+      const signer = await new VmSigner(userAgent || undefined).init();
+      const sign = await signer.sign(url);
+      return { ...sign, navigator: await signer.navigator() };
+    }
+    if (this.backend) {
+      return this.backend.sign(url, userAgent || undefined, profile || undefined);
+    }
+    const entry = await this._get(userAgent || undefined, profile || undefined);
+    // One page per signer: run its requests one after another.
+    const result = entry.queue.then(async () => {
+      const signer = await entry.signer;
+      const sign = await signer.sign(url);
+      const navigator = await signer.navigator();
+      return { ...sign, navigator: navigator };
+    });
+    entry.queue = result.catch(() => {});
+    return result;
+  }
+
+  async handle(line) {
+    let request;
+    try {
+      request = JSON.parse(line);
+    } catch (err) {
+      return { id: null, status: "error", error: "Invalid JSON request" };
+    }
+    const id = request.id === undefined ? null : request.id;
+    if (request.op === "ping") {
+      return { id: id, status: "ok", data: "pong" };
+    }
+    if (request.op === "stats") {
+      return { id: id, status: "ok", data: await this.stats() };
+    }
+    try {
+      const data = await this.sign(request.url, request.user_agent, request.mode, request.profile);
+      return { id: id, status: "ok", data: data };
+    } catch (err) {
+      return { id: id, status: "error", error: String(err) };
+    }
+  }
+
+  async stats() {
+    if (this.backend) {
+      return this.backend.stats();
+    }
+    return { signers: this.signers.size };
+  }
+
+  async close() {
+    if (this.backend) {
+      await this.backend.close();
+    }
+    const signers = [...this.signers.values()];
+    this.signers.clear();
+    await Promise.all(
+      signers.map((entry) =>
+        entry.signer.then((signer) => signer.close()).catch(() => {})
+      )
+    );
+    const browser = this.browser;
+    this.browser = null;
+    if (browser) {
+      await browser.then((b) => b.close()).catch(() => {});
+    }
+  }
+}
+
+function serve(input, output, service) {
+  const rl = readline.createInterface({ input: input, terminal: false });
+  rl.on("line", async (line) => {
+    if (!line.trim()) {
+      return;
+    }
+    const response = await service.handle(line);
+    output.write(JSON.stringify(response) + "\n");
+  });
+  return rl;
+}
+
+(async function main() {
+  const args = parseArgs(process.argv.slice(2));
+  let cluster = null;
+  if (args.workers) {
+    const SignerCluster = require("./cluster");
+    cluster = new SignerCluster({
+      workers: args.workers === "auto" ? undefined : args.workers,
+      pages: args.pages,
+      recycleAfter: args.recycleAfter,
+      maxRssMb: args.maxRssMb,
+      bootstrap: args.bootstrap,
+    }).start();
+  }
+  const service = new SignerService(cluster, args.bootstrap, args.maxSigners);
+
+  const shutdown = async () => {
+    await service.close();
+    process.exit(0);
+  };
+  process.on("SIGINT", shutdown);
+  process.on("SIGTERM", shutdown);
+
+  if (args.socket) {
+    if (fs.existsSync(args.socket)) {
+      fs.unlinkSync(args.socket);
+    }
+    const server = net.createServer((conn) => {
+      serve(conn, conn, service);
+      conn.on("error", () => {});
+    });
+    server.listen(args.socket, () => {
+      console.error(`[+] Signer listening on ${args.socket}`);
+    });
+  } else {
+    const rl = serve(process.stdin, process.stdout, service);
+    rl.on("close", shutdown);
+  }
+})();
@@ -0,0 +1,175 @@
+// pool.js
+// One Chromium browser with a small pool of pre-initialized Signer pages.
+// Pages are recycled after `recycleAfter` signatures, the whole browser once
+// the process tree grows over `maxRssMb`.
+const { chromium } = require("playwright-chromium");
+const Signer = require("./index");
+const Utils = require("./utils");
+
+class SignerPool {
+  constructor({ pages = 2, recycleAfter = 500, maxRssMb = 1024, bootstrap, userAgent } = {}) {
+    this.size = pages;
+    this.bootstrap = bootstrap;
+    this.recycleAfter = recycleAfter;
+    this.maxRssMb = maxRssMb;
+    this.userAgent = userAgent;
+    this.browser = null;
+    this.slots = [];
+    this.waiting = [];
+    this.draining = false;
+    this.rssCheckedAt = 0;
+    this.counters = { signatures: 0, errors: 0, pageRecycles: 0, browserRecycles: 0 };
+  }
+
+  async _browser() {
+    if (!this.browser) {
+      const options = new Signer(null, this.userAgent).options;
+      this.browser = chromium.launch(options);
+      this.browser.catch(() => (this.browser = null));
+    }
+    return this.browser;
+  }
+
+  // Open a page for `userAgent` and `profile`, in place of `slot` when replacing one.
+  async _newSlot(userAgent, profile, slot) {
+    const key = Utils.profileKey(userAgent, profile);
+    if (slot) {
+      const previous = slot.signer;
+      Object.assign(slot, { key: key, busy: true, count: 0, signer: null });
+      await previous.close().catch(() => {});
+    } else {
+      slot = { key: key, busy: true, count: 0, signer: null };
+      this.slots.push(slot);
+    }
+    try {
+      const signer = new Signer(null, userAgent, await this._browser(), {
+        bootstrap: this.bootstrap,
+        profile: profile,
+      });
+      await signer.init();
+      slot.signer = signer;
+    } catch (err) {
+      await this._closeSlot(slot);
+      // The slot is free again: hand it to the next waiter.
+      this._pump();
+      throw err;
+    }
+    return slot;
+  }
+
+  async _closeSlot(slot) {
+    const index = this.slots.indexOf(slot);
+    if (index !== -1) {
+      this.slots.splice(index, 1);
+    }
+    if (slot.signer) {
+      await slot.signer.close().catch(() => {});
+    }
+  }
+
+  // Hand out an idle page for `userAgent` and `profile`, preferring one already warm for them.
+  async _acquire(userAgent, profile) {
+    if (!this.draining) {
+      const key = Utils.profileKey(userAgent, profile);
+      const warm = this.slots.find((s) => !s.busy && s.key === key);
+      if (warm) {
+        warm.busy = true;
+        return warm;
+      }
+      if (this.slots.length < this.size) {
+        return this._newSlot(userAgent, profile);
+      }
+      const idle = this.slots.find((s) => !s.busy);
+      if (idle) {
+        return this._newSlot(userAgent, profile, idle);
+      }
+    }
+    return new Promise((resolve, reject) => {
+      this.waiting.push({ userAgent: userAgent, profile: profile, resolve: resolve, reject: reject });
+    });
+  }
+
+  async _release(slot) {
+    slot.busy = false;
+    if (slot.count >= this.recycleAfter) {
+      this.counters.pageRecycles++;
+      await this._closeSlot(slot);
+    }
+    if (!this.draining && this._overMemoryBudget()) {
+      this.draining = true;
+    }
+    if (this.draining && !this.slots.some((s) => s.busy)) {
+      await this._recycleBrowser();
+    }
+    this._pump();
+  }
+
+  _overMemoryBudget() {
+    // Walking /proc is not free, sample it at most once a second.
+    const now = Date.now();
+    if (now - this.rssCheckedAt < 1000) {
+      return false;
+    }
+    this.rssCheckedAt = now;
+    return Utils.processTreeRssMb() > this.maxRssMb;
+  }
+
+  async _recycleBrowser() {
+    this.counters.browserRecycles++;
+    await Promise.all([...this.slots].map((slot) => this._closeSlot(slot)));
+    const browser = this.browser;
+    this.browser = null;
+    if (browser) {
+      await browser.then((b) => b.close()).catch(() => {});
+    }
+    this.draining = false;
+  }
+
+  _pump() {
+    while (this.waiting.length && !this.draining) {
+      const free = this.slots.some((s) => !s.busy) || this.slots.length < this.size;
+      if (!free) {
+        return;
+      }
+      const next = this.waiting.shift();
+      this._acquire(next.userAgent, next.profile).then(next.resolve, next.reject);
+    }
+  }
+
+  async sign(url, userAgent, profile) {
+    const slot = await this._acquire(userAgent, profile);
+    try {
+      const sign = await slot.signer.sign(url);
+      const navigator = await slot.signer.navigator();
+      slot.count++;
+      this.counters.signatures++;
+      return { ...sign, navigator: navigator };
+    } catch (err) {
+      this.counters.errors++;
+      // A page that failed once is not trusted again.
+      slot.count = this.recycleAfter;
+      throw err;
+    } finally {
+      await this._release(slot);
+    }
+  }
+
+  stats() {
+    return {
+      ...this.counters,
+      pages: this.slots.length,
+      busy: this.slots.filter((s) => s.busy).length,
+      waiting: this.waiting.length,
+      rssMb: Math.round(Utils.processTreeRssMb()),
+    };
+  }
+
+  async close() {
+    for (const waiter of this.waiting.splice(0)) {
+      waiter.reject(new Error("Signer pool closed"));
+    }
+    await this._recycleBrowser();
+  }
+}
+
+module.exports = SignerPool;
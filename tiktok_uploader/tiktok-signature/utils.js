@@ -1,3 +1,5 @@
+const { createCipheriv } = require("crypto");
+
 class Utils {
   static getRandomInt(a, b) {
     const min = Math.min(a, b);
@@ -21,5 +23,55 @@ class Utils {
         ((i = 0 | (Math.random() * e)), (r[o] = t[19 == o ? (3 & i) | 8 : i]));
     return "verify_" + n + "_" + r.join("");
   }
+
+  // Key under which pages are kept warm: one per device profile, or per user
+  // agent for requests without a profile.
+  static profileKey(userAgent, profile) {
+    return profile ? JSON.stringify(profile) : userAgent || "";
+  }
+
+  // X-TT-Params: query string encrypted with aes-128-cbc, key and iv = password
+  static xttparams(query_str, password) {
+    query_str += "&is_encryption=1";
+    const cipher = createCipheriv("aes-128-cbc", password, password);
+    return Buffer.concat([cipher.update(query_str), cipher.final()]).toString(
+      "base64"
+    );
+  }
+
+  // Resident memory (MB) of a process and all of its descendants, so that the
+  // Chromium processes spawned by a worker count towards its budget. Falls back
+  // to the current process only where /proc is not available.
+  static processTreeRssMb(pid = process.pid) {
+    const fs = require("fs");
+    if (!fs.existsSync("/proc/self/stat")) {
+      return process.memoryUsage().rss / 1048576;
+    }
+    const children = new Map();
+    const rss = new Map();
+    const pageKb = 4;
+    for (const entry of fs.readdirSync("/proc")) {
+      if (!/^\d+$/.test(entry)) continue;
+      try {
+        const stat = fs.readFileSync(`/proc/${entry}/stat`, "utf8");
+        // Fields after the command name, which may itself contain spaces.
+        const fields = stat.slice(stat.lastIndexOf(")") + 2).split(" ");
+        const ppid = parseInt(fields[1], 10);
+        if (!children.has(ppid)) children.set(ppid, []);
+        children.get(ppid).push(parseInt(entry, 10));
+        rss.set(parseInt(entry, 10), parseInt(fields[21], 10) * pageKb);
+      } catch (err) {
+        // Process exited while scanning.
+      }
+    }
+    let totalKb = 0;
+    const stack = [pid];
+    while (stack.length) {
+      const current = stack.pop();
+      totalKb += rss.get(current) || 0;
+      stack.push(...(children.get(current) || []));
+    }
+    return totalKb / 1024;
+  }
 }
 module.exports = Utils;
@@ -0,0 +1,85 @@
+// vm.js
+// Browserless signer: evaluates javascript/xbogus.js in a Node vm context, so
+// X-Bogus and X-TT-Params cost milliseconds instead of a Chromium start.
+// `_signature` needs the real page (webmssdk.js), so it is left empty here;
+// use the browser Signer when an endpoint insists on it.
+const fs = require("fs");
+const path = require("path");
+const vm = require("vm");
+const Utils = require("./utils");
+
+const XBOGUS_PATH = path.join(__dirname, "javascript", "xbogus.js");
+let generateBogus = null;
+
+// Evaluate xbogus.js once per process; its sign(query, userAgent) is pure.
+function loadXBogus() {
+  if (!generateBogus) {
+    const sandbox = {};
+    const window = {};
+    // xbogus.js starts with `var window = null` and ends by exporting to
+    // `window.generateBogus`: keep `window` pointing at a plain object.
+    Object.defineProperty(sandbox, "window", {
+      get: () => window,
+      set: () => {},
+    });
+    const script = new vm.Script(fs.readFileSync(XBOGUS_PATH, "utf8"), {
+      filename: XBOGUS_PATH,
+    });
+    script.runInContext(vm.createContext(sandbox));
+    if (typeof window.generateBogus !== "function") {
+      throw "No X-Bogus function found";
+    }
+    generateBogus = window.generateBogus;
+  }
+  return generateBogus;
+}
+
+class VmSigner {
+  userAgent =
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_6) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/98.0.4758.109 Safari/537.36";
+
+  // Password for xttparams AES encryption
+  password = "webapp1.0+202106";
+
+  constructor(userAgent) {
+    this.userAgent = userAgent || this.userAgent;
+  }
+
+  async init() {
+    this.generateBogus = loadXBogus();
+    return this;
+  }
+
+  async navigator() {
+    return {
+      deviceScaleFactor: null,
+      user_agent: this.userAgent,
+      browser_language: "en-US",
+      browser_platform: null,
+      browser_name: "Mozilla",
+      browser_version: this.userAgent.replace(/^Mozilla\//, ""),
+    };
+  }
+
+  async sign(link) {
+    let verify_fp = Utils.generateVerifyFp();
+    let signed_url = link + "&verifyFp=" + verify_fp;
+    let queryString = new URL(signed_url).searchParams.toString();
+    let bogus = this.generateBogus(queryString, this.userAgent);
+    signed_url += "&X-Bogus=" + bogus;
+
+    return {
+      signature: "",
+      verify_fp: verify_fp,
+      signed_url: signed_url,
+      "x-tt-params": Utils.xttparams(queryString, this.password),
+      "x-bogus": bogus,
+    };
+  }
+
+  async close() {
+    this.generateBogus = null;
+  }
+}
+
+module.exports = VmSigner;
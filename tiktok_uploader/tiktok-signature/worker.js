@@ -0,0 +1,25 @@
+// worker.js
+// Signer cluster worker, forked by cluster.js. Owns one SignerPool and answers
+// {id, url, user_agent, profile} messages from the dispatcher over the IPC channel.
+const SignerPool = require("./pool");
+
+const options = JSON.parse(process.env.SIGNER_POOL_OPTIONS || "{}");
+const pool = new SignerPool(options);
+
+process.on("message", async (message) => {
+  if (message.op === "stats") {
+    process.send({ id: message.id, status: "ok", data: pool.stats() });
+    return;
+  }
+  try {
+    const data = await pool.sign(message.url, message.user_agent, message.profile);
+    process.send({ id: message.id, status: "ok", data: data });
+  } catch (err) {
+    process.send({ id: message.id, status: "error", error: String(err) });
+  }
+});
+
+process.on("disconnect", async () => {
+  await pool.close().catch(() => {});
+  process.exit(0);
+});
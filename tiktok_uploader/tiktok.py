@@ -1,20 +1,23 @@
 import time, requests, datetime, hashlib, hmac, random, zlib, json, datetime
 import requests, zlib, json, time, subprocess, string, secrets, os, sys
-from fake_useragent import FakeUserAgentError, UserAgent
-from requests_auth_aws_sigv4 import AWSSigV4
-from tiktok_uploader.cookies import load_cookies_from_file
-from tiktok_uploader.Browser import Browser
+from concurrent.futures import ThreadPoolExecutor
+from tiktok_uploader.cookies import fresh_cookie, load_cookies_from_file, saved_cookies, track_cookies
+from tiktok_uploader.credentials import forget_credentials, upload_credentials
 from tiktok_uploader.bot_utils import *
-from tiktok_uploader import Config, Video, eprint
+from tiktok_uploader.transfer import CHUNK_SIZE, upload_parts
+from tiktok_uploader.journal import UploadJournal
+from tiktok_uploader.tuning import TransferTuner, fit_buffers
+from tiktok_uploader.http_sessions import get_session
+from tiktok_uploader.profiles import get_profile, random_user_agent
+from tiktok_uploader.scheduler import PostingTooFast
+from tiktok_uploader.timings import PhaseTimings
+from tiktok_uploader import Config, eprint
 from dotenv import load_dotenv
 
 
 # Load environment variables
 load_dotenv()
 
-# Constants
-_UA = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/68.0.3440.106 Safari/537.36'
-
 
 def login(login_name: str):
     # Check if login name is already save in file.
@@ -26,7 +29,11 @@ def login(login_name: str):
         print("Unnecessary login: session already saved!")
         return session_cookie["value"]
 
+    # Only logging in needs Chrome: uploads do not pay for importing it.
+    from tiktok_uploader.Browser import Browser
     browser = Browser.get()
+    # Log in with the device the uploads of the account will show.
+    browser.with_user_agent(get_profile(login_name)["user_agent"])
     response = browser.driver.get(os.getenv("TIKTOK_LOGIN_URL"))
 
     session_cookies = []
@@ -46,13 +53,10 @@ def login(login_name: str):
 
 
 # Local Code...
-def upload_video(session_user, video, title, schedule_time=0, allow_comment=1, allow_duet=0, allow_stitch=0, visibility_type=0, brand_organic_type=0, branded_content_type=0, ai_label=0, proxy=None):
-    try:
-        user_agent = UserAgent().random
-    except FakeUserAgentError as e:
-        user_agent = _UA
-        print("[-] Could not get random user agent, using default")
-
+def upload_video(session_user, video, title, schedule_time=0, allow_comment=1, allow_duet=0, allow_stitch=0, visibility_type=0, brand_organic_type=0, branded_content_type=0, ai_label=0, proxy=None, raise_on_throttle=False):
+    """Upload and post `video`. Returns True once posted. With
+    `raise_on_throttle`, a post refused for posting too fast raises
+    `PostingTooFast` instead of returning False, so a scheduler can back off."""
     cookies = load_cookies_from_file(f"tiktok_session-{session_user}")
     session_id = next((c["value"] for c in cookies if c["name"] == 'sessionid'), None)
     dc_id = next((c["value"] for c in cookies if c["name"] == 'tt-target-idc'), None)
@@ -81,73 +85,86 @@ def upload_video(session_user, video, title, schedule_time=0, allow_comment=1, a
     # Check video length - 1 minute max, takes too long to run this.
 
 
-    # Creating Session
-    session = requests.Session()
+    # Session shared with earlier uploads of this account and proxy: its
+    # connections are already open and it keeps the same user agent.
+    session = get_session(session_user, proxy, setup=_setup_session)
     session.cookies.set("sessionid", session_id, domain=".tiktok.com")
     session.cookies.set("tt-target-idc", dc_id, domain=".tiktok.com")
-    session.verify = True
+    # Cookies set by earlier responses (msToken, ...) save this run their
+    # warm-up, and the ones set from now on, a datacenter move included, are
+    # kept for the next runs.
+    for cookie in saved_cookies(cookies):
+        if fresh_cookie(session.cookies, cookie["name"]) is None:
+            session.cookies.set(cookie["name"], cookie["value"], domain=cookie["domain"], path=cookie.get("path", "/"),
+                                expires=cookie["expiry"], secure=cookie.get("secure", False))
+    track_cookies(session, session_user)
+    user_agent = session.headers["User-Agent"]
+
+    # An interrupted upload of the same video resumes from its journal.
+    video_path = os.path.join(os.getcwd(), Config.get().videos_dir, video)
+    journal = UploadJournal.open(session_user, video_path)
+    if journal.get("project_id"):
+        print(f"[+] Resuming interrupted upload ({len(journal.parts)} parts already sent)")
+    creation_id = journal.get("creation_id") or generate_random_string(21, True)
+
+    # Only the publish needs the project, and signing and tag resolution do
+    # not depend on the video bytes: they all run while the credentials are
+    # fetched and the chunks upload, so the first part goes out after the
+    # auth -> ApplyUploadInner chain alone and the post fires as soon as the
+    # commit returns.
+    timings = PhaseTimings()
+    executor = ThreadPoolExecutor(max_workers=3)
+    project = executor.submit(_create_project, session, creation_id, journal, timings)
+    signing = executor.submit(sign_project_post, session, user_agent)
+    tagging = executor.submit(convert_tags, title, session)
+    try:
+        return _upload_and_publish(session, user_agent, video, title, creation_id, project, signing, tagging, schedule_time, proxy, journal, timings)
+    except PostingTooFast:
+        if raise_on_throttle:
+            raise
+        return False
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        print(f"[+] Upload timings: {timings.summary()}")
+
+
+def _create_project(session, creation_id, journal, timings):
+    """Project id of the upload, created unless the journal has it. None on failure."""
+    if journal.get("project_id"):
+        return journal.get("project_id")
+    with timings.phase("project"):
+        project_url = f"https://www.tiktok.com/api/v1/web/project/create/?creation_id={creation_id}&type=1&aid=1988"
+        r = session.post(project_url)
+    if not assert_success(project_url, r):
+        return None
+    project_id = r.json()["project"]["project_id"]
+    journal.update(creation_id=creation_id, project_id=project_id)
+    return project_id
 
+
+def _setup_session(session, account=None):
+    session.verify = True
+    # The account always shows the same device: its user agent here, the
+    # rest of its profile to the signer.
+    session.profile = get_profile(account) if account else None
     headers = {
-        'User-Agent': user_agent,
+        'User-Agent': session.profile["user_agent"] if session.profile else random_user_agent(),
         'Accept': 'application/json, text/plain, */*',
     }
     session.headers.update(headers)
 
-    # Setting proxy if provided.
-    if proxy:
-        session.proxies = {
-            "http": proxy,
-            "https": proxy
-        }
-
-    creation_id = generate_random_string(21, True)
-    project_url = f"https://www.tiktok.com/api/v1/web/project/create/?creation_id={creation_id}&type=1&aid=1988"
-    r = session.post(project_url)
-
-    if not assert_success(project_url, r):
-        return False
-
-    # get project_id
-    project_id = r.json()["project"]["project_id"]
-    video_id, session_key, upload_id, crcs, upload_host, store_uri, video_auth, aws_auth = upload_to_tiktok(video, session)
-
-    url = f"https://{upload_host}/{store_uri}?uploadID={upload_id}&phase=finish&uploadmode=part"
-    headers = {
-        "Authorization": video_auth,
-        "Content-Type": "text/plain;charset=UTF-8",
-    }
-    data = ",".join([f"{i + 1}:{crcs[i]}" for i in range(len(crcs))])
 
-    if proxy:
-        r = requests.post(url, headers=headers, data=data, proxies=session.proxies)
-        if not assert_success(url, r):
-            return False
+def _upload_and_publish(session, user_agent, video, title, creation_id, project, signing, tagging, schedule_time, proxy, journal, timings):
+    if journal.stage == "committed":
+        video_id = journal.get("video_id")
     else:
-        r = requests.post(url, headers=headers, data=data)
-        if not assert_success(url, r):
+        video_id = _transfer_and_commit(session, video, journal, timings)
+        if not video_id:
             return False
-    #
-    # url = f"https://www.tiktok.com/top/v1?Action=CommitUploadInner&Version=2020-11-19&SpaceName=tiktok"
-    # data = '{"SessionKey":"' + session_key + '","Functions":[{"name":"GetMeta"}]}'
-
-    # ApplyUploadInner
-    url = f"https://www.tiktok.com/top/v1?Action=CommitUploadInner&Version=2020-11-19&SpaceName=tiktok"
-    data = '{"SessionKey":"' + session_key + '","Functions":[{"name":"GetMeta"}]}'
-
-    r = session.post(url, auth=aws_auth, data=data)
-    if not assert_success(url, r):
+    if project.result() is None:
         return False
 
     # publish video
-    url = "https://www.tiktok.com"
-    headers = {
-        "user-agent": user_agent
-    }
-
-    r = session.head(url, headers=headers)
-    if not assert_success(url, r):
-        return False
-
     headers = {
         "content-type": "application/json",
         "user-agent": user_agent
@@ -156,7 +173,7 @@ def upload_video(session_user, video, title, schedule_time=0, allow_comment=1, a
 
     if brand and brand[-1] == ",":
         brand = brand[:-1]
-    markup_text, text_extra = convert_tags(title, session)
+    markup_text, text_extra = tagging.result()
 
 
 
@@ -239,6 +256,64 @@ def upload_video(session_user, video, title, schedule_time=0, allow_comment=1, a
     # }
 
 
+    data = _post_data(creation_id, video_id, title, text_extra, schedule_time)
+
+    uploaded = False
+    while True:
+        signed = signing.result()
+        if signed is None:
+            return False
+        mstoken, tt_output = signed
+
+        project_post_dict = _project_post_params(mstoken, tt_output)
+
+        # url = f"https://www.tiktok.com/api/v1/web/project/post/"
+        url = f"https://www.tiktok.com/tiktok/web/project/post/v1/"
+        with timings.phase("publish"):
+            r = session.request("POST", url, params=project_post_dict, data=json.dumps(data), headers=headers)
+        if not assertSuccess(url, r):
+            print("[-] Published failed, try later again")
+            printError(url, r)
+            return False
+
+        if r.json()["status_code"] == 0:
+            print(f"Published successfully {'| Scheduled for ' + str(schedule_time) if schedule_time else ''}")
+            journal.discard()
+            uploaded = True
+            break
+        elif posting_too_fast(r):
+            print("[-] You are posting too fast, try later again")
+            raise PostingTooFast(r.json()["status_msg"])
+        else:
+            print("[-] Publish failed to Tiktok, trying again...")
+            printError(url, r)
+            return False
+    if not uploaded:
+        print("[-] Could not upload video")
+        return False
+    return True
+    # Check if video uploaded successfully (Tiktok has changed endpoint for this)
+    # url = f"https://www.tiktok.com/api/v1/web/project/list/?aid=1988"
+    #
+    # r = session.get(url)
+    # if not assert_success(url, r):
+    #     return False
+    # # print(r.json()["infos"])
+    # for j in r.json()["infos"]:
+    #     try:
+    #         if j["creationID"] == creation_id:
+    #             if j["tasks"][0]["status_msg"] == "Y project task init" or j["tasks"][0]["status_msg"] == "Success":
+    #                 print("[+] Video uploaded successfully.")
+    #                 return True
+    #             print(f"[-] Video could not be uploaded: {j['tasks'][0]['status_msg']}")
+    #             return False
+    #     except KeyError:
+    #         print("[-] Video could not be uploaded")
+    #         print("Response ", j)
+
+
+def _post_data(creation_id, video_id, title, text_extra, schedule_time):
+    """Payload of the project/post call publishing `video_id`."""
     data = {
         "post_common_info": {
             "creation_id": creation_id,
@@ -281,141 +356,187 @@ def upload_video(session_user, video, title, schedule_time=0, allow_comment=1, a
         ]
     }
 
-
     # Add schedule_time to the payload if it's provided
     if schedule_time > 0:
         data["feature_common_info_list"][0]["schedule_time"] = schedule_time + int(time.time())
-    
-    uploaded = False
-    while True:
+    return data
+
+
+def _project_post_params(mstoken, tt_output):
+    project_post_dict = {
+        "app_name": "tiktok_web",
+        "channel": "tiktok_web",
+        "device_platform": "web",
+        "aid": 1988,
+        "msToken": mstoken,
+        "X-Bogus": tt_output["x-bogus"],
+        "_signature": tt_output["signature"],
+        # "X-TT-Params": tt_output["x-tt-params"],  # not needed rn.
+    }
+    if not tt_output["signature"]:
+        # Browserless signer (SIGNER_MODE=vm) does not produce _signature.
+        del project_post_dict["_signature"]
+    return project_post_dict
+
+
+def sign_project_post(session, user_agent):
+    """Warm up the session cookies (unless it holds a fresh msToken) and sign
+    the project/post URL with its msToken.
+
+    Returns ``(mstoken, signature data)`` or ``None`` on failure."""
+    # The warm-up only hands out cookies: skipped while the msToken of an
+    # earlier response is valid long enough.
+    mstoken = fresh_cookie(session.cookies, "msToken", Config.get().mstoken_min_ttl)
+    if mstoken is None:
+        url = "https://www.tiktok.com"
+        headers = {
+            "user-agent": user_agent
+        }
+
+        r = session.head(url, headers=headers)
+        if not assert_success(url, r):
+            return None
+
         mstoken = session.cookies.get("msToken")
-        # xbogus = subprocess_jsvmp(os.path.join(os.getcwd(), "tiktok_uploader", "./x-bogus.js"), user_agent, f"app_name=tiktok_web&channel=tiktok_web&device_platform=web&aid=1988&msToken={mstoken}")
-        # /tiktok/web/project/post/v1/
-        js_path = os.path.join(os.getcwd(), "tiktok_uploader", "tiktok-signature", "browser.js")
-        sig_url = f"https://www.tiktok.com/api/v1/web/project/post/?app_name=tiktok_web&channel=tiktok_web&device_platform=web&aid=1988&msToken={mstoken}"
-        signatures = subprocess_jsvmp(js_path, user_agent, sig_url)
-        if signatures is None:
-            print("[-] Failed to generate signatures")
-            return False
+    # xbogus = subprocess_jsvmp(os.path.join(os.getcwd(), "tiktok_uploader", "./x-bogus.js"), user_agent, f"app_name=tiktok_web&channel=tiktok_web&device_platform=web&aid=1988&msToken={mstoken}")
+    # /tiktok/web/project/post/v1/
+    sig_url = _project_post_sig_url(mstoken)
+    tt_output = _parse_signatures(generate_signatures(user_agent, sig_url, profile=getattr(session, "profile", None)))
+    if tt_output is None:
+        return None
+    return mstoken, tt_output
 
-        try:
-            tt_output = json.loads(signatures)["data"]
-        except (json.JSONDecodeError, KeyError) as e:
-            print(f"[-] Failed to parse signature data: {str(e)}")
-            print(f"[-] Raw output: {signatures}")
-            return False
 
-        project_post_dict = {
-            "app_name": "tiktok_web",
-            "channel": "tiktok_web",
-            "device_platform": "web",
-            "aid": 1988,
-            "msToken": mstoken,
-            "X-Bogus": tt_output["x-bogus"],
-            "_signature": tt_output["signature"],
-            # "X-TT-Params": tt_output["x-tt-params"],  # not needed rn.
-        }
+def _project_post_sig_url(mstoken):
+    return f"https://www.tiktok.com/api/v1/web/project/post/?app_name=tiktok_web&channel=tiktok_web&device_platform=web&aid=1988&msToken={mstoken}"
 
-        # url = f"https://www.tiktok.com/api/v1/web/project/post/"
-        url = f"https://www.tiktok.com/tiktok/web/project/post/v1/"
-        r = session.request("POST", url, params=project_post_dict, data=json.dumps(data), headers=headers)
-        if not assertSuccess(url, r):
-            print("[-] Published failed, try later again")
-            printError(url, r)
-            return False
 
-        if r.json()["status_code"] == 0:
-            print(f"Published successfully {'| Scheduled for ' + str(schedule_time) if schedule_time else ''}")
-            uploaded = True
-            break
-        else:
-            print("[-] Publish failed to Tiktok, trying again...")
-            printError(url, r)
-            return False
-        #
-        # try:
-        #     if r.json()["status_msg"] == "You are posting too fast. Take a rest.":
-        #         print("[-] You are posting too fast, try later again")
-        #         return False
-        #     print(r.json())
-        #     uploaded = True
-        #     break
-        # except Exception as e:
-        #     print("[-] Waiting for TikTok to process video...")
-        #     time.sleep(1.5)  # wait 1.5 seconds before asking again.
+def _parse_signatures(signatures):
+    """Signature data of the signer output, or None."""
+    if signatures is None:
+        print("[-] Failed to generate signatures")
+        return None
+
+    try:
+        return json.loads(signatures)["data"]
+    except (json.JSONDecodeError, KeyError) as e:
+        print(f"[-] Failed to parse signature data: {str(e)}")
+        print(f"[-] Raw output: {signatures}")
+        return None
+
+
+def _transfer_and_commit(session, video, journal, timings=None):
+    """Upload the video, finish the part upload and commit it, recording each
+    step in the journal. Returns the video id or None."""
+    timings = timings or PhaseTimings()
+    uploaded = upload_to_tiktok(video, session, journal, timings)
     if not uploaded:
-        print("[-] Could not upload video")
-        return False
-    # Check if video uploaded successfully (Tiktok has changed endpoint for this)
-    # url = f"https://www.tiktok.com/api/v1/web/project/list/?aid=1988"
-    #
-    # r = session.get(url)
-    # if not assert_success(url, r):
-    #     return False
-    # # print(r.json()["infos"])
-    # for j in r.json()["infos"]:
-    #     try:
-    #         if j["creationID"] == creation_id:
-    #             if j["tasks"][0]["status_msg"] == "Y project task init" or j["tasks"][0]["status_msg"] == "Success":
-    #                 print("[+] Video uploaded successfully.")
-    #                 return True
-    #             print(f"[-] Video could not be uploaded: {j['tasks'][0]['status_msg']}")
-    #             return False
-    #     except KeyError:
-    #         print("[-] Video could not be uploaded")
-    #         print("Response ", j)
+        return None
+    video_id, session_key, upload_id, crcs, upload_host, store_uri, video_auth, aws_auth = uploaded
+
+    if journal.stage != "finished":
+        url = f"https://{upload_host}/{store_uri}?uploadID={upload_id}&phase=finish&uploadmode=part"
+        headers = {
+            "Authorization": video_auth,
+            "Content-Type": "text/plain;charset=UTF-8",
+        }
+        data = ",".join([f"{i + 1}:{crcs[i]}" for i in range(len(crcs))])
 
+        with timings.phase("finish"):
+            r = session.post(url, headers=headers, data=data)
+        if not assert_success(url, r):
+            return None
+        journal.update(stage="finished")
+    #
+    # url = f"https://www.tiktok.com/top/v1?Action=CommitUploadInner&Version=2020-11-19&SpaceName=tiktok"
+    # data = '{"SessionKey":"' + session_key + '","Functions":[{"name":"GetMeta"}]}'
 
-def upload_to_tiktok(video_file, session):
-    url = "https://www.tiktok.com/api/v1/video/upload/auth/?aid=1988"
-    r = session.get(url)
-    if not assert_success(url, r):
-        return False
+    # ApplyUploadInner
+    url = f"https://www.tiktok.com/top/v1?Action=CommitUploadInner&Version=2020-11-19&SpaceName=tiktok"
+    data = '{"SessionKey":"' + session_key + '","Functions":[{"name":"GetMeta"}]}'
 
-    aws_auth = AWSSigV4(
-        "vod",
-        region="ap-singapore-1",
-        aws_access_key_id=r.json()["video_token_v5"]["access_key_id"],
-        aws_secret_access_key=r.json()["video_token_v5"]["secret_acess_key"],
-        aws_session_token=r.json()["video_token_v5"]["session_token"],
-    )
-    with open(os.path.join(os.getcwd(), Config.get().videos_dir, video_file), "rb") as f:
-        video_content = f.read()
-    file_size = len(video_content)
-    url = f"https://www.tiktok.com/top/v1?Action=ApplyUploadInner&Version=2020-11-19&SpaceName=tiktok&FileType=video&IsInner=1&FileSize={file_size}&s=g158iqx8434"
-
-    r = session.get(url, auth=aws_auth)
+    with timings.phase("commit"):
+        r = session.post(url, auth=aws_auth, data=data)
     if not assert_success(url, r):
+        if r.status_code in (401, 403):
+            forget_credentials(session)
+        return None
+    journal.update(stage="committed")
+    return video_id
+
+
+def upload_to_tiktok(video_file, session, journal=None, timings=None):
+    timings = timings or PhaseTimings()
+    # Credentials of earlier uploads of the same login are reused while they
+    # are fresh enough to also sign CommitUploadInner at the end of this one.
+    with timings.phase("auth"):
+        auth = upload_credentials(session)
+    if auth["status"] != "ok":
+        print(f"[-] Could not get upload credentials: {auth['error']}")
         return False
+    credentials = auth["credentials"]
+    aws_auth = credentials.signer
+    video_path = os.path.join(os.getcwd(), Config.get().videos_dir, video_file)
+    file_size = os.path.getsize(video_path)
+    resumed = journal is not None and journal.stage in ("transfer", "finished")
+    if resumed:
+        video_id, session_key, upload_id, upload_host, store_uri, video_auth, chunk_size = (
+            journal.get(name) for name in UploadJournal.TRANSFER_FIELDS)
+    else:
+        url = f"https://www.tiktok.com/top/v1?Action=ApplyUploadInner&Version=2020-11-19&SpaceName=tiktok&FileType=video&IsInner=1&FileSize={file_size}&s=g158iqx8434"
 
-    # upload chunks
-    upload_node = r.json()["Result"]["InnerUploadAddress"]["UploadNodes"][0]
-    video_id = upload_node["Vid"]
-    store_uri = upload_node["StoreInfos"][0]["StoreUri"]
-    video_auth = upload_node["StoreInfos"][0]["Auth"]
-    upload_host = upload_node["UploadHost"]
-    session_key = upload_node["SessionKey"]
-    chunk_size = 5242880
-    chunks = []
-    i = 0
-    while i < file_size:
-        chunks.append(video_content[i: i + chunk_size])
-        i += chunk_size
-    crcs = []
-    upload_id = str(uuid.uuid4())
-    for i in range(len(chunks)):
-        chunk = chunks[i]
-        crc = crc32(chunk)
-        crcs.append(crc)
-        url = f"https://{upload_host}/{store_uri}?partNumber={i + 1}&uploadID={upload_id}&phase=transfer"
-        headers = {
-            "Authorization": video_auth,
-            "Content-Type": "application/octet-stream",
-            "Content-Disposition": 'attachment; filename="undefined"',
-            "Content-Crc32": crc,
-        }
+        with timings.phase("apply"):
+            r = session.get(url, auth=aws_auth)
+        if not assert_success(url, r):
+            if r.status_code in (401, 403):
+                forget_credentials(session, credentials)
+            return False
 
-        r = session.post(url, headers=headers, data=chunk)
+        # upload chunks
+        upload_node = r.json()["Result"]["InnerUploadAddress"]["UploadNodes"][0]
+        video_id = upload_node["Vid"]
+        store_uri = upload_node["StoreInfos"][0]["StoreUri"]
+        video_auth = upload_node["StoreInfos"][0]["Auth"]
+        upload_host = upload_node["UploadHost"]
+        session_key = upload_node["SessionKey"]
+        upload_id = str(uuid.uuid4())
+        chunk_size = None
+    # Part size and parallelism learned from earlier uploads over the same host and proxy.
+    tuner = TransferTuner() if Config.get().upload_adaptive else None
+    proxy = session.proxies.get("https")
+    if tuner:
+        planned_chunk_size, parallelism = tuner.plan(upload_host, proxy, file_size)
+    else:
+        planned_chunk_size, parallelism = CHUNK_SIZE, Config.get().upload_parallelism
+    # A resumed upload keeps the part size its parts were cut with.
+    if chunk_size is None:
+        chunk_size = planned_chunk_size
+        if journal is not None:
+            journal.update(stage="transfer", video_id=video_id, session_key=session_key, upload_id=upload_id,
+                           upload_host=upload_host, store_uri=store_uri, video_auth=video_auth, chunk_size=chunk_size)
+    parallelism = fit_buffers(chunk_size, parallelism)
+
+    if journal is not None and journal.stage == "finished":
+        crcs = [crc for _, crc in sorted(journal.parts.items())]
+    else:
+        # Stream the file part by part, a few parts in flight, each checked and retried on its own.
+        samples = []
+        start = time.perf_counter()
+        with timings.phase("transfer"):
+            crcs = upload_parts(session, f"https://{upload_host}/{store_uri}", upload_id, video_auth, video_path,
+                                chunk_size, parallelism, Config.get().upload_retries,
+                                done=journal.parts if journal is not None else None,
+                                on_part=journal.part_done if journal is not None else None,
+                                samples=samples)
+        if tuner and samples:
+            tuner.record(upload_host, proxy, parallelism, samples, time.perf_counter() - start)
+    if crcs is None:
+        if resumed:
+            # The upload session of the interrupted run may have expired on the host side.
+            print("[-] Could not resume the interrupted upload, uploading the video again")
+            journal.reset_transfer()
+            return upload_to_tiktok(video_file, session, journal, timings)
+        return False
 
     return video_id, session_key, upload_id, crcs, upload_host, store_uri, video_auth, aws_auth
 
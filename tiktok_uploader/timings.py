@@ -0,0 +1,41 @@
+import contextlib, threading, time
+
+
+class PhaseTimings:
+    """Start and end of the phases of one upload, in seconds since it started.
+
+    Phases running at once overlap in the summary, which shows how long the
+    upload waited before its first part went out and which chain of requests
+    it waited for."""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.started = clock()
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = self.clock() - self.started
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = (start, self.clock() - self.started)
+
+    def mark(self, name):
+        """Record an instant, e.g. the first byte sent."""
+        at = self.clock() - self.started
+        with self._lock:
+            self.phases.setdefault(name, (at, at))
+
+    def get(self, name):
+        """(start, end) of `name`, None if it did not run."""
+        with self._lock:
+            return self.phases.get(name)
+
+    def summary(self):
+        with self._lock:
+            phases = sorted(self.phases.items(), key=lambda item: item[1])
+        return ", ".join(f"{name} {start:.2f}s" if start == end else f"{name} {start:.2f}-{end:.2f}s"
+                         for name, (start, end) in phases)
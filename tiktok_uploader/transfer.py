@@ -0,0 +1,156 @@
+import os, queue, random, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from .bot_utils import crc32
+
+
+CHUNK_SIZE = 5242880
+
+
+def iter_parts(path, chunk_size=CHUNK_SIZE, buffers=None, skip=()):
+    """Yield ``(part_number, chunk, crc)`` for every part of the file at `path`.
+
+    Parts are read with `readinto` into one reusable buffer and handed out as
+    memoryview slices, so memory stays at one chunk whatever the file size.
+    A chunk is only valid until the next part is read.
+
+    With `buffers`, a queue of bytearrays, every part takes a buffer from the
+    queue instead and the consumer puts ``chunk.obj`` back once it is done with
+    the chunk: memory is then bounded by the number of buffers in circulation.
+
+    Part numbers in `skip` are seeked over without being read or yielded."""
+    single = bytearray(chunk_size) if buffers is None else None
+    part_number = 0
+    with open(path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        while True:
+            if part_number + 1 in skip and f.tell() < file_size:
+                part_number += 1
+                f.seek(chunk_size, os.SEEK_CUR)
+                continue
+            buffer = single if single is not None else buffers.get()
+            size = _read_full(f, memoryview(buffer))
+            if not size:
+                if single is None:
+                    buffers.put(buffer)
+                break
+            part_number += 1
+            chunk = memoryview(buffer)[:size]
+            yield part_number, chunk, crc32(chunk)
+            if size < chunk_size:
+                break
+
+
+def _read_full(f, view):
+    """Fill `view` from `f`, stopping early only at end of file."""
+    filled = 0
+    while filled < len(view):
+        read = f.readinto(view[filled:])
+        if not read:
+            break
+        filled += read
+    return filled
+
+
+
+def part_uploaded(r, crc):
+    """Whether the upload host accepted a part: HTTP 200, a success code and,
+    when the host echoes it, the same CRC32 as the one sent."""
+    if r.status_code != 200:
+        return False
+    try:
+        body = r.json()
+    except ValueError:
+        return True
+    if not isinstance(body, dict):
+        return True
+    if body.get("code", 2000) != 2000 or body.get("success", 0) != 0:
+        return False
+    echoed = (body.get("data") or {}).get("crc32")
+    return echoed is None or echoed.lower() == crc
+
+
+def upload_part(session, base_url, upload_id, video_auth, part_number, chunk, crc, retries=3, backoff=1.0, samples=None):
+    """POST one part, retrying with exponential backoff. Returns True once accepted.
+
+    Every attempt is appended to `samples`, when given, as ``(bytes, seconds, accepted)``."""
+    url = f"{base_url}?partNumber={part_number}&uploadID={upload_id}&phase=transfer"
+    headers = {
+        "Authorization": video_auth,
+        "Content-Type": "application/octet-stream",
+        "Content-Disposition": 'attachment; filename="undefined"',
+        "Content-Crc32": crc,
+    }
+    for attempt in range(retries + 1):
+        start = time.perf_counter()
+        accepted = False
+        try:
+            r = session.post(url, headers=headers, data=chunk)
+            accepted = part_uploaded(r, crc)
+            if not accepted:
+                print(f"[-] Part {part_number} rejected with {r.status_code}: {r.content[:200]}")
+        except requests.RequestException as e:
+            print(f"[-] Part {part_number} failed: {str(e)}")
+        if samples is not None:
+            samples.append((len(chunk), time.perf_counter() - start, accepted))
+        if accepted:
+            return True
+        if attempt < retries:
+            time.sleep(backoff * 2 ** attempt + random.uniform(0, backoff))
+            print(f"[-] Retrying part {part_number} ({attempt + 1}/{retries})")
+    return False
+
+
+def upload_parts(session, base_url, upload_id, video_auth, path, chunk_size=CHUNK_SIZE, parallelism=4, retries=3, backoff=1.0,
+                 done=None, on_part=None, samples=None):
+    """Upload every part of `path` with up to `parallelism` parts in flight.
+
+    `done` maps the numbers of parts already accepted in an earlier run to
+    their CRC: they are not sent again. `on_part(part_number, crc)` is called
+    from the upload threads as soon as a part is accepted. `samples` collects
+    the timing of every attempt, see `upload_part`.
+
+    Returns the part CRCs ordered by part number, as the ``phase=finish`` call
+    expects them, or None when a part could not be uploaded."""
+    buffers = queue.Queue()
+    for _ in range(parallelism):
+        buffers.put(bytearray(chunk_size))
+    crcs = dict(done or {})
+    failed = threading.Event()
+    parts = -(-os.path.getsize(path) // chunk_size)
+
+    def send(part_number, chunk, crc):
+        try:
+            if failed.is_set():
+                return
+            if upload_part(session, base_url, upload_id, video_auth, part_number, chunk, crc, retries, backoff, samples):
+                crcs[part_number] = crc
+                if on_part:
+                    on_part(part_number, crc)
+            else:
+                failed.set()
+        except Exception as e:
+            # A part that is not in `crcs` must fail the upload, whatever went wrong.
+            print(f"[-] Part {part_number} failed: {type(e).__name__}: {str(e)}")
+            failed.set()
+        finally:
+            buffers.put(chunk.obj)
+
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        # Reading blocks until a buffer is free again, which also bounds
+        # the number of parts in flight.
+        for part_number, chunk, crc in iter_parts(path, chunk_size, buffers, skip=frozenset(crcs)):
+            if failed.is_set():
+                buffers.put(chunk.obj)
+                break
+            executor.submit(send, part_number, chunk, crc)
+
+    if failed.is_set():
+        print("[-] Giving up on upload after repeated part failures")
+        return None
+    if len(crcs) != parts:
+        print(f"[-] {len(crcs)} of {parts} parts uploaded, giving up on upload")
+        return None
+    return [crcs[part_number] for part_number in sorted(crcs)]
@@ -0,0 +1,168 @@
+import json, os, statistics, threading, time
+from urllib.parse import urlsplit
+
+from .Config import Config
+from .transfer import CHUNK_SIZE
+
+
+# Bounds of the upload host: parts of at least 5 MiB (the last one excepted)
+# and no more than 10000 parts in one upload.
+MIN_CHUNK_SIZE = CHUNK_SIZE
+MAX_CHUNK_SIZE = 64 * 1048576
+MAX_PARTS = 10000
+MAX_PARALLELISM = 16
+
+# One part should keep a connection busy for a few seconds and for many round
+# trips: the request overhead is amortised, yet a retried part costs little.
+TARGET_PART_SECONDS = 4.0
+TARGET_PART_RTTS = 20
+# Smaller parts rather than connections left idle on files that are too small.
+PARTS_PER_CONNECTION = 2
+
+# Weight of the latest upload in the learned throughput, RTT and failure rate.
+ALPHA = 0.3
+# More failed attempts than this and the link is treated as flaky.
+FLAKY_FAILURE_RATE = 0.1
+# Relative goodput gain that justifies more parts in flight.
+MIN_GAIN = 0.05
+# Every this many uploads, a settled host tries one more part in flight.
+PROBE_EVERY = 10
+
+_lock = threading.Lock()
+
+
+class TransferTuner:
+    """Part size and parallelism learned for each upload host and proxy.
+
+    After an upload, the per-part timings give the throughput of a single
+    connection and the per-request round trip time. The next part size makes
+    a part last TARGET_PART_SECONDS on one connection, and longer on high
+    latency links. Parallelism keeps climbing as long as it improves the
+    goodput of the whole upload and backs off when attempts start failing.
+    Estimates are kept in ``STATE_DIR/transfer_tuning.json`` across runs."""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(os.getcwd(), Config.get().state_dir, "transfer_tuning.json")
+
+    @staticmethod
+    def key(upload_host, proxy=None):
+        """Tuning key of a host reached directly or through `proxy` (credentials left out)"""
+        if not proxy:
+            return f"{upload_host} direct"
+        proxy = urlsplit(proxy if "://" in proxy else "http://" + proxy)
+        return f"{upload_host} via {proxy.hostname}:{proxy.port or ''}"
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"[-] Ignoring unreadable transfer tuning file {self.path}: {str(e)}")
+            return {}
+
+    def _save(self, entries):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def plan(self, upload_host, proxy, file_size):
+        """``(chunk_size, parallelism)`` for uploading `file_size` bytes to `upload_host`,
+        with at most UPLOAD_BUFFER_MB in part buffers"""
+        entry = self._load().get(TransferTuner.key(upload_host, proxy), {})
+        parallelism = max(1, min(entry.get("parallelism", Config.get().upload_parallelism), MAX_PARALLELISM))
+        # Enough parts to keep every connection busy, and to learn whether more would help.
+        chunk_size = min(entry.get("chunk_size", CHUNK_SIZE), file_size // (parallelism * PARTS_PER_CONNECTION),
+                         _buffer_budget() // parallelism)
+        chunk_size = max(chunk_size, -(-file_size // MAX_PARTS))
+        chunk_size = min(max(chunk_size, MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+        parts = max(1, -(-file_size // chunk_size))
+        return chunk_size, fit_buffers(chunk_size, min(parallelism, parts))
+
+    def record(self, upload_host, proxy, parallelism, samples, seconds):
+        """Learn from an upload that took `seconds` with `samples` from `upload_parts`."""
+        accepted = [(size, elapsed) for size, elapsed, ok in samples if ok and elapsed > 0]
+        if not accepted or seconds <= 0:
+            return
+        failure_rate = 1 - len(accepted) / len(samples)
+        goodput = sum(size for size, _ in accepted) / seconds
+        connection_bps = statistics.median(size / elapsed for size, elapsed in accepted)
+        rtt = _fit_rtt(accepted)
+
+        key = TransferTuner.key(upload_host, proxy)
+        with _lock:
+            entries = self._load()
+            entry = entries.get(key, {})
+            entry["connection_bps"] = _ewma(entry.get("connection_bps"), connection_bps)
+            entry["failure_rate"] = _ewma(entry.get("failure_rate"), failure_rate)
+            if rtt is not None:
+                entry["rtt"] = _ewma(entry.get("rtt"), rtt)
+            entry["runs"] = entry.get("runs", 0) + 1
+            entry["chunk_size"] = _next_chunk_size(entry)
+            # Goodput only says something about parallelism if every slot was used.
+            if len(accepted) > parallelism:
+                entry["parallelism"] = _next_parallelism(entry, parallelism, goodput, failure_rate)
+            entry["updated_at"] = time.time()
+            entries[key] = entry
+            self._save(entries)
+
+
+def _buffer_budget():
+    return Config.get().upload_buffer_mb * 1048576
+
+
+def fit_buffers(chunk_size, parallelism):
+    """`parallelism` lowered until the parts in flight, a `chunk_size` buffer
+    each, fit in UPLOAD_BUFFER_MB. At least one part is always in flight."""
+    return max(1, min(parallelism, _buffer_budget() // chunk_size))
+
+
+def _ewma(previous, value):
+    return value if previous is None else (1 - ALPHA) * previous + ALPHA * value
+
+
+def _fit_rtt(accepted):
+    """Fixed cost per request, from a least squares fit of part time against
+    part size. None unless the parts had different sizes (the last one does
+    when the file size is not a multiple of the part size)."""
+    if len(accepted) < 2:
+        return None
+    mean_size = statistics.fmean(size for size, _ in accepted)
+    mean_time = statistics.fmean(elapsed for _, elapsed in accepted)
+    variance = sum((size - mean_size) ** 2 for size, _ in accepted)
+    if not variance:
+        return None
+    slope = sum((size - mean_size) * (elapsed - mean_time) for size, elapsed in accepted) / variance
+    if slope <= 0:
+        return None
+    return max(0.0, mean_time - slope * mean_size)
+
+
+def _next_chunk_size(entry):
+    seconds = max(TARGET_PART_SECONDS, TARGET_PART_RTTS * entry.get("rtt", 0))
+    chunk_size = entry["connection_bps"] * seconds
+    if entry["failure_rate"] > FLAKY_FAILURE_RATE:
+        # Less to send again when a part fails.
+        chunk_size /= 2
+    chunk_size = int(chunk_size) // 1048576 * 1048576
+    return min(max(chunk_size, MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+
+
+def _next_parallelism(entry, parallelism, goodput, failure_rate):
+    if failure_rate > FLAKY_FAILURE_RATE:
+        entry.pop("best_goodput", None)
+        entry["best_parallelism"] = max(1, parallelism // 2)
+        return entry["best_parallelism"]
+    best_goodput = entry.get("best_goodput")
+    if best_goodput is None or goodput > best_goodput * (1 + MIN_GAIN):
+        entry["best_parallelism"], entry["best_goodput"] = parallelism, goodput
+        return min(MAX_PARALLELISM, parallelism * 2)
+    best_parallelism = entry.get("best_parallelism", parallelism)
+    if parallelism == best_parallelism:
+        # Follow the link as it gets slower or faster, and probe upwards now and then.
+        entry["best_goodput"] = _ewma(best_goodput, goodput)
+        return min(MAX_PARALLELISM, parallelism + 1) if entry["runs"] % PROBE_EVERY == 0 else parallelism
+    return best_parallelism